@@ -1,16 +1,19 @@
 from abc import ABC, abstractmethod
 from functools import wraps
 from io import StringIO
+import os
+import socket
 import traceback
-from typing import Any, Callable, Dict, Optional, Union, cast
+from typing import Any, Callable, Dict, List, Optional, Union, cast
 
 from oremda.plasma_client import PlasmaClient
 from oremda.constants import DEFAULT_PLASMA_SOCKET_PATH
-from oremda.messengers import BaseMessenger, MQPMessenger
+from oremda.messengers import BaseMessenger, Messenger
 from oremda.plasma_client import PlasmaArray
 from oremda.typing import (
     ErrorTaskMessage,
     JSONType,
+    LocationType,
     OperateTaskMessage,
     PortKey,
     DataType,
@@ -18,8 +21,11 @@ from oremda.typing import (
     ResultTaskMessage,
     MessageType,
     DataArray,
+    TimingSpan,
+    as_message,
 )
 from oremda.utils.mpi import mpi_rank
+from oremda.utils.timing import timed
 
 
 class Operator(ABC):
@@ -32,6 +38,9 @@ class Operator(ABC):
         self.name = name
         self.messenger = messenger
         self.array_constructor = array_constructor
+        # Identifies this container in the timings. The hostname of a
+        # container is its id.
+        self.worker = f"{name}@{socket.gethostname()}:{os.getpid()}"
 
     @property
     def input_queue(self) -> str:
@@ -45,7 +54,7 @@ class Operator(ABC):
             message = self.messenger.recv(self.input_queue)
 
             if message.type == MessageType.Operate:
-                task_message = OperateTaskMessage(**message.dict())
+                task_message = as_message(message, OperateTaskMessage)
                 self.operate(task_message)
             elif message.type == MessageType.Terminate:
                 return
@@ -57,29 +66,40 @@ class Operator(ABC):
         params = task_message.params
         output_queue = task_message.output_queue
 
-        try:
-            raw_inputs = {key: RawPort.from_port(port) for key, port in inputs.items()}
-            _raw_outputs = self.kernel(raw_inputs, params)
-
-            raw_outputs: Dict[PortKey, RawPort] = {
-                key: port if isinstance(port, RawPort) else RawPort(**port)
-                for key, port in _raw_outputs.items()
-            }
+        timings: List[TimingSpan] = []
 
-            outputs = {
-                key: cast(RawPort, port).to_port(self.array_constructor)
-                for key, port in raw_outputs.items()
-            }
-
-            result = ResultTaskMessage(outputs=outputs)
+        try:
+            with timed(timings, "plasma_get", self.worker):
+                raw_inputs = {
+                    key: RawPort.from_port(port) for key, port in inputs.items()
+                }
+
+            with timed(timings, "kernel", self.worker):
+                _raw_outputs = self.kernel(raw_inputs, params)
+
+            with timed(timings, "plasma_put", self.worker):
+                raw_outputs: Dict[PortKey, RawPort] = {
+                    key: port if isinstance(port, RawPort) else RawPort(**port)
+                    for key, port in _raw_outputs.items()
+                }
+
+                outputs = {
+                    key: cast(RawPort, port).to_port(self.array_constructor)
+                    for key, port in raw_outputs.items()
+                }
+
+            result = ResultTaskMessage(outputs=outputs, timings=timings)
             result.parallel_index = task_message.parallel_index
+            result.task_id = task_message.task_id
             self.messenger.send(result, output_queue)
         except BaseException:
             # Write exception details to str
             buf = StringIO()
             traceback.print_exc(file=buf)
             error_string = buf.getvalue()
-            error_message = ErrorTaskMessage(error_string=error_string)
+            error_message = ErrorTaskMessage(
+                error_string=error_string, task_id=task_message.task_id
+            )
             self.messenger.send(error_message, output_queue)
 
     @abstractmethod
@@ -117,7 +137,7 @@ def operator(
 
         if messenger is None:
             client = PlasmaClient(DEFAULT_PLASMA_SOCKET_PATH)
-            messenger = MQPMessenger(client)
+            messenger = Messenger(LocationType.Local, client)
 
         if array_constructor is None:
             client = PlasmaClient(DEFAULT_PLASMA_SOCKET_PATH)
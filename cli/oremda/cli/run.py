@@ -14,6 +14,8 @@ from oremda.constants import (
 )
 from oremda.display import display_factory
 from oremda.event_loops import MPINonRootEventLoop, MPIRootEventLoop
+from oremda.messengers import start_local_messenger
+from oremda.messengers.uds.utils import broker_socket_path
 from oremda.plasma_client import PlasmaClient
 from oremda.registry import Registry
 from oremda.typing import ContainerType
@@ -28,7 +30,57 @@ import oremda.pipeline
     help="Run an oremda pipeline on the command line.",
 )
 @click.argument("pipeline_json", type=click.File("r"))
-def main(pipeline_json: click.File):
+@click.option(
+    "--concurrent",
+    is_flag=True,
+    help="Run independent operators at the same time.",
+)
+@click.option(
+    "--max-in-flight",
+    type=click.IntRange(min=1),
+    help="The maximum number of operators running at the same time.",
+)
+@click.option(
+    "--prune",
+    is_flag=True,
+    help="Skip the operators that do not lead to a display.",
+)
+@click.option(
+    "--batch",
+    "batch_json",
+    type=click.File("r"),
+    help=(
+        "A JSON list of parameter overrides, each mapping operator node ids "
+        "to parameters. The pipeline is run once per item, reusing the "
+        "containers."
+    ),
+)
+@click.option(
+    "--trace",
+    "trace_path",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Save the timings of the operators to a Chrome trace file.",
+)
+@click.option(
+    "--report",
+    is_flag=True,
+    help="Print the critical path and the bottlenecks of the run.",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Cancel the run after this many seconds.",
+)
+def main(
+    pipeline_json: click.File,
+    concurrent: bool,
+    max_in_flight: int,
+    prune: bool,
+    batch_json: click.File,
+    trace_path: str,
+    report: bool,
+    timeout: float,
+):
 
     if os.environ.get("SINGULARITY_CONTAINER") and "SINGULARITY_BIND" in os.environ:
         # The runner is in a singularity container.
@@ -64,7 +116,9 @@ def main(pipeline_json: click.File):
         "socket_path": plasma_socket_path,
     }
 
-    with start_plasma_store(**plasma_kwargs):
+    with start_plasma_store(**plasma_kwargs), start_local_messenger(
+        broker_socket_path(oremda_var_dir)
+    ):
         plasma_client = PlasmaClient(plasma_socket_path)
         container_client = ContainerClient(container_type)
 
@@ -78,6 +132,7 @@ def main(pipeline_json: click.File):
         }
         registry = Registry(**registry_kwargs)
         future = None
+        pipeline = None
 
         try:
             run_kwargs = {
@@ -128,14 +183,45 @@ def main(pipeline_json: click.File):
                 if mpi_world_size > 1:
                     future = MPIRootEventLoop().start_event_loop()
 
-                pipeline.run()
+                pipeline.memory = oremda.pipeline.MemoryBudget(
+                    plasma_client, plasma_memory
+                )
+
+                if trace_path is not None:
+                    pipeline.trace = oremda.pipeline.Trace()
+
+                if batch_json is not None:
+                    items = json.load(batch_json)  # type: ignore
+
+                    def on_item(index, outputs):
+                        print(f"Completed item {index + 1}/{len(items)}")
+
+                    pipeline.run_batch(items, on_item, max_in_flight, timeout)
+                else:
+                    pipeline.run(
+                        concurrent=concurrent,
+                        max_in_flight=max_in_flight,
+                        prune=prune,
+                        timeout=timeout,
+                    )
+
+                pipeline.flush_displays()
+
+                if pipeline.trace is not None:
+                    pipeline.trace.save(trace_path)
+
+                if report:
+                    print(pipeline.report().format())
             else:
-                registry.start_containers()
+                pipeline.start_containers(prune)
                 future = MPINonRootEventLoop().start_event_loop(registry)
                 # Wait for the event loop to finish
                 future.result()
         finally:
             if mpi_rank == 0:
+                if pipeline is not None:
+                    pipeline.close()
+
                 registry.release()
 
                 if mpi_world_size > 1 and future is not None:
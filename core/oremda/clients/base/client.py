@@ -3,7 +3,9 @@ from typing import Any, List
 
 from oremda.clients.base.container import ContainerBase
 from oremda.clients.base.image import ImageBase
-from oremda.constants import OREMDA_MPI_RANK_ENV_VAR
+from oremda.constants import OREMDA_LOCAL_MESSENGER_ENV_VAR, OREMDA_MPI_RANK_ENV_VAR
+from oremda.messengers import local_messenger_type
+from oremda.messengers.mqp.utils import queue_environment_variables
 from oremda.typing import ContainerType
 from oremda.utils.mpi import mpi_rank
 
@@ -36,3 +38,10 @@ class ClientBase(ABC):
             kwargs["environment"] = {}
 
         kwargs["environment"][OREMDA_MPI_RANK_ENV_VAR] = mpi_rank
+
+    def add_messenger_environment_variables(self, kwargs):
+        if "environment" not in kwargs:
+            kwargs["environment"] = {}
+
+        kwargs["environment"].update(queue_environment_variables())
+        kwargs["environment"][OREMDA_LOCAL_MESSENGER_ENV_VAR] = local_messenger_type()
@@ -17,6 +17,12 @@ class ImageBase(ABC):
     def raw_labels(self):
         pass
 
+    @property
+    @abstractmethod
+    def digest(self) -> str:
+        """A string identifying the exact content of the image"""
+        pass
+
     @property
     def labels(self) -> OperatorLabels:
         labels = flat_get_item(self.raw_labels, "oremda")
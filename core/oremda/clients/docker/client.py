@@ -37,6 +37,7 @@ class DockerClient(ClientBase):
 
         # Add mpi environment variables
         self.add_mpi_environment_variables(kwargs)
+        self.add_messenger_environment_variables(kwargs)
 
         container = self.client.containers.run(*args, **kwargs)
         return DockerContainer(container)
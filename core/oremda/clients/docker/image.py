@@ -14,3 +14,7 @@ class DockerImage(ImageBase):
     @property
     def raw_labels(self):
         return self.image.labels
+
+    @property
+    def digest(self):
+        return self.image.id
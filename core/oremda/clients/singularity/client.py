@@ -44,6 +44,7 @@ class SingularityClient(ClientBase):
 
         # Add mpi environment variables
         self.add_mpi_environment_variables(kwargs)
+        self.add_messenger_environment_variables(kwargs)
 
         kwargs = self._docker_kwargs_to_singularity(kwargs)
 
@@ -1,3 +1,5 @@
+import os
+
 from oremda.clients.base import ImageBase
 from oremda.constants import SINGULARITY_FROM_LABEL
 
@@ -29,3 +31,10 @@ class SingularityImage(ImageBase):
             raise Exception(f"Failed to get labels: {attributes}")
 
         return attributes["labels"]
+
+    @property
+    def digest(self):
+        # Hashing a whole SIF file is too expensive, identify it by its
+        # location and modification time instead.
+        stat = os.stat(self.path)
+        return f"{os.path.abspath(self.path)}@{stat.st_size}:{stat.st_mtime_ns}"
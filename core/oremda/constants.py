@@ -12,3 +12,6 @@ OREMDA_DOCKER_ORG = "oremda"
 OREMDA_IMAGE_LABEL_NAME = "oremda.name"
 OREMDA_SIF_GLOB_PATTERN = "oremda_*.sif"
 SINGULARITY_FROM_LABEL = "org.label-schema.usage.singularity.deffile.from"
+# The messenger of the operators on the same node, "mqp" or "uds"
+OREMDA_LOCAL_MESSENGER_ENV_VAR = "OREMDA_LOCAL_MESSENGER"
+DEFAULT_LOCAL_MESSENGER = "mqp"
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Callable
-from oremda.typing import DisplayType, IdType, JSONType, Port
+from typing import Callable, Optional
+from oremda.display.worker import RenderWorker
+from oremda.typing import DataArray, DataType, DisplayType, IdType, JSONType, Port
 
 
 class DisplayHandle(ABC):
@@ -8,6 +9,8 @@ class DisplayHandle(ABC):
         self.id = id
         self._type = type
         self._parameters: JSONType = {}
+        # Renders the display off the calling thread, if set
+        self.render_worker: Optional[RenderWorker] = None
 
     @abstractmethod
     def add(self, sourceId: IdType, input: Port):
@@ -25,6 +28,13 @@ class DisplayHandle(ABC):
     def render(self):
         pass
 
+    def schedule_render(self):
+        """Render the display, on the render worker if there is one"""
+        if self.render_worker is None:
+            self.render()
+        else:
+            self.render_worker.schedule(self)
+
     @property
     def type(self) -> DisplayType:
         return self._type
@@ -41,6 +51,25 @@ class DisplayHandle(ABC):
 DisplayFactory = Callable[[IdType, DisplayType], DisplayHandle]
 
 
+class LoadedArray(DataArray):
+    """An array already read from the store
+
+    Displays keep the data of their inputs this way, as the ports may be
+    released before they are rendered.
+    """
+
+    def __init__(self, data: DataType):
+        self._data = data
+
+    @property
+    def data(self) -> DataType:
+        return self._data
+
+    @data.setter
+    def data(self, data: DataType):
+        self._data = data
+
+
 class NoopDisplayHandle(DisplayHandle):
     def add(self, sourceId: IdType, input: Port):
         pass
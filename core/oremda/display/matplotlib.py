@@ -1,10 +1,12 @@
 from abc import abstractmethod
 import os
-from typing import Any, Dict, cast
+import threading
+from typing import Any, Dict, List, cast
 import matplotlib
 import numpy as np
 
-from oremda.display import DisplayHandle
+from oremda.display import DisplayHandle, LoadedArray
+from oremda.display.worker import default_render_worker
 from oremda.typing import (
     DisplayType,
     IdType,
@@ -15,8 +17,8 @@ from oremda.typing import (
 )
 from oremda.constants import DEFAULT_DATA_DIR
 
-import matplotlib.pyplot as plt
 import matplotlib.colors
+from matplotlib.figure import Figure
 from PIL import Image
 
 
@@ -24,19 +26,38 @@ class BaseMatplotLibDisplayHandle(DisplayHandle):
     def __init__(self, id: IdType, type: DisplayType):
         super().__init__(id, type)
         self.inputs: Dict[IdType, Port] = {}
+        self._inputs_lock = threading.Lock()
+        # Rendering is slow, keep it off the thread running the pipeline
+        self.render_worker = default_render_worker()
 
     def add(self, sourceId: IdType, input: Port):
-        self.inputs[sourceId] = input
-        self.render()
+        if input.data is not None:
+            # Read the data now, the port may be released before the render
+            input = Port(meta=input.meta, data=LoadedArray(input.data.data))
+
+        with self._inputs_lock:
+            self.inputs[sourceId] = input
+
+        self.schedule_render()
 
     def remove(self, sourceId: IdType):
-        if id in self.inputs:
-            del self.inputs[sourceId]
-        self.render()
+        with self._inputs_lock:
+            if sourceId in self.inputs:
+                del self.inputs[sourceId]
+
+        self.schedule_render()
 
     def clear(self):
-        self.inputs = {}
-        self.render()
+        with self._inputs_lock:
+            self.inputs = {}
+
+        self.schedule_render()
+
+    def sorted_inputs(self) -> List[Port]:
+        with self._inputs_lock:
+            inputs = list(self.inputs.values())
+
+        return sorted(inputs, key=z_sort)
 
     def render(self):
         data_dir = os.environ.get("OREMDA_DATA_DIR") or DEFAULT_DATA_DIR
@@ -55,7 +76,7 @@ class MatplotlibDisplayHandle1D(BaseMatplotLibDisplayHandle):
         super().__init__(id, DisplayType.OneD)
 
     def raw_render(self, file_obj):
-        inputs = sorted(self.inputs.values(), key=z_sort)
+        inputs = self.sorted_inputs()
 
         if len(inputs) == 0:
             img = Image.new("RGBA", (1, 1))
@@ -67,7 +88,9 @@ class MatplotlibDisplayHandle1D(BaseMatplotLibDisplayHandle):
         y_label = self.parameters.get("yLabel", "y")
 
         legend = False
-        fig, ax = plt.subplots()
+        # Not pyplot, its state is global and the renders may run on a thread
+        fig = Figure()
+        ax = fig.subplots()
 
         for port in inputs:
             data = port.data
@@ -103,7 +126,6 @@ class MatplotlibDisplayHandle1D(BaseMatplotLibDisplayHandle):
         ax.set(xlabel=x_label, ylabel=y_label)
 
         fig.savefig(file_obj, dpi=fig.dpi, bbox_inches="tight")
-        plt.close()
 
 
 class MatplotlibDisplayHandle2D(BaseMatplotLibDisplayHandle):
@@ -111,7 +133,7 @@ class MatplotlibDisplayHandle2D(BaseMatplotLibDisplayHandle):
         super().__init__(id, DisplayType.TwoD)
 
     def raw_render(self, file_obj):
-        inputs = sorted(self.inputs.values(), key=z_sort)
+        inputs = self.sorted_inputs()
 
         if len(inputs) == 0:
             img = Image.new("RGBA", (1, 1))
@@ -119,7 +141,8 @@ class MatplotlibDisplayHandle2D(BaseMatplotLibDisplayHandle):
 
             return
 
-        fig, ax = plt.subplots()
+        fig = Figure()
+        ax = fig.subplots()
 
         legend = False
 
@@ -173,7 +196,6 @@ class MatplotlibDisplayHandle2D(BaseMatplotLibDisplayHandle):
             ax.legend()
 
         fig.savefig(file_obj, dpi=fig.dpi, bbox_inches="tight")
-        plt.close()
 
 
 def z_sort(port: Port):
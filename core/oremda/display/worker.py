@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
+
+if TYPE_CHECKING:
+    from oremda.display import DisplayHandle
+
+logger = logging.getLogger("oremda")
+
+# The minimum number of seconds between two renders of a display
+DEFAULT_FRAME_INTERVAL = 0.1
+
+
+class RenderWorker:
+    """Render displays on a background thread
+
+    Displays ask for a render with schedule(), which returns right away. The
+    worker renders the displays at most once per frame interval, so a burst
+    of changes to a display between two frames is rendered only once, with
+    its latest inputs.
+    """
+
+    def __init__(self, interval: float = DEFAULT_FRAME_INTERVAL):
+        self.interval = interval
+        # The number of renders, and the number of requests they covered
+        self.renders = 0
+        self.requests = 0
+        # Keyed by the identity of the displays, their ids are only unique
+        # within a pipeline, and the worker is shared by every pipeline
+        self._dirty: Dict[int, "DisplayHandle"] = {}
+        self._rendering: Dict[int, "DisplayHandle"] = {}
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, display: "DisplayHandle"):
+        with self._condition:
+            self.requests += 1
+            self._dirty[id(display)] = display
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="oremda-render", daemon=True
+                )
+                self._thread.start()
+
+            self._condition.notify_all()
+
+    def flush(
+        self,
+        displays: Optional[Iterable["DisplayHandle"]] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """Wait for the pending renders of some displays, or all of them
+
+        Returns False if they were not all rendered within ``timeout``.
+        """
+        keys = None if displays is None else {id(display) for display in displays}
+
+        def pending():
+            for key in [*self._dirty, *self._rendering]:
+                if keys is None or key in keys:
+                    return True
+
+            return False
+
+        with self._condition:
+            return self._condition.wait_for(lambda: not pending(), timeout)
+
+    def _run(self):
+        next_frame = time.monotonic()
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._dirty)
+
+            # Let the changes of the frame accumulate
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            next_frame = time.monotonic() + self.interval
+
+            with self._condition:
+                self._rendering, self._dirty = self._dirty, {}
+
+            for display in self._rendering.values():
+                try:
+                    display.render()
+                except Exception:
+                    logger.exception(f"Failed to render the display {display.id}")
+
+            with self._condition:
+                self.renders += len(self._rendering)
+                self._rendering = {}
+                self._condition.notify_all()
+
+
+_default_worker: Optional[RenderWorker] = None
+_default_worker_lock = threading.Lock()
+
+
+def default_render_worker() -> RenderWorker:
+    """The worker shared by the displays of the process"""
+    global _default_worker
+
+    with _default_worker_lock:
+        if _default_worker is None:
+            _default_worker = RenderWorker()
+
+        return _default_worker
@@ -1,20 +1,20 @@
 from abc import abstractmethod
 
 from oremda.constants import DEFAULT_PLASMA_SOCKET_PATH
-from oremda.messengers import MPIMessenger, MQPMessenger
+from oremda.messengers import AsyncMessenger, MPIMessenger
 from oremda.plasma_client import PlasmaClient
 from oremda.utils.asyncio import run_in_executor
 from oremda.utils.singleton import SingletonABC
 
 
 class MPIEventLoop(SingletonABC):
-    """Forward messages between the messages queue and MPI nodes"""
+    """Forward messages between the local messenger and MPI nodes"""
 
     def __init__(self):
         self.client = PlasmaClient(DEFAULT_PLASMA_SOCKET_PATH)
         if MPIMessenger is not None:
             self.mpi_messenger = MPIMessenger()
-        self.mqp_messenger = MQPMessenger(self.client)
+        self.local_messenger = AsyncMessenger(self.client)
         self.tasks = []
         self.started = False
 
@@ -26,13 +26,12 @@ class MPIEventLoop(SingletonABC):
     def mpi_recv(self, source):
         return self.mpi_messenger.recv(source)
 
-    @run_in_executor
-    def mqp_send(self, msg, dest):
-        return self.mqp_messenger.send(msg, dest)
+    # The local messenger is waited on by the event loop, not in the executor
+    async def local_send(self, msg, dest):
+        await self.local_messenger.send(msg, dest)
 
-    @run_in_executor
-    def mqp_recv(self, source):
-        return self.mqp_messenger.recv(source)
+    async def local_recv(self, source):
+        return await self.local_messenger.recv(source)
 
     @abstractmethod
     async def loop(self):
@@ -1,6 +1,12 @@
 import asyncio
-
-from oremda.typing import MPINodeReadyMessage, OperateTaskMessage, Message, MessageType
+from typing import Set
+
+from oremda.typing import (
+    MPINodeReadyMessage,
+    OperateTaskMessage,
+    MessageType,
+    as_message,
+)
 from oremda.utils.concurrency import ThreadPoolSingleton
 from oremda.utils.mpi import mpi_rank
 
@@ -14,6 +20,8 @@ class MPINonRootEventLoop(MPIEventLoop):
         # Use a queue with a rank in order to avoid queue name clashes with
         # rank 0, in case we are running on the same node as rank 0.
         operator_queue_with_rank = f"{operator_queue}_{mpi_rank}"
+        # The output queues are kept open across tasks, and removed at the end
+        output_queues: Set[str] = set()
         while True:
             print(f"{mpi_rank=} Sending ready message for: {operator_queue=}")
             # First, send a message indicating we are ready for input
@@ -29,14 +37,16 @@ class MPINonRootEventLoop(MPIEventLoop):
             msg = await self.mpi_recv(0)
             print(f"MPI message received on {mpi_rank=}, {msg=}")
 
-            task_message = Message(**msg.dict())
+            task_message = msg
             if task_message.type == MessageType.Terminate:
                 # If it was a terminate task, send it and finish this node
                 print(f"{mpi_rank=} sending terminate task...")
-                await self.mqp_send(msg, operator_queue_with_rank)
+                await self.local_send(msg, operator_queue_with_rank)
                 print(f"{mpi_rank=} Terminating...")
-                # Clean up the operator queue with rank...
-                self.mqp_messenger.unlink(operator_queue_with_rank)
+                # Clean up the operator queue with rank, and the output queues
+                self.local_messenger.unlink(operator_queue_with_rank)
+                for output_queue in output_queues:
+                    self.local_messenger.unlink(output_queue)
                 break
 
             if task_message.type != MessageType.Operate:
@@ -44,21 +54,19 @@ class MPINonRootEventLoop(MPIEventLoop):
 
             # Add the MPI rank to the output queue to ensure we don't
             # get a name clash with rank 0.
-            operate_message = OperateTaskMessage(**msg.dict())
+            operate_message = as_message(msg, OperateTaskMessage)
             operate_message.output_queue += f"_{mpi_rank}"
+            output_queues.add(operate_message.output_queue)
 
             # Forward to the operator
             print(f"Sending {operate_message} to {operator_queue_with_rank}")
-            await self.mqp_send(operate_message, operator_queue_with_rank)
+            await self.local_send(operate_message, operator_queue_with_rank)
 
             print(f"MQP message sent to: {operator_queue_with_rank=}")
 
-            result = await self.mqp_recv(operate_message.output_queue)
+            result = await self.local_recv(operate_message.output_queue)
             print(f"MQP output received: {result=}")
 
-            # Clean up the output queue
-            self.mqp_messenger.unlink(operate_message.output_queue)
-
             # Forward the result back to the main node
             await self.mpi_send(result, 0)
             print("MPI message sent back to the main node")
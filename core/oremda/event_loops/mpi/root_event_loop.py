@@ -1,6 +1,11 @@
 import asyncio
 
-from oremda.typing import MPINodeReadyMessage, OperateTaskMessage, Message, MessageType
+from oremda.typing import (
+    MPINodeReadyMessage,
+    OperateTaskMessage,
+    MessageType,
+    as_message,
+)
 from oremda.utils.concurrency import ThreadPoolSingleton
 from oremda.utils.mpi import mpi_world_size
 
@@ -16,28 +21,28 @@ class MPIRootEventLoop(MPIEventLoop):
             print(f"Waiting for {rank=} to be ready...")
             msg = await self.mpi_recv(rank)
             print(f"Received message from {rank=}!")
-            ready_msg = MPINodeReadyMessage(**msg.dict())
+            ready_msg = as_message(msg, MPINodeReadyMessage)
             queue = ready_msg.queue
             print(f"{rank=} is ready! queue is {queue}. Waiting for input...")
 
             # Wait until a task becomes available for the node
-            msg = await self.mqp_recv(queue)
+            msg = await self.local_recv(queue)
             # Forward the input to the node
             await self.mpi_send(msg, rank)
 
             # Check if it was a terminate message. If so, we can end our loop.
-            task_message = Message(**msg.dict())
+            task_message = msg
             if task_message.type == MessageType.Terminate:
                 break
 
             # It must have been an OperateTaskMessage. Read the output queue.
-            operate_message = OperateTaskMessage(**msg.dict())
+            operate_message = as_message(msg, OperateTaskMessage)
             output_queue = operate_message.output_queue
 
             # Get the output from the node
             output = await self.mpi_recv(rank)
             # Put the output on the message queue
-            await self.mqp_send(output, output_queue)
+            await self.local_send(output, output_queue)
 
     def start_event_loop(self):
         if self.started:
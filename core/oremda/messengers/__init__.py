@@ -1,10 +1,18 @@
+from contextlib import contextmanager
+import os
+from typing import Optional
+
 from .base import BaseMessenger
-from .mqp import MQPMessenger
+from .mqp import AsyncMQPMessenger, MQPMessenger
+from .uds import AsyncUDSMessenger, UDSMessenger, start_uds_broker
 
 __all__ = [
+    "AsyncMQPMessenger",
+    "AsyncUDSMessenger",
     "BaseMessenger",
     "MQPMessenger",
     "MPIMessenger",
+    "UDSMessenger",
 ]
 
 try:
@@ -13,13 +21,31 @@ except ImportError:
     MPIMessenger = None
 
 
+from oremda.constants import DEFAULT_LOCAL_MESSENGER, OREMDA_LOCAL_MESSENGER_ENV_VAR
 from oremda.plasma_client import PlasmaClient
 from oremda.typing import LocationType
 
+LOCAL_MESSENGERS = {
+    "mqp": (MQPMessenger, AsyncMQPMessenger),
+    "uds": (UDSMessenger, AsyncUDSMessenger),
+}
+
+
+def local_messenger_type() -> str:
+    """The local messenger, chosen by the OREMDA_LOCAL_MESSENGER variable"""
+    messenger_type = os.environ.get(
+        OREMDA_LOCAL_MESSENGER_ENV_VAR, DEFAULT_LOCAL_MESSENGER
+    )
+    if messenger_type not in LOCAL_MESSENGERS:
+        raise Exception(f"Unknown local messenger: {messenger_type}")
+
+    return messenger_type
+
 
 def Messenger(location: LocationType, plasma_client: PlasmaClient) -> BaseMessenger:
+    local_messenger_class, _ = LOCAL_MESSENGERS[local_messenger_type()]
     messengers = {
-        LocationType.Local: lambda: MQPMessenger(plasma_client),
+        LocationType.Local: lambda: local_messenger_class(plasma_client),
         LocationType.Remote: lambda: MPIMessenger() if MPIMessenger else None,
     }
 
@@ -27,3 +53,23 @@ def Messenger(location: LocationType, plasma_client: PlasmaClient) -> BaseMessen
         raise Exception("Remote messenger is not available")
 
     return messengers[location]()
+
+
+def AsyncMessenger(plasma_client: PlasmaClient):
+    """The local messenger, for asyncio"""
+    _, async_messenger_class = LOCAL_MESSENGERS[local_messenger_type()]
+    return async_messenger_class(plasma_client)
+
+
+@contextmanager
+def start_local_messenger(socket_path: Optional[str] = None):
+    """Start what the local messenger needs on this node
+
+    That is the message broker of the UDS messenger, listening on
+    ``socket_path``. The message queues need nothing.
+    """
+    if local_messenger_type() == "uds":
+        with start_uds_broker(socket_path):
+            yield
+    else:
+        yield
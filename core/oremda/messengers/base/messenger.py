@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 
 from oremda.typing import Message
 
@@ -21,3 +22,8 @@ class BaseMessenger(ABC):
         # Not every messenger needs to unlink, so the default does nothing.
         # Any messenger that needs to do anything should override this method.
         pass
+
+    def close(self, name: Optional[str] = None):
+        # Messengers that keep queues or connections open close them here,
+        # the one for ``name``, or all of them.
+        pass
@@ -0,0 +1,112 @@
+from typing import Any, Dict, Type
+
+import msgpack
+import numpy as np
+from pydantic.json import pydantic_encoder
+
+from oremda.plasma_client import PlasmaArray, PlasmaClient
+from oremda.typing import (
+    ErrorTaskMessage,
+    Message,
+    MessageType,
+    MPINodeReadyMessage,
+    OperateTaskMessage,
+    Port,
+    ResultTaskMessage,
+    TerminateTaskMessage,
+    TimingSpan,
+)
+
+# The msgpack extension types of the objects carried by the messages
+PORT_EXT = 1
+TIMING_SPAN_EXT = 2
+ARRAY_EXT = 3
+
+MESSAGE_CLASSES: Dict[MessageType, Type[Message]] = {
+    MessageType.Operate: OperateTaskMessage,
+    MessageType.Terminate: TerminateTaskMessage,
+    MessageType.Complete: ResultTaskMessage,
+    MessageType.MPINodeReady: MPINodeReadyMessage,
+    MessageType.Error: ErrorTaskMessage,
+}
+
+
+class MessageCodec:
+    """Encode messages with msgpack
+
+    The messages are decoded into the class of their type, OperateTaskMessage
+    for an operate message and so on, so the receiver needs not convert them.
+    With ``validate`` False, the messages are built without being validated,
+    which is only fine for the messages sent by oremda itself.
+
+    The data of the ports is sent as the id of its Plasma object, or with
+    ``embed_arrays``, as the array itself, which is put in the store of the
+    receiver. Arrays must be embedded where the sender and the receiver do
+    not share a store.
+    """
+
+    def __init__(
+        self,
+        plasma_client: PlasmaClient,
+        embed_arrays: bool = False,
+        validate: bool = False,
+    ):
+        self.plasma_client = plasma_client
+        self.embed_arrays = embed_arrays
+        self.validate = validate
+
+    def encode(self, msg: Message) -> bytes:
+        return msgpack.packb(msg, default=self._default)
+
+    def decode(self, serialized_msg: bytes) -> Message:
+        fields = msgpack.unpackb(
+            serialized_msg, ext_hook=self._ext_hook, strict_map_key=False
+        )
+        fields["type"] = message_type = MessageType(fields["type"])
+        cls = MESSAGE_CLASSES.get(message_type, Message)
+        if self.validate:
+            return cls(**fields)
+
+        return cls.construct(**fields)
+
+    def _default(self, obj: Any) -> Any:
+        if isinstance(obj, Port):
+            return msgpack.ExtType(PORT_EXT, self._pack_port(obj))
+
+        if isinstance(obj, TimingSpan):
+            span = [obj.name, obj.start, obj.end, obj.worker]
+            return msgpack.ExtType(TIMING_SPAN_EXT, msgpack.packb(span))
+
+        if isinstance(obj, np.ndarray):
+            array = [obj.dtype.str, obj.shape, np.ascontiguousarray(obj).data]
+            return msgpack.ExtType(ARRAY_EXT, msgpack.packb(array))
+
+        if isinstance(obj, Message):
+            return obj.__dict__
+
+        return pydantic_encoder(obj)
+
+    def _pack_port(self, port: Port) -> bytes:
+        data: Any = None
+        if isinstance(port.data, PlasmaArray):
+            data = port.data.data if self.embed_arrays else port.data.hex_id
+
+        return msgpack.packb([port.meta, data], default=self._default)
+
+    def _ext_hook(self, code: int, payload: bytes) -> Any:
+        if code == PORT_EXT:
+            meta, data = msgpack.unpackb(
+                payload, ext_hook=self._ext_hook, strict_map_key=False
+            )
+            array = None if data is None else PlasmaArray(self.plasma_client, data)
+            return Port.construct(meta=meta, data=array)
+
+        if code == TIMING_SPAN_EXT:
+            name, start, end, worker = msgpack.unpackb(payload)
+            return TimingSpan.construct(name=name, start=start, end=end, worker=worker)
+
+        if code == ARRAY_EXT:
+            dtype, shape, buffer = msgpack.unpackb(payload)
+            return np.frombuffer(buffer, dtype=dtype).reshape(shape)
+
+        return msgpack.ExtType(code, payload)
@@ -1,5 +1,6 @@
-from .messenger import MQPMessenger
+from .messenger import AsyncMQPMessenger, MQPMessenger
 
 __all__ = [
+    "AsyncMQPMessenger",
     "MQPMessenger",
 ]
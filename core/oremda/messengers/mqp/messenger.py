@@ -1,103 +1,213 @@
-import json
+import asyncio
+from typing import Optional
+
+import msgpack
+import numpy as np
+import posix_ipc
+import pyarrow.plasma as plasma
 
 from oremda.messengers.base import BaseMessenger
-from oremda.plasma_client import PlasmaArray
-from oremda.typing import Message, Port
+from oremda.messengers.codec import MessageCodec
+from oremda.typing import Message
+
+from .utils import DEFAULT_MAX_OPEN_QUEUES, QueueCache, unlink_queue, wait_for_queue
 
-from .utils import open_queue, unlink_queue
+# A message too large for its queue is put in the Plasma store, and only an
+# envelope with its object id, of this msgpack extension type, is sent
+SPILLED_EXT = 16
+SPILLED_HEADER = msgpack.packb(msgpack.ExtType(SPILLED_EXT, bytes(20)))[:3]
 
 
 class MQPMessenger(BaseMessenger):
     """Message Queues and Plasma messenger
 
-    Serializes a dict to json and sends it through the message queue. Any
-    plasma arrays will have their object id sent instead of the array. Any
-    numpy arrays will be placed in a plasma array, and the corresponding
-    object id sent instead of the array. The receiver will replace any
-    plasma object ids with their corresponding numpy arrays.
+    Serializes a message with msgpack and sends it through the message queue.
+    Any plasma arrays will have their object id sent instead of the array.
+    The receiver will replace any plasma object ids with their corresponding
+    plasma arrays. The messages are trusted, they are not validated again.
 
     The sender and receiver must be on the same node.
+
+    The queues are kept open across messages, until closed with close(), or
+    unlinked.
+
+    A message larger than the maximum message size of its queue is spilled:
+    it is put in the Plasma store, and the receiver takes it from there.
     """
 
-    def __init__(self, plasma_client):
+    def __init__(self, plasma_client, max_open_queues=DEFAULT_MAX_OPEN_QUEUES):
         self.plasma_client = plasma_client
+        self.codec = MessageCodec(plasma_client)
+        self.queues = QueueCache(max_open_queues)
 
     @property
     def type(self) -> str:
         return "mqp"
 
     def send(self, msg: Message, dest: str):
-        serialized_msg = self.detach_data(dict(msg))
-
-        with open_queue(dest, create=True, reuse=True) as queue:
-            queue.send(json.dumps(serialized_msg))
+        self.send_encoded(self.encode(msg), dest)
 
     def recv(self, source) -> Message:
-        with open_queue(source, create=True, reuse=True) as queue:
-            serialized_msg, priority = queue.receive()
-
-        serialized_msg = json.loads(serialized_msg)
-        msg = self.join_data(serialized_msg)
-        return Message(**msg)
+        return self.decode(self.recv_encoded(source))
+
+    def send_encoded(
+        self, serialized_msg: bytes, dest: str, timeout: Optional[float] = None
+    ):
+        """Send a message, waiting at most ``timeout`` seconds if given
+
+        Raises TimeoutError if the queue stayed full.
+        """
+        with self.queues.open(dest) as queue:
+            serialized_msg = self.spill(serialized_msg, queue.max_message_size)
+            try:
+                queue.send(serialized_msg, timeout=timeout)
+            except BaseException as e:
+                self.drop_spilled(serialized_msg)
+                if isinstance(e, posix_ipc.BusyError):
+                    raise TimeoutError(f"The queue {dest} is full")
+
+                raise
+
+    def recv_encoded(self, source: str, timeout: Optional[float] = None) -> bytes:
+        """Wait for a message, for at most ``timeout`` seconds if given
+
+        Raises TimeoutError if no message arrived in time.
+        """
+        with self.queues.open(source) as queue:
+            try:
+                serialized_msg, priority = queue.receive(timeout=timeout)
+            except posix_ipc.BusyError:
+                raise TimeoutError(f"No message was received from {source}")
+
+        return self.unspill(serialized_msg)
+
+    async def send_async(self, msg: Message, dest: str):
+        """Send a message without blocking the event loop if the queue is full"""
+        await self.send_encoded_async(self.encode(msg), dest)
+
+    async def recv_async(self, source: str) -> Message:
+        """Wait for a message without holding a thread"""
+        return self.decode(await self.recv_encoded_async(source))
+
+    async def send_encoded_async(
+        self, serialized_msg: bytes, dest: str, timeout: Optional[float] = None
+    ):
+        """Like send_encoded(), without blocking the event loop"""
+        try:
+            await asyncio.wait_for(self._send_async(serialized_msg, dest), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"The queue {dest} is full")
+
+    async def recv_encoded_async(
+        self, source: str, timeout: Optional[float] = None
+    ) -> bytes:
+        """Like recv_encoded(), without holding a thread"""
+        try:
+            return await asyncio.wait_for(self._recv_async(source), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"No message was received from {source}")
+
+    async def _send_async(self, serialized_msg: bytes, dest: str):
+        with self.queues.open(dest) as queue:
+            serialized_msg = self.spill(serialized_msg, queue.max_message_size)
+            try:
+                while True:
+                    try:
+                        queue.send(serialized_msg, timeout=0)
+                        return
+                    except posix_ipc.BusyError:
+                        await wait_for_queue(queue, writable=True)
+            except BaseException:
+                # Cancelled, or failed, before the message was sent
+                self.drop_spilled(serialized_msg)
+                raise
+
+    async def _recv_async(self, source: str) -> bytes:
+        with self.queues.open(source) as queue:
+            while True:
+                try:
+                    serialized_msg, priority = queue.receive(timeout=0)
+                    return self.unspill(serialized_msg)
+                except posix_ipc.BusyError:
+                    await wait_for_queue(queue)
+
+    def encode(self, msg: Message) -> bytes:
+        return self.codec.encode(msg)
+
+    def decode(self, serialized_msg: bytes) -> Message:
+        return self.codec.decode(serialized_msg)
+
+    def spill(self, serialized_msg: bytes, max_size: int) -> bytes:
+        """The message itself, or if it is too large, the envelope to send"""
+        if len(serialized_msg) <= max_size:
+            return serialized_msg
+
+        data = np.frombuffer(serialized_msg, dtype=np.uint8)
+        object_id = self.plasma_client.create_object(data)
+        return msgpack.packb(msgpack.ExtType(SPILLED_EXT, object_id.binary()))
+
+    def unspill(self, serialized_msg: bytes) -> bytes:
+        """The message, taken out of the store if it was spilled"""
+        object_id = self.spilled_object_id(serialized_msg)
+        if object_id is None:
+            return serialized_msg
+
+        data = self.plasma_client.get_object(object_id)
+        serialized_msg = data.tobytes()
+        # The store may only delete the object once it is no longer used
+        del data
+        self.plasma_client.delete_objects([object_id])
+        return serialized_msg
+
+    def drop_spilled(self, serialized_msg: bytes):
+        """Delete the spilled message of an envelope that was not sent"""
+        object_id = self.spilled_object_id(serialized_msg)
+        if object_id is not None:
+            self.plasma_client.delete_objects([object_id])
+
+    @staticmethod
+    def spilled_object_id(serialized_msg: bytes) -> Optional[plasma.ObjectID]:
+        if not serialized_msg.startswith(SPILLED_HEADER):
+            return None
+
+        return plasma.ObjectID(serialized_msg[len(SPILLED_HEADER) :])
 
     def unlink(self, source: str):
+        self.queues.close(source)
         unlink_queue(source)
 
-    def detach_data(self, original_msg: dict):
-        def recurse(cur, original_cur):
-            for key, val in original_cur.items():
-                if isinstance(val, Port):
-                    encoded = encode_port_key(key)
-                    serialized_port = {}
-                    if val.meta is not None:
-                        serialized_port["meta"] = val.meta
-                    if isinstance(val.data, PlasmaArray):
-                        serialized_port["data"] = val.data.hex_id
-                    cur[encoded] = serialized_port
-                elif isinstance(val, dict):
-                    cur[key] = {}
-                    recurse(cur[key], val)
-                else:
-                    cur[key] = val
-
-        msg = {}
-        recurse(msg, original_msg)
-        return msg
-
-    def join_data(self, original_msg: dict):
-        def recurse(cur, original_cur):
-            for key, val in original_cur.items():
-                if is_port_key(key):
-                    port = Port()
-                    decoded = decode_port_key(key)
-                    port.meta = val.get("meta")
-                    data = val.get("data")
-                    if data is not None:
-                        port.data = PlasmaArray(self.plasma_client, data)
-
-                    cur[decoded] = port
-                elif isinstance(val, dict):
-                    cur[key] = {}
-                    recurse(cur[key], val)
-                else:
-                    cur[key] = val
-
-        msg = {}
-        recurse(msg, original_msg)
-        return msg
-
-
-PORT_PREFIX = "port://"
-
-
-def encode_port_key(key: str) -> str:
-    return f"{PORT_PREFIX}{key}"
-
-
-def is_port_key(key: str) -> bool:
-    return key.startswith(PORT_PREFIX)
-
-
-def decode_port_key(key: str) -> str:
-    start = len(PORT_PREFIX) if key.startswith(PORT_PREFIX) else 0
-    return key[start:]
+    def close(self, name: Optional[str] = None):
+        """Close a queue, or every queue, without unlinking it"""
+        self.queues.close(name)
+
+
+class AsyncMQPMessenger:
+    """Message Queues and Plasma messenger, for asyncio
+
+    send() and recv() are coroutines. They wait on the queues through the
+    event loop, which polls the queue descriptors, instead of blocking a
+    thread of the executor. So a loop may forward many messages at the same
+    time without holding a thread for each one.
+
+    The messages are encoded like those of MQPMessenger, the two may talk to
+    each other.
+    """
+
+    def __init__(self, plasma_client, max_open_queues=DEFAULT_MAX_OPEN_QUEUES):
+        self.messenger = MQPMessenger(plasma_client, max_open_queues)
+
+    @property
+    def type(self) -> str:
+        return "mqp"
+
+    async def send(self, msg: Message, dest: str):
+        await self.messenger.send_async(msg, dest)
+
+    async def recv(self, source: str) -> Message:
+        return await self.messenger.recv_async(source)
+
+    def unlink(self, source: str):
+        self.messenger.unlink(source)
+
+    def close(self, name: Optional[str] = None):
+        self.messenger.close(name)
@@ -1,8 +1,19 @@
+import asyncio
+from collections import OrderedDict
 from contextlib import contextmanager
+import os
+import sys
+import threading
+from typing import Dict, Iterator, Optional
 
 import posix_ipc
 from posix_ipc import MessageQueue
 
+# The environment variables that size the message queues. They are passed on
+# to the operator containers, so that both ends create the queues alike.
+OREMDA_MQ_MAX_MESSAGES_ENV_VAR = "OREMDA_MQ_MAX_MESSAGES"
+OREMDA_MQ_MAX_MESSAGE_SIZE_ENV_VAR = "OREMDA_MQ_MAX_MESSAGE_SIZE"
+
 # Most linux systems default to a maximum memory that mqueues can use
 # to 819200 bytes (0.8192 megabytes).
 # This limit is reached if MAX_MESSAGES * MAX_MESAGE_SIZE is reached,
@@ -10,7 +21,20 @@ from posix_ipc import MessageQueue
 # Reduce the number of messages to 1 so that we can have ~100 queues
 # rather than just 10.
 # If the queue is full, then send() just blocks until it frees up.
-MAX_MESSAGES = 1
+# A deeper queue lets the senders go on, for fewer queues. A smaller message
+# size makes up for it, the larger messages are sent through Plasma anyway.
+# Sizes above 8192 bytes need the fs.mqueue.msgsize_max sysctl to be raised.
+MAX_MESSAGES = int(os.environ.get(OREMDA_MQ_MAX_MESSAGES_ENV_VAR, 1))
+MAX_MESSAGE_SIZE = int(os.environ.get(OREMDA_MQ_MAX_MESSAGE_SIZE_ENV_VAR, 8192))
+
+# On Linux, message queue descriptors are file descriptors that can be polled
+QUEUE_DESCRIPTORS_ARE_FDS = sys.platform.startswith("linux")
+
+# How often to retry, in seconds, where the descriptors can't be polled
+QUEUE_POLL_INTERVAL = 0.01
+
+# The message queues a messenger keeps open, each one holds a descriptor
+DEFAULT_MAX_OPEN_QUEUES = 64
 
 
 @contextmanager
@@ -35,18 +59,10 @@ def open_queue(name: str, create=False, consume=False, reuse=False):
     Yields:
         posix_ipc.MessageQueue: the message queue
     """
-    flags = 0
-    if create:
-        flags = posix_ipc.O_CREAT if reuse else posix_ipc.O_CREX
-
     queue = None
 
-    if not name.startswith("/"):
-        # Message queues requires that the name starts with "/"
-        name = f"/{name}"
-
     try:
-        queue = MessageQueue(name, flags=flags, max_messages=MAX_MESSAGES)
+        queue = create_queue(name, create, reuse)
         yield queue
     finally:
         if queue is not None:
@@ -55,6 +71,102 @@ def open_queue(name: str, create=False, consume=False, reuse=False):
                 queue.unlink()
 
 
+def create_queue(name: str, create=False, reuse=False) -> MessageQueue:
+    """Open a message queue, which the caller must close"""
+    flags = 0
+    if create:
+        flags = posix_ipc.O_CREAT if reuse else posix_ipc.O_CREX
+
+    if not name.startswith("/"):
+        # Message queues requires that the name starts with "/"
+        name = f"/{name}"
+
+    return MessageQueue(
+        name,
+        flags=flags,
+        max_messages=MAX_MESSAGES,
+        max_message_size=MAX_MESSAGE_SIZE,
+    )
+
+
+class _OpenQueue:
+    def __init__(self, queue: MessageQueue):
+        self.queue = queue
+        # The number of messages being sent or received through the queue
+        self.users = 0
+        # Whether the queue is closed once it has no users
+        self.detached = False
+
+
+class QueueCache:
+    """Keep message queues open across messages
+
+    Opening and closing a queue for every message costs two system calls.
+    The queues are opened on their first use instead, and kept open until
+    closed or unlinked. At most ``max_open`` idle queues are kept, the least
+    recently used ones are closed first.
+
+    A queue unlinked by another process is not noticed, a handle kept open
+    still refers to the unlinked queue. So the owner of a queue must only
+    unlink it once nothing will be sent through it anymore.
+    """
+
+    def __init__(self, max_open: int = DEFAULT_MAX_OPEN_QUEUES):
+        self.max_open = max_open
+        self._queues: "OrderedDict[str, _OpenQueue]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def open(self, name: str) -> Iterator[MessageQueue]:
+        """Use a queue, creating it if it does not exist"""
+        with self._lock:
+            entry = self._queues.get(name)
+            if entry is None:
+                entry = _OpenQueue(create_queue(name, create=True, reuse=True))
+                self._queues[name] = entry
+
+            self._queues.move_to_end(name)
+            entry.users += 1
+            self._evict()
+
+        try:
+            yield entry.queue
+        finally:
+            with self._lock:
+                entry.users -= 1
+                if entry.detached and entry.users == 0:
+                    entry.queue.close()
+                else:
+                    self._evict()
+
+    def close(self, name: Optional[str] = None):
+        """Close a queue, or every queue, once they are no longer used"""
+        with self._lock:
+            names = list(self._queues) if name is None else [name]
+            for x in names:
+                if x in self._queues:
+                    self._detach(x)
+
+    def _evict(self):
+        idle = [name for name, entry in self._queues.items() if entry.users == 0]
+        for name in idle[: max(len(self._queues) - self.max_open, 0)]:
+            self._detach(name)
+
+    def _detach(self, name: str):
+        entry = self._queues.pop(name)
+        entry.detached = True
+        if entry.users == 0:
+            entry.queue.close()
+
+
+def queue_environment_variables() -> Dict[str, str]:
+    """The sizes of the queues, to pass on to the operator containers"""
+    return {
+        OREMDA_MQ_MAX_MESSAGES_ENV_VAR: str(MAX_MESSAGES),
+        OREMDA_MQ_MAX_MESSAGE_SIZE_ENV_VAR: str(MAX_MESSAGE_SIZE),
+    }
+
+
 def unlink_queue(name: str):
     try:
         queue = MessageQueue(name)
@@ -64,3 +176,40 @@ def unlink_queue(name: str):
 
     queue.close()
     queue.unlink()
+
+
+async def wait_for_queue(queue: MessageQueue, writable=False):
+    """Wait until a message queue may be read from, or written to
+
+    The wait is driven by the event loop polling the queue descriptor, so no
+    thread is held while waiting. The caller must still handle the queue
+    being busy again by the time it is accessed.
+    """
+    if not QUEUE_DESCRIPTORS_ARE_FDS:
+        await asyncio.sleep(QUEUE_POLL_INTERVAL)
+        return
+
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    # The event loop allows one reader and one writer per descriptor. Others
+    # may wait on the same open queue, so wait on a descriptor of our own.
+    fd = os.dup(queue.mqd)
+
+    def ready():
+        if not future.done():
+            future.set_result(None)
+
+    if writable:
+        loop.add_writer(fd, ready)
+    else:
+        loop.add_reader(fd, ready)
+
+    try:
+        await future
+    finally:
+        if writable:
+            loop.remove_writer(fd)
+        else:
+            loop.remove_reader(fd)
+
+        os.close(fd)
@@ -0,0 +1,9 @@
+from .broker import UDSBroker, start_uds_broker
+from .messenger import AsyncUDSMessenger, UDSMessenger
+
+__all__ = [
+    "AsyncUDSMessenger",
+    "UDSBroker",
+    "UDSMessenger",
+    "start_uds_broker",
+]
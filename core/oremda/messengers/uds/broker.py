@@ -0,0 +1,262 @@
+import asyncio
+from collections import deque
+from contextlib import contextmanager
+import os
+import threading
+from typing import Deque, Dict, Optional, Set
+
+import msgpack
+
+from .utils import (
+    FRAME_HEADER,
+    RECV,
+    SEND,
+    UNLINK,
+    default_socket_path,
+    frame,
+    set_local_socket_path,
+)
+
+
+class MessageQueue:
+    def __init__(self):
+        self.messages: Deque[bytes] = deque()
+        self.waiters: Deque["BrokerConnection"] = deque()
+        self.unlinked = False
+
+    @property
+    def idle(self) -> bool:
+        return not self.messages and not self.waiters
+
+
+class BrokerConnection(asyncio.Protocol):
+    """The connection of a messenger to the broker
+
+    The requests are served as they arrive, in the callbacks of the event
+    loop, no task is created for them.
+    """
+
+    def __init__(self, broker: "UDSBroker"):
+        self.broker = broker
+        self.transport: Optional[asyncio.Transport] = None
+        self.buffer = bytearray()
+        # The queue this connection waits on, and the end of the wait
+        self.waiting: Optional[str] = None
+        self.timeout: Optional[asyncio.TimerHandle] = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.broker.connections.add(self)
+
+    def connection_lost(self, exc):
+        self.broker.connections.discard(self)
+        self.stop_waiting()
+
+    def data_received(self, data: bytes):
+        self.buffer += data
+        while len(self.buffer) >= FRAME_HEADER.size:
+            (size,) = FRAME_HEADER.unpack_from(self.buffer)
+            end = FRAME_HEADER.size + size
+            if len(self.buffer) < end:
+                return
+
+            request = bytes(self.buffer[FRAME_HEADER.size : end])
+            del self.buffer[:end]
+            if self.waiting is not None or not self.serve(request):
+                # Not a messenger, it sends nothing while it waits for a reply
+                self.transport.close()
+                return
+
+    def serve(self, request: bytes) -> bool:
+        try:
+            op, name, arg = msgpack.unpackb(request)
+        except (TypeError, ValueError):
+            return False
+
+        if op == SEND:
+            self.broker.put(name, arg)
+        elif op == RECV:
+            self.broker.get(name, arg, self)
+        elif op == UNLINK:
+            self.broker.unlink(name)
+        else:
+            return False
+
+        return True
+
+    def wait(self, name: str, timeout: Optional[float]):
+        self.waiting = name
+        if timeout is not None:
+            loop = asyncio.get_running_loop()
+            self.timeout = loop.call_later(timeout, self.expire)
+
+    def deliver(self, msg: bytes) -> bool:
+        """Reply with a message, False if the messenger is gone"""
+        if self.transport.is_closing():
+            return False
+
+        self.stop_waiting()
+        self.transport.write(frame(msg))
+        return True
+
+    def expire(self):
+        self.timeout = None
+        self.stop_waiting()
+        self.transport.write(frame(b""))
+
+    def stop_waiting(self):
+        if self.timeout is not None:
+            self.timeout.cancel()
+            self.timeout = None
+
+        if self.waiting is not None:
+            name, self.waiting = self.waiting, None
+            self.broker.drop_waiter(name, self)
+
+
+class UDSBroker:
+    """Hold the message queues of the UDS messengers of a node
+
+    The messengers connect to the Unix domain socket of the broker, and keep
+    their connection open. Each request, and each reply, is a frame: the
+    length of its payload, followed by the payload.
+
+    A request is a msgpack list, [SEND, queue, message], [RECV, queue,
+    timeout] or [UNLINK, queue, None]. Only RECV is replied to, with the
+    message, or an empty frame if none arrived in time. The requests of a
+    connection are served in order, so a message sent is in its queue before
+    the next request of the messenger is served.
+
+    The queues are created as they are used, and they are not bounded, so a
+    send never waits. Like a message queue, an unlinked queue is only removed
+    once the messages left in it have been received.
+
+    The broker runs its own event loop, in a thread of the process that
+    starts it.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None):
+        self.socket_path = socket_path or default_socket_path()
+        self.queues: Dict[str, MessageQueue] = {}
+        self.connections: Set[BrokerConnection] = set()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+
+    def start(self):
+        if os.path.exists(self.socket_path):
+            # Left behind by a broker that did not stop
+            os.unlink(self.socket_path)
+
+        started = threading.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(
+            target=self._run, args=(started,), name="uds-broker", daemon=True
+        )
+        self.thread.start()
+        started.wait()
+
+        if self.error is not None:
+            raise Exception(f"Failed to start the message broker: {self.error}")
+
+    def stop(self):
+        if self.thread is None:
+            return
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.thread = None
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def _run(self, started: threading.Event):
+        loop = self.loop
+        asyncio.set_event_loop(loop)
+        try:
+            server = loop.run_until_complete(
+                loop.create_unix_server(
+                    lambda: BrokerConnection(self), path=self.socket_path
+                )
+            )
+        except Exception as e:
+            self.error = e
+            loop.close()
+            started.set()
+            return
+
+        started.set()
+        try:
+            loop.run_forever()
+        finally:
+            server.close()
+            for connection in list(self.connections):
+                connection.transport.close()
+
+            # Let the transports close
+            loop.run_until_complete(asyncio.sleep(0))
+            loop.close()
+
+    def queue(self, name: str) -> MessageQueue:
+        queue = self.queues.get(name)
+        if queue is None:
+            queue = self.queues[name] = MessageQueue()
+
+        return queue
+
+    def put(self, name: str, msg: bytes):
+        queue = self.queue(name)
+        while queue.waiters:
+            if queue.waiters[0].deliver(msg):
+                return
+
+            queue.waiters.popleft()
+
+        queue.messages.append(msg)
+
+    def get(self, name: str, timeout: Optional[float], connection: BrokerConnection):
+        """Reply with the next message, once there is one"""
+        queue = self.queue(name)
+        if queue.messages:
+            if connection.deliver(queue.messages[0]):
+                queue.messages.popleft()
+                self.collect(name)
+        elif timeout is not None and timeout <= 0:
+            connection.transport.write(frame(b""))
+        else:
+            queue.waiters.append(connection)
+            connection.wait(name, timeout)
+
+    def drop_waiter(self, name: str, connection: BrokerConnection):
+        queue = self.queues.get(name)
+        if queue is not None and connection in queue.waiters:
+            queue.waiters.remove(connection)
+            self.collect(name)
+
+    def unlink(self, name: str):
+        queue = self.queues.get(name)
+        if queue is not None:
+            queue.unlinked = True
+            self.collect(name)
+
+    def collect(self, name: str):
+        """Remove a queue that was unlinked, once it is idle"""
+        queue = self.queues.get(name)
+        if queue is not None and queue.unlinked and queue.idle:
+            del self.queues[name]
+
+
+@contextmanager
+def start_uds_broker(socket_path: Optional[str] = None):
+    """Run a message broker, for the UDS messengers of this node
+
+    The UDS messengers created by this process use this broker by default.
+    """
+    broker = UDSBroker(socket_path)
+    broker.start()
+    set_local_socket_path(broker.socket_path)
+    try:
+        yield broker
+    finally:
+        set_local_socket_path(None)
+        broker.stop()
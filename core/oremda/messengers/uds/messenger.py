@@ -0,0 +1,231 @@
+import asyncio
+import socket
+import threading
+from typing import Any, List, Optional, Tuple
+from weakref import WeakKeyDictionary
+
+import msgpack
+
+from oremda.messengers.base import BaseMessenger
+from oremda.messengers.codec import MessageCodec
+from oremda.typing import Message
+
+from .utils import (
+    MAX_IDLE_CONNECTIONS,
+    RECV,
+    SEND,
+    UNLINK,
+    default_socket_path,
+    frame,
+    queue_name,
+    read_frame,
+    recv_frame,
+)
+
+Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+class UDSMessenger(BaseMessenger):
+    """Unix domain socket messenger
+
+    Sends the messages through the message broker of the node, over its Unix
+    domain socket in the oremda var directory. Messages are encoded like
+    those of MQPMessenger, plasma arrays have their object id sent instead of
+    the array, and the sender and receiver must be on the same node.
+
+    Unlike the message queues, the broker is not limited by the kernel in the
+    number of queues, or in the size of the messages. So many more operator
+    containers may run on a node, and no message needs to be spilled to
+    Plasma. The queues are not bounded, sends never wait.
+
+    The connections to the broker are pooled, and shared by the threads,
+    while each event loop has a pool of its own. The pooled connections stay
+    open until closed with close().
+    """
+
+    def __init__(self, plasma_client, socket_path: Optional[str] = None):
+        self.plasma_client = plasma_client
+        self.socket_path = socket_path or default_socket_path()
+        self.codec = MessageCodec(plasma_client)
+        self._lock = threading.Lock()
+        self._sockets: List[socket.socket] = []
+        self._pools: WeakKeyDictionary = WeakKeyDictionary()
+
+    @property
+    def type(self) -> str:
+        return "uds"
+
+    def send(self, msg: Message, dest: str):
+        self.send_encoded(self.encode(msg), dest)
+
+    def recv(self, source: str) -> Message:
+        return self.decode(self.recv_encoded(source))
+
+    def send_encoded(
+        self, serialized_msg: bytes, dest: str, timeout: Optional[float] = None
+    ):
+        """Send a message, the timeout is only there to match MQPMessenger"""
+        self._request(SEND, dest, serialized_msg)
+
+    def recv_encoded(self, source: str, timeout: Optional[float] = None) -> bytes:
+        """Wait for a message, for at most ``timeout`` seconds if given
+
+        Raises TimeoutError if no message arrived in time.
+        """
+        serialized_msg = self._request(RECV, source, timeout)
+        if not serialized_msg:
+            raise TimeoutError(f"No message was received from {source}")
+
+        return serialized_msg
+
+    async def send_async(self, msg: Message, dest: str):
+        await self.send_encoded_async(self.encode(msg), dest)
+
+    async def recv_async(self, source: str) -> Message:
+        return self.decode(await self.recv_encoded_async(source))
+
+    async def send_encoded_async(
+        self, serialized_msg: bytes, dest: str, timeout: Optional[float] = None
+    ):
+        await self._request_async(SEND, dest, serialized_msg)
+
+    async def recv_encoded_async(
+        self, source: str, timeout: Optional[float] = None
+    ) -> bytes:
+        """Like recv_encoded(), without holding a thread
+
+        The broker times the wait out. A message received while the wait is
+        cancelled is lost, like the message of a queue unlinked before it is
+        received.
+        """
+        serialized_msg = await self._request_async(RECV, source, timeout)
+        if not serialized_msg:
+            raise TimeoutError(f"No message was received from {source}")
+
+        return serialized_msg
+
+    def encode(self, msg: Message) -> bytes:
+        return self.codec.encode(msg)
+
+    def decode(self, serialized_msg: bytes) -> Message:
+        return self.codec.decode(serialized_msg)
+
+    def unlink(self, source: str):
+        self._request(UNLINK, source)
+
+    def close(self, name: Optional[str] = None):
+        """Close the connections to the broker
+
+        The connections are shared by the queues, so closing a single queue
+        does nothing.
+        """
+        if name is not None:
+            return
+
+        with self._lock:
+            sockets, self._sockets = self._sockets, []
+            pools = list(self._pools.items())
+            self._pools.clear()
+
+        for sock in sockets:
+            sock.close()
+
+        for loop, connections in pools:
+            if loop.is_closed():
+                continue
+
+            for reader, writer in connections:
+                loop.call_soon_threadsafe(writer.close)
+
+    def _request(self, op: int, name: str, arg: Any = None) -> bytes:
+        """Send a request, and wait for its reply if it has one"""
+        sock = self._connection()
+        try:
+            sock.sendall(frame(msgpack.packb([op, queue_name(name), arg])))
+            reply = recv_frame(sock) if op == RECV else b""
+        except BaseException:
+            # The reply may be left unread, the connection can't be used again
+            sock.close()
+            raise
+
+        with self._lock:
+            if len(self._sockets) < MAX_IDLE_CONNECTIONS:
+                self._sockets.append(sock)
+                sock = None
+
+        if sock is not None:
+            sock.close()
+
+        return reply
+
+    async def _request_async(self, op: int, name: str, arg: Any = None) -> bytes:
+        reader, writer = await self._connection_async()
+        try:
+            writer.write(frame(msgpack.packb([op, queue_name(name), arg])))
+            await writer.drain()
+            reply = await read_frame(reader) if op == RECV else b""
+        except BaseException:
+            writer.close()
+            raise
+
+        with self._lock:
+            self._pools.setdefault(asyncio.get_running_loop(), []).append(
+                (reader, writer)
+            )
+
+        return reply
+
+    def _connection(self) -> socket.socket:
+        """An idle connection of the pool, or a new one"""
+        with self._lock:
+            if self._sockets:
+                return self._sockets.pop()
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            raise Exception(f"No message broker at {self.socket_path}: {e}")
+
+        return sock
+
+    async def _connection_async(self) -> Connection:
+        """A connection of the pool of the running loop, or a new one"""
+        with self._lock:
+            pool = self._pools.get(asyncio.get_running_loop())
+            if pool:
+                return pool.pop()
+
+        try:
+            return await asyncio.open_unix_connection(self.socket_path)
+        except OSError as e:
+            raise Exception(f"No message broker at {self.socket_path}: {e}")
+
+
+class AsyncUDSMessenger:
+    """Unix domain socket messenger, for asyncio
+
+    send() and recv() are coroutines, which wait on the broker through the
+    event loop. The messages are encoded like those of UDSMessenger, the two
+    may talk to each other.
+    """
+
+    def __init__(self, plasma_client, socket_path: Optional[str] = None):
+        self.messenger = UDSMessenger(plasma_client, socket_path)
+
+    @property
+    def type(self) -> str:
+        return "uds"
+
+    async def send(self, msg: Message, dest: str):
+        await self.messenger.send_async(msg, dest)
+
+    async def recv(self, source: str) -> Message:
+        return await self.messenger.recv_async(source)
+
+    def unlink(self, source: str):
+        self.messenger.unlink(source)
+
+    def close(self, name: Optional[str] = None):
+        self.messenger.close(name)
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import socket
+import struct
+from typing import Optional
+
+from oremda.constants import DEFAULT_OREMDA_VAR_DIR
+from oremda.utils.mpi import mpi_rank
+
+# Every frame starts with the length of its payload, as a big endian uint32
+FRAME_HEADER = struct.Struct("!I")
+
+# How much of a reply is received at once
+RECV_BUFFER_SIZE = 65536
+
+# The idle connections a messenger keeps to the broker, beyond them the
+# connections are closed once their request completes
+MAX_IDLE_CONNECTIONS = 8
+
+# The requests of the messengers to the broker, [request, queue name, argument]
+SEND = 0
+RECV = 1
+UNLINK = 2
+
+if mpi_rank == 0:
+    _broker_sock = "messages.sock"
+else:
+    _broker_sock = f"messages_{mpi_rank}.sock"
+
+# The socket of the broker started by this process, if any
+_local_socket_path: Optional[str] = None
+
+
+def broker_socket_path(var_dir: str) -> str:
+    return os.path.join(var_dir, _broker_sock)
+
+
+def default_socket_path() -> str:
+    """The socket of the broker of this node
+
+    That is the broker started by this process, or else the one in the oremda
+    var directory.
+    """
+    if _local_socket_path is not None:
+        return _local_socket_path
+
+    var_dir = os.environ.get("OREMDA_VAR_DIR") or DEFAULT_OREMDA_VAR_DIR
+    return broker_socket_path(var_dir)
+
+
+def set_local_socket_path(socket_path: Optional[str]):
+    global _local_socket_path
+    _local_socket_path = socket_path
+
+
+def queue_name(name: str) -> str:
+    # Named like the message queues, so both messengers name them alike
+    if not name.startswith("/"):
+        name = f"/{name}"
+
+    return name
+
+
+def frame(payload: bytes) -> bytes:
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+    """Receive the reply to a request
+
+    A single reply is expected, so whatever is received belongs to it, and is
+    received in as few calls as possible.
+    """
+    buffer = bytearray()
+    end = None
+    while end is None or len(buffer) < end:
+        chunk = sock.recv(RECV_BUFFER_SIZE)
+        if not chunk:
+            raise ConnectionError("The message broker closed the connection")
+
+        buffer += chunk
+        if end is None and len(buffer) >= FRAME_HEADER.size:
+            (size,) = FRAME_HEADER.unpack_from(buffer)
+            end = FRAME_HEADER.size + size
+
+    return bytes(buffer[FRAME_HEADER.size : end])
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes:
+    (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    return await reader.readexactly(size)
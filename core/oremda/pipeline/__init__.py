@@ -1,4 +1,9 @@
+import asyncio
+import itertools
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 import logging
+import time
 
 from oremda.typing import (
     DisplayNodeJSON,
@@ -8,6 +13,7 @@ from oremda.typing import (
     JSONType,
     NodeJSON,
     OperatorNodeJSON,
+    PipelineDiffJSON,
     PipelineJSON,
     Port,
     PortKey,
@@ -15,7 +21,9 @@ from oremda.typing import (
 )
 from typing import (
     Any,
+    Iterable,
     Iterator,
+    List,
     Optional,
     Dict,
     Sequence,
@@ -26,14 +34,27 @@ from typing import (
     Tuple,
 )
 from oremda.pipeline.operator import OperatorException, OperatorHandle
+from oremda.pipeline.cache import OperatorResultCache
+from oremda.pipeline.deadline import Deadline, RunCancelled, RunToken
+from oremda.pipeline.lanes import LaneCallback, LaneRun
+from oremda.pipeline.memory import MemoryBudget
+from oremda.pipeline.plan import ExecutionPlan, compile_plan, equivalent_operators
+from oremda.pipeline.report import ExecutionRecord, RunReport, analyze_run
+from oremda.pipeline.trace import Trace
 from oremda.utils.id import unique_id, port_id
+from oremda.utils.timing import timed
 from oremda.typing import PortType, NodeType, IOType
 from oremda.registry import Registry
-from oremda.plasma_client import PlasmaClient
+from oremda.plasma_client import PlasmaArray, PlasmaClient
 from oremda.display import DisplayFactory, DisplayHandle, NoopDisplayHandle
+from oremda.display.worker import RenderWorker
 
 logger = logging.getLogger("oremda")
 
+# The default number of operators that may be executing at the same time when
+# running a pipeline concurrently. The threads only wait on the containers.
+DEFAULT_MAX_IN_FLIGHT = 16
+
 
 class PipelineEdge:
     def __init__(
@@ -151,6 +172,17 @@ def validate_edge(
 T = TypeVar("T")
 
 
+def hashable(value: Any) -> Any:
+    """Convert the lists of a JSON value to tuples, so it can be a key"""
+    if isinstance(value, (list, tuple)):
+        return tuple(hashable(x) for x in value)
+
+    if isinstance(value, dict):
+        return tuple((k, hashable(v)) for k, v in value.items())
+
+    return value
+
+
 def node_iter(
     nodes: Dict[IdType, PipelineNode], cls: Type[T]
 ) -> Iterator[Tuple[IdType, T]]:
@@ -170,7 +202,32 @@ class Pipeline:
         self.edges: Dict[IdType, PipelineEdge] = {}
         self.node_to_edges: Dict[IdType, Set[IdType]] = {}
         self.ports: Dict[str, Port] = {}
+        # Ports that are never released during a run, keyed by port id
+        self.keep_ports: Set[str] = set()
+        # Ports currently shown by the displays, keyed by port id
+        self.display_ports: Dict[str, Port] = {}
+        self.cache: Optional[OperatorResultCache] = None
+        # Holds operators back until their outputs fit in the store, if set
+        self.memory: Optional[MemoryBudget] = None
+        # Records the timings of the operator executions, if set
+        self.trace: Optional[Trace] = None
+        # When the operators of the last run ran, see report()
+        self.executions: Dict[IdType, ExecutionRecord] = {}
         self.observer: PipelineObserver = PipelineObserver()
+        self.plan: ExecutionPlan = compile_plan(self.nodes, self.edges)
+        # Operators whose outputs are out of date
+        self.dirty: Set[IdType] = set()
+        # Operators that duplicate another one, and the operator they duplicate
+        self.equivalent: Dict[IdType, IdType] = {}
+        self._consumers: Dict[str, int] = {}
+        # The operators merged into the ones executed by the current run
+        self._merged: Dict[IdType, List[IdType]] = {}
+        self._aliases: Set[IdType] = set()
+        # The ports returned by sweep(), held until the pipeline is released
+        self._sweep_ports: List[Port] = []
+        self._retain = False
+        # Cancels the current run, see cancel()
+        self._token = RunToken()
 
     @property
     def id(self):
@@ -184,11 +241,107 @@ class Pipeline:
             if node.operator is not None
         )
 
-    def start_containers(self):
+    def start_containers(self, prune: bool = False):
         # They should all be already registered
-        self.registry.start_containers()
+        if prune:
+            self.registry.start_containers(self.targeted_image_names)
+        else:
+            self.registry.start_containers()
+
+        # The digests are resolved as the containers start, so that the
+        # results of an image rebuilt under the same name are not reused
+        for _, node in node_iter(self.nodes, OperatorNode):
+            operator = node.operator
+            if operator is not None:
+                operator.digest = (
+                    self.registry.digest(operator.image_name) or operator.image_name
+                )
+
+    def targeted_operators(self) -> Set[IdType]:
+        """The operators needed to produce the targets of the pipeline
+
+        The targets are the display nodes, and the ports marked with keep().
+        Operators that do not feed any of them are dead, and are skipped by
+        run(prune=True).
+        """
+        targets: Set[IdType] = set()
+        for node_id in self.plan.order:
+            node = self.nodes[node_id]
+            if any(port_id(node_id, name) in self.keep_ports for name in node.outputs):
+                targets.add(node_id)
+
+            for edge in self.plan.output_edges[node_id]:
+                if self.nodes[edge.input_node_id].type == NodeType.Display:
+                    targets.add(node_id)
+
+        return self.plan.upstream(targets)
+
+    @property
+    def targeted_image_names(self):
+        operator_ids = self.targeted_operators()
+        return set(
+            node.operator.image_name
+            for node_id, node in node_iter(self.nodes, OperatorNode)
+            if node.operator is not None and node_id in operator_ids
+        )
+
+    def keep(self, node_id: IdType, port_name: PortKey):
+        """Keep an output port alive after its consumers have run
+
+        Kept ports are available in ``self.ports`` until the next run, or until
+        the pipeline is released. This is needed for any output that a caller
+        wants to read once the run has completed.
+        """
+        self.keep_ports.add(port_id(node_id, port_name))
+
+    def release(self):
+        """Release every port still held by the pipeline, kept ports included
+
+        Every operator is dirty afterwards, as none of their outputs remain.
+        """
+        for source_port_id in [*self.ports, *self.display_ports]:
+            self._drop_port(source_port_id)
+
+        for port in self._sweep_ports:
+            self.client.release(cast(PlasmaArray, port.data).object_id)
+
+        self._sweep_ports = []
+        self.dirty = set(self.plan.order)
+
+    def close(self):
+        """Release the pipeline for good, once it will not run again
+
+        The ports are released, and the output queues of the operators, kept
+        from one execution to the next, are removed.
+        """
+        self.release()
+        self._close_operators(self.nodes.values())
+
+    def _close_operators(self, nodes: Iterable[PipelineNode]):
+        for node in nodes:
+            if isinstance(node, OperatorNode) and node.operator is not None:
+                node.operator.close()
+
+    def cancel(self):
+        """Cancel the current run
+
+        No more operators are dispatched, the running ones are abandoned and
+        their results dropped when they arrive, and the ports held so far are
+        released. It may be called from any thread.
+        """
+        self._token.cancel()
 
     def set_graph(self, nodes: Sequence[PipelineNode], edges: Sequence[PipelineEdge]):
+        # Operators that a new node still uses must stay open
+        kept = {id(getattr(node, "operator", node)) for node in nodes}
+        removed = [
+            x for x in self.nodes.values() if id(getattr(x, "operator", x)) not in kept
+        ]
+        self._set_graph(nodes, edges)
+        self.release()
+        self._close_operators(removed)
+
+    def _set_graph(self, nodes: Iterable[PipelineNode], edges: Iterable[PipelineEdge]):
         self_nodes: Dict[IdType, PipelineNode] = {}
         self_edges: Dict[IdType, PipelineEdge] = {}
         self_node_to_edges: Dict[IdType, Set[IdType]] = {}
@@ -219,16 +372,16 @@ class Pipeline:
             self_node_to_edges.setdefault(output_node.id, set()).add(edge.id)
             self_node_to_edges.setdefault(input_node.id, set()).add(edge.id)
 
+        plan = compile_plan(self_nodes, self_edges)
+
         # Verify that all the required operator input ports have a connection
-        for node in nodes:
+        for node in self_nodes.values():
 
             required_input_ports = {
                 port.name for port in node.inputs.values() if port.required
             }
             existing_input_ports = {
-                self_edges[edge_id].input_port.name
-                for edge_id in self_node_to_edges[node.id]
-                if self_edges[edge_id].input_node_id == node.id
+                edge.input_port.name for edge in plan.input_edges[node.id]
             }
             missing_input_ports = required_input_ports.difference(existing_input_ports)
 
@@ -241,108 +394,910 @@ class Pipeline:
         self.nodes = self_nodes
         self.edges = self_edges
         self.node_to_edges = self_node_to_edges
-        self.ports = {}
+        self.plan = plan
+        self.equivalent = equivalent_operators(self_nodes, plan)
+
+    def update(self, diff: PipelineDiffJSON) -> Set[IdType]:
+        """Apply a diff to the graph, and invalidate the affected operators
+
+        The operators whose parameters or input edges changed are marked as
+        dirty, along with everything downstream of them. The ports of the other
+        operators are preserved, so a following run(incremental=True) only
+        executes the dirty operators.
+
+        Returns the operators invalidated by the diff.
+        """
+        invalidated: Set[IdType] = set()
+        parameters: Dict[IdType, JSONType] = {}
+
+        for node_id, params in diff.params.items():
+            node = self.nodes.get(node_id)
+            if not isinstance(node, OperatorNode) or node.operator is None:
+                raise Exception(f"The operator node {node_id} does not exist.")
+
+            updated = {**node.operator.parameters, **params}
+            if updated != node.operator.parameters:
+                parameters[node_id] = updated
+                invalidated.add(node_id)
+
+        edges = dict(self.edges)
+        removed_edges: List[PipelineEdge] = []
+
+        for _edge in diff.removed_edges:
+            edge = deserialize_edge(_edge)
+            matches = [id for id, e in edges.items() if same_edge(e, edge)]
+            if not matches:
+                raise Exception(
+                    f"The edge from {edge.output_node_id} to {edge.input_node_id} "
+                    "does not exist."
+                )
+
+            for edge_id in matches:
+                removed_edges.append(edges.pop(edge_id))
+
+        for _edge in diff.added_edges:
+            edge = deserialize_edge(_edge)
+            edges[edge.id] = edge
+
+        # Validate the new graph before changing anything
+        if diff.added_edges or diff.removed_edges:
+            self._set_graph(self.nodes.values(), edges.values())
+
+        for node_id, params in parameters.items():
+            operator = cast(OperatorNode, self.nodes[node_id]).operator
+            cast(OperatorHandle, operator).parameters = params
+
+        if parameters:
+            self.equivalent = equivalent_operators(self.nodes, self.plan)
+
+        for edge in removed_edges:
+            input_node = self.nodes[edge.input_node_id]
+            if isinstance(input_node, DisplayNode):
+                if input_node.display is not None:
+                    input_node.display.remove(edge.output_node_id)
+            else:
+                invalidated.add(edge.input_node_id)
+
+        for _edge in diff.added_edges:
+            if self.nodes[_edge.stop.id].type == NodeType.Display:
+                # The display ports are not kept, run the source again
+                invalidated.add(_edge.start.id)
+            else:
+                invalidated.add(_edge.stop.id)
+
+        invalidated = self.plan.downstream(invalidated)
+        self.dirty.update(invalidated)
 
-    def run(self):
+        return invalidated
+
+    def run(
+        self,
+        concurrent: bool = False,
+        max_in_flight: Optional[int] = None,
+        incremental: bool = False,
+        prune: bool = False,
+        timeout: Optional[float] = None,
+        retain: bool = True,
+    ):
+        """Run the operators of the pipeline
+
+        By default operators are run one at a time. If ``concurrent`` is True,
+        every operator whose inputs are available is dispatched to its
+        container right away, so independent branches of the graph overlap.
+        ``max_in_flight`` caps the number of operators executing at the same
+        time. If ``memory`` is set, the operators are also held back while
+        their outputs would not fit in the Plasma store (see MemoryBudget).
+
+        Every data port is released from the Plasma store as soon as the last
+        operator reading it has completed, unless it was marked with keep().
+
+        If ``incremental`` is True, only the dirty operators (see update()) are
+        run, reusing the ports of the others, and the ports are kept after the
+        run for the next incremental one. If ``retain`` is False, the ports
+        are released as soon as they are read instead, like in a full run, and
+        the next incremental run executes again the operators upstream of the
+        dirty ones whose outputs were released.
+
+        If ``prune`` is True, only the operators feeding a display or a kept
+        port are run (see targeted_operators()), and the containers of the
+        other operators are not started.
+
+        If ``timeout`` is given, the run is cancelled (see cancel()) after that
+        many seconds. An operator is also abandoned, failing the run, once it
+        exceeds the ``timeout`` of its configuration.
+        """
+        # Before the containers start, so the run may be cancelled meanwhile
+        self._token = RunToken(timeout)
+        self.start_containers(prune)
+        if self._token.cancelled:
+            self._end_run(False)
+            return
+
+        operator_ids = self._prepare_run(incremental, prune, retain)
+
+        self.observer.on_start(self)
+
+        if concurrent:
+            completed = self._run_concurrent(operator_ids, max_in_flight)
+        else:
+            completed = self._run_serial(operator_ids)
+
+        self._end_run(completed)
+
+    async def run_async(
+        self,
+        max_in_flight: Optional[int] = None,
+        incremental: bool = False,
+        prune: bool = False,
+        timeout: Optional[float] = None,
+        retain: bool = True,
+    ):
+        """Run the operators of the pipeline on the running event loop
+
+        This schedules the operators like run(concurrent=True), but every
+        operator is a task waiting on its message queue, so no thread is held
+        while the containers are working.
+        """
+        self._token = RunToken(timeout)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.start_containers, prune)
+        if self._token.cancelled:
+            self._end_run(False)
+            return
+
+        operator_ids = self._prepare_run(incremental, prune, retain)
+
+        self.observer.on_start(self)
+
+        completed = await self._run_async(operator_ids, max_in_flight)
+
+        self._end_run(completed)
+
+    def run_batch(
+        self,
+        items: Sequence[Dict[IdType, JSONType]],
+        on_item: Optional[LaneCallback] = None,
+        max_in_flight: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """Stream a sequence of parameter overrides through the pipeline
+
+        Each item maps operator node ids to the parameters overridden for that
+        item, e.g. ``{reader_id: {"filename": "scan_0001.dm4"}}``. The
+        containers are started once for the whole batch, and the items are
+        pipelined: an operator may process the next item while its consumers
+        process the current one. The operators that do not depend on any
+        overridden parameter run only once, and like in run(), equivalent
+        operators are merged within and across the items.
+
+        ``on_item`` is called with the index of every item as it completes,
+        and its ports marked with keep(), keyed by port id. The ports are
+        released once it returns, so it must copy what it needs.
+
+        ``timeout`` bounds the duration of the whole batch, see run().
+
+        Returns True if every item completed.
+        """
+        if max_in_flight is None:
+            max_in_flight = DEFAULT_MAX_IN_FLIGHT
+
+        self._token = RunToken(timeout)
         self.start_containers()
+        if self._token.cancelled:
+            self._end_run(False)
+            return False
 
         for _, node in node_iter(self.nodes, DisplayNode):
             if node.display is not None:
                 node.display.clear()
 
-        all_operators = set(map(lambda t: t[0], node_iter(self.nodes, OperatorNode)))
-        run_operators = set()
+        self.release()
+        self.executions = {}
+
+        lanes = LaneRun(self, items, on_item)
 
         self.observer.on_start(self)
 
-        while all_operators.difference(run_operators):
-            count = 0
-            for operator_id, operator_node in node_iter(self.nodes, OperatorNode):
-                if operator_id in run_operators:
+        try:
+            completed = lanes.run(max_in_flight)
+        finally:
+            # The lanes abandoned when the batch failed may still get results,
+            # don't leave them in the store until the pipeline is closed
+            for _, node in node_iter(self.nodes, OperatorNode):
+                if node.operator is not None:
+                    node.operator.drop_late_results()
+
+        self._end_run(completed)
+
+        return completed
+
+    def sweep(
+        self,
+        grid: Dict[IdType, Dict[str, Sequence[JSONType]]],
+        max_in_flight: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[Tuple, Dict[str, Port]]:
+        """Run the pipeline over every combination of some parameter values
+
+        ``grid`` maps operator node ids to the values to sweep for some of
+        their parameters, e.g. ``{blur_id: {"sigma": [1, 2, 4]}}``. The
+        operators upstream of the swept ones run only once, and the sweep
+        points are dispatched in parallel.
+
+        Returns the ports marked with keep() for every sweep point, keyed by
+        port id. The sweep points are keyed by the tuple of their values, in
+        the order of the grid. The ports are held until release() is called,
+        or the pipeline is run again.
+
+        Raises RunCancelled if the sweep was cancelled or timed out, and an
+        exception naming the failed sweep points if any of them failed. The
+        ports of the points that completed are released in both cases.
+        """
+        axes = [
+            (node_id, name, values)
+            for node_id, params in grid.items()
+            for name, values in params.items()
+        ]
+
+        points = list(itertools.product(*(values for _, _, values in axes)))
+        items: List[Dict[IdType, JSONType]] = []
+        for point in points:
+            item: Dict[IdType, JSONType] = {}
+            for (node_id, name, _), value in zip(axes, point):
+                item.setdefault(node_id, {})[name] = value
+
+            items.append(item)
+
+        results: Dict[Tuple, Dict[str, Port]] = {}
+
+        def on_item(index: int, outputs: Dict[str, Port]):
+            for port in outputs.values():
+                if port.data is not None:
+                    self.client.retain(cast(PlasmaArray, port.data).object_id)
+                    self._sweep_ports.append(port)
+
+            results[hashable(points[index])] = outputs
+
+        if not self.run_batch(items, on_item, max_in_flight, timeout):
+            self.release()
+
+            reason = self._token.reason
+            if reason is not None:
+                raise RunCancelled(reason)
+
+            failed = [x for x in points if hashable(x) not in results]
+            raise Exception(f"The sweep failed at the points: {failed}")
+
+        return results
+
+    def flush_displays(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the displays to render their latest inputs
+
+        The displays may render on a worker thread (see RenderWorker), after
+        the run has completed. Returns False if they did not all render within
+        ``timeout``.
+        """
+        workers: Dict[RenderWorker, List[DisplayHandle]] = {}
+        for _, node in node_iter(self.nodes, DisplayNode):
+            display = node.display
+            if display is not None and display.render_worker is not None:
+                workers.setdefault(display.render_worker, []).append(display)
+
+        return all(
+            worker.flush(displays, timeout) for worker, displays in workers.items()
+        )
+
+    def report(self) -> RunReport:
+        """Analyze the critical path and bottlenecks of the last run"""
+        return analyze_run(self)
+
+    def _prepare_run(
+        self,
+        incremental: bool,
+        prune: bool,
+        retain: bool = True,
+    ) -> Set[IdType]:
+        if incremental:
+            operator_ids = self._invalidated()
+        else:
+            for _, node in node_iter(self.nodes, DisplayNode):
+                if node.display is not None:
+                    node.display.clear()
+
+            # Drop the ports of the previous run
+            self.release()
+            operator_ids = set(self.plan.order)
+
+        if prune:
+            operator_ids &= self.targeted_operators()
+
+        self.executions = {}
+        self._retain = incremental and retain
+        if self._retain:
+            # Keep what the operators left out of this run will need later
+            self._consumers = self.plan.consumers()
+        else:
+            self._consumers = self.plan.consumers(operator_ids)
+
+        self._merged = self._merge_equivalent(operator_ids)
+        self._aliases = {id for ids in self._merged.values() for id in ids}
+
+        return operator_ids
+
+    def _end_run(self, completed: bool):
+        if completed:
+            self.observer.on_complete(self)
+            return
+
+        reason = self._token.reason
+        if reason is None:
+            # An operator failed, it was reported already
+            return
+
+        logger.error(f"Pipeline run cancelled: id={self.id}: {reason}")
+
+        # Nothing may resume the run, drop what it produced
+        self.release()
+        self.observer.on_error(self, RunCancelled(reason))
+
+    def _merge_equivalent(
+        self, operator_ids: Set[IdType]
+    ) -> Dict[IdType, List[IdType]]:
+        """Pick the operators of the run that can reuse the outputs of another
+
+        An operator is only merged if the operator it duplicates is part of
+        the run, and both read their inputs from the same executions, so the
+        outputs can be fanned out as soon as they are available.
+        """
+        merged: Dict[IdType, List[IdType]] = {}
+        executed_by: Dict[IdType, IdType] = {}
+
+        def sources(id: IdType):
+            return {
+                edge.input_port.name: (
+                    executed_by.get(edge.output_node_id, edge.output_node_id),
+                    edge.output_port.name,
+                )
+                for edge in self.plan.input_edges[id]
+            }
+
+        for id in self.plan.order:
+            canonical_id = self.equivalent.get(id)
+            if canonical_id is None:
+                continue
+
+            if id not in operator_ids or canonical_id not in operator_ids:
+                continue
+
+            if sources(id) != sources(canonical_id):
+                continue
+
+            executed_by[id] = canonical_id
+            merged.setdefault(canonical_id, []).append(id)
+
+        return merged
+
+    def _invalidated(self) -> Set[IdType]:
+        operator_ids = self.plan.downstream(self.dirty)
+
+        # Operators whose outputs were released must run again if a dirty
+        # operator reads them. Walk backwards so this propagates upstream.
+        for operator_id in reversed(self.plan.order):
+            if operator_id not in operator_ids:
+                continue
+
+            for edge in self.plan.input_edges[operator_id]:
+                source_port_id = port_id(edge.output_node_id, edge.output_port.name)
+                if source_port_id not in self.ports:
+                    operator_ids.add(edge.output_node_id)
+
+        return operator_ids
+
+    def _run_serial(self, operator_ids: Set[IdType]) -> bool:
+        for operator_id in self.plan.order:
+            if operator_id not in operator_ids or operator_id in self._aliases:
+                continue
+
+            if self._token.cancelled:
+                return False
+
+            operator_node = cast(OperatorNode, self.nodes[operator_id])
+            input_ports = self._input_ports(operator_id)
+            operator = self._start_operator(operator_node, input_ports)
+            cache_key = self._cache_key(operator, input_ports)
+            output_ports = self._cached_outputs(operator_node, cache_key)
+
+            if output_ports is None:
+                try:
+                    output_ports = self._execute_operator(
+                        operator_node, operator, input_ports
+                    )
+                except OperatorException as op_err:
+                    self._operator_error(operator_node, op_err)
+                    return False
+                except RunCancelled:
+                    return False
+                except Exception as err:
+                    self.observer.on_error(self, err)
+                    raise
+
+                self._cache_outputs(cache_key, output_ports)
+
+            self._complete_merged(operator_node, output_ports)
+
+        return True
+
+    def _run_concurrent(
+        self, operator_ids: Set[IdType], max_in_flight: Optional[int] = None
+    ) -> bool:
+        if max_in_flight is None:
+            max_in_flight = DEFAULT_MAX_IN_FLIGHT
+
+        if max_in_flight < 1:
+            raise Exception(f"max_in_flight must be at least 1: {max_in_flight}")
+
+        # Use a dedicated pool: the workers block on the message queues, so they
+        # must not compete with the shared pool used by the MPI event loops.
+        pool = ThreadPoolExecutor(max_workers=max_in_flight)
+
+        # Operators become ready when all of their input edges are resolved
+        counters = self.plan.counters(operator_ids)
+        ready = deque(id for id, count in counters.items() if count == 0)
+        in_flight: Dict[Future, Tuple[OperatorNode, Optional[str]]] = {}
+        failed = False
+
+        def resolve(operator_node: OperatorNode):
+            for edge in self.plan.output_edges[operator_node.id]:
+                next_id = edge.input_node_id
+                if next_id not in counters:
                     continue
 
-                input_edges: Sequence[PipelineEdge] = []
-                output_edges: Sequence[PipelineEdge] = []
-                for edge_id in self.node_to_edges[operator_id]:
-                    edge = self.edges[edge_id]
-                    if edge.input_node_id == operator_id:
-                        input_edges.append(edge)
-                    elif edge.output_node_id == operator_id:
-                        output_edges.append(edge)
-
-                do_run = True
-                input_ports: Dict[PortKey, Port] = {}
-
-                for edge in input_edges:
-                    source_port_id = port_id(edge.output_node_id, edge.output_port.name)
-                    port = self.ports.get(source_port_id)
-                    if port is None:
-                        do_run = False
+                counters[next_id] -= 1
+                if counters[next_id] == 0:
+                    ready.append(next_id)
+
+        try:
+            while in_flight or (ready and not failed):
+                # Stop dispatching once cancelled
+                failed = failed or self._token.cancelled
+                while ready and not failed and len(in_flight) < max_in_flight:
+                    operator_id = ready[0]
+                    if operator_id in self._aliases:
+                        # Completed along with the operator it duplicates
+                        ready.popleft()
+                        continue
+
+                    operator_node = cast(OperatorNode, self.nodes[operator_id])
+                    input_ports = self._input_ports(operator_id)
+                    if not self._admit(operator_node, input_ports, bool(in_flight)):
+                        # Wait for the running operators to free some memory
                         break
 
-                    input_ports[edge.input_port.name] = port
+                    ready.popleft()
+                    operator = self._start_operator(operator_node, input_ports)
+                    cache_key = self._cache_key(operator, input_ports)
 
-                if do_run:
-                    self.observer.on_operator_start(self, operator_node, input_ports)
+                    output_ports = self._cached_outputs(operator_node, cache_key)
+                    if output_ports is not None:
+                        self._release_memory(operator_node, output_ports)
+                        for node in self._complete_merged(operator_node, output_ports):
+                            resolve(node)
+                        continue
 
-                    operator = operator_node.operator
+                    future = pool.submit(
+                        self._execute_operator, operator_node, operator, input_ports
+                    )
+                    in_flight[future] = (operator_node, cache_key)
 
-                    if operator is None:
-                        err = Exception(
-                            f"The operator node {operator_id} does not "
-                            "have an associated operator handle."
-                        )
+                # All the bookkeeping happens on this thread, the workers only
+                # wait on the containers.
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    operator_node, cache_key = in_flight.pop(future)
+                    try:
+                        output_ports = future.result()
+                    except OperatorException as op_err:
+                        # Stop dispatching, but let the running operators finish
+                        self._release_memory(operator_node)
+                        self._operator_error(operator_node, op_err)
+                        failed = True
+                        continue
+                    except RunCancelled:
+                        self._release_memory(operator_node)
+                        failed = True
+                        continue
+                    except Exception as err:
+                        self._release_memory(operator_node)
                         self.observer.on_error(self, err)
-                        raise err
+                        raise
 
-                    output_queue = f"/{self.id}_{operator_node.id}"
-                    try:
-                        output_ports: Dict[PortKey, Port] = operator.execute(
-                            input_ports, output_queue
+                    self._release_memory(operator_node, output_ports)
+                    if self._token.cancelled:
+                        # A late result, the run is abandoned
+                        self._drop_outputs(output_ports)
+                        failed = True
+                        continue
+
+                    self._cache_outputs(cache_key, output_ports)
+                    for node in self._complete_merged(operator_node, output_ports):
+                        resolve(node)
+        finally:
+            # Never leave operators running in the background
+            pool.shutdown(wait=True)
+            for operator_node, _ in in_flight.values():
+                self._release_memory(operator_node)
+
+        return not failed
+
+    async def _run_async(
+        self, operator_ids: Set[IdType], max_in_flight: Optional[int] = None
+    ) -> bool:
+        if max_in_flight is None:
+            max_in_flight = DEFAULT_MAX_IN_FLIGHT
+
+        if max_in_flight < 1:
+            raise Exception(f"max_in_flight must be at least 1: {max_in_flight}")
+
+        counters = self.plan.counters(operator_ids)
+        ready = deque(id for id, count in counters.items() if count == 0)
+        in_flight: Dict[asyncio.Task, Tuple[OperatorNode, Optional[str]]] = {}
+        failed = False
+
+        def resolve(operator_node: OperatorNode):
+            for edge in self.plan.output_edges[operator_node.id]:
+                next_id = edge.input_node_id
+                if next_id not in counters:
+                    continue
+
+                counters[next_id] -= 1
+                if counters[next_id] == 0:
+                    ready.append(next_id)
+
+        try:
+            while in_flight or (ready and not failed):
+                # Stop dispatching once cancelled
+                failed = failed or self._token.cancelled
+                while ready and not failed and len(in_flight) < max_in_flight:
+                    operator_id = ready[0]
+                    if operator_id in self._aliases:
+                        # Completed along with the operator it duplicates
+                        ready.popleft()
+                        continue
+
+                    operator_node = cast(OperatorNode, self.nodes[operator_id])
+                    input_ports = self._input_ports(operator_id)
+                    if not self._admit(operator_node, input_ports, bool(in_flight)):
+                        # Wait for the running operators to free some memory
+                        break
+
+                    ready.popleft()
+                    operator = self._start_operator(operator_node, input_ports)
+                    cache_key = self._cache_key(operator, input_ports)
+
+                    output_ports = self._cached_outputs(operator_node, cache_key)
+                    if output_ports is not None:
+                        self._release_memory(operator_node, output_ports)
+                        for node in self._complete_merged(operator_node, output_ports):
+                            resolve(node)
+                        continue
+
+                    task = asyncio.ensure_future(
+                        self._execute_operator_async(
+                            operator_node, operator, input_ports
                         )
+                    )
+                    in_flight[task] = (operator_node, cache_key)
+
+                done, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    operator_node, cache_key = in_flight.pop(task)
+                    try:
+                        output_ports = task.result()
                     except OperatorException as op_err:
-                        self.observer.on_operator_error(self, operator_node, op_err)
-                        logger.error(f"Operator error: id={operator_node.id}")
-                        logger.error(op_err)
-                        return
+                        # Stop dispatching, but let the running operators finish
+                        self._release_memory(operator_node)
+                        self._operator_error(operator_node, op_err)
+                        failed = True
+                        continue
+                    except RunCancelled:
+                        self._release_memory(operator_node)
+                        failed = True
+                        continue
                     except Exception as err:
+                        self._release_memory(operator_node)
                         self.observer.on_error(self, err)
                         raise
 
-                    for edge in output_edges:
-                        # If there is a display output from this operator, render it
-                        # immediately
-                        if edge.output_port.type == PortType.Display:
-                            port = output_ports[edge.output_port.name]
-                            display_node: Any = self.nodes.get(edge.input_node_id)
-                            if (
-                                display_node is not None
-                                and display_node.type == NodeType.Display
-                                and display_node.display is not None
-                            ):
-                                display: DisplayHandle = display_node.display
-                                display.add(edge.output_node_id, port)
-                        # Otherwise save the port for use in a future iteration of the
-                        # pipeline runner
-                        else:
-                            sink_port_id = port_id(
-                                edge.output_node_id, edge.output_port.name
-                            )
-                            self.ports[sink_port_id] = output_ports[
-                                edge.output_port.name
-                            ]
-
-                    run_operators.add(operator_id)
-                    count = count + 1
-
-                    self.observer.on_operator_complete(
-                        self, operator_node, output_ports
-                    )
+                    self._release_memory(operator_node, output_ports)
+                    if self._token.cancelled:
+                        # A late result, the run is abandoned
+                        self._drop_outputs(output_ports)
+                        failed = True
+                        continue
+
+                    self._cache_outputs(cache_key, output_ports)
+                    for node in self._complete_merged(operator_node, output_ports):
+                        resolve(node)
+        finally:
+            # Never leave operators running in the background
+            if in_flight:
+                await asyncio.wait(in_flight)
+
+            for operator_node, _ in in_flight.values():
+                self._release_memory(operator_node)
 
-            if count == 0:
-                raise Exception("The pipeline couldn't be resolved")
+        return not failed
 
-        self.observer.on_complete(self)
+    def _input_ports(self, operator_id: IdType) -> Dict[PortKey, Port]:
+        input_ports: Dict[PortKey, Port] = {}
+        for edge in self.plan.input_edges[operator_id]:
+            source_port_id = port_id(edge.output_node_id, edge.output_port.name)
+            input_ports[edge.input_port.name] = self.ports[source_port_id]
+
+        return input_ports
+
+    def _admit(
+        self,
+        operator_node: OperatorNode,
+        input_ports: Dict[PortKey, Port],
+        running: bool,
+        lane: Optional[int] = None,
+    ) -> bool:
+        """Whether the outputs of an operator fit in the store for now
+
+        If the operator is admitted, room is reserved for its outputs until
+        _release_memory() is called.
+        """
+        operator = operator_node.operator
+        if self.memory is None or operator is None:
+            return True
+
+        key = (self.id, operator_node.id, lane)
+        return self.memory.admit(key, operator, input_ports, running)
+
+    def _release_memory(
+        self,
+        operator_node: OperatorNode,
+        output_ports: Optional[Dict[PortKey, Port]] = None,
+        lane: Optional[int] = None,
+    ):
+        if self.memory is not None:
+            key = (self.id, operator_node.id, lane)
+            self.memory.release(key, output_ports)
+
+    def _start_operator(
+        self, operator_node: OperatorNode, input_ports: Dict[PortKey, Port]
+    ) -> OperatorHandle:
+        if operator_node.id not in self.executions:
+            self.executions[operator_node.id] = ExecutionRecord(time.time())
+
+        self.observer.on_operator_start(self, operator_node, input_ports)
+
+        operator = operator_node.operator
+
+        if operator is None:
+            err = Exception(
+                f"The operator node {operator_node.id} does not "
+                "have an associated operator handle."
+            )
+            self.observer.on_error(self, err)
+            raise err
+
+        return operator
+
+    def _execute_operator(
+        self,
+        operator_node: OperatorNode,
+        operator: OperatorHandle,
+        input_ports: Dict[PortKey, Port],
+        parameters: Optional[JSONType] = None,
+        lane: Optional[int] = None,
+    ) -> Dict[PortKey, Port]:
+        output_queue = self._output_queue(operator_node)
+        timings = None if self.trace is None else []
+        deadline = Deadline(self._token, operator.operator_config.timeout)
+
+        try:
+            with timed(timings, "execute"):
+                return operator.execute(
+                    input_ports, output_queue, parameters, timings, deadline
+                )
+        finally:
+            if self.trace is not None and timings is not None:
+                self.trace.add(operator_node.id, timings, lane)
+
+    async def _execute_operator_async(
+        self,
+        operator_node: OperatorNode,
+        operator: OperatorHandle,
+        input_ports: Dict[PortKey, Port],
+    ) -> Dict[PortKey, Port]:
+        output_queue = self._output_queue(operator_node)
+        timings = None if self.trace is None else []
+        deadline = Deadline(self._token, operator.operator_config.timeout)
+
+        try:
+            with timed(timings, "execute"):
+                return await operator.execute_async(
+                    input_ports, output_queue, timings=timings, deadline=deadline
+                )
+        finally:
+            if self.trace is not None and timings is not None:
+                self.trace.add(operator_node.id, timings)
+
+    def _output_queue(self, operator_node: OperatorNode) -> str:
+        # Shared by the lanes of a batch, see ReplyRouter
+        return f"/{self.id}_{operator_node.id}"
+
+    def _cache_key(
+        self,
+        operator: OperatorHandle,
+        input_ports: Dict[PortKey, Port],
+        parameters: Optional[JSONType] = None,
+    ) -> Optional[str]:
+        if self.cache is None or not operator.operator_config.cacheable:
+            return None
+
+        return self.cache.key(operator, input_ports, parameters)
+
+    def _cached_outputs(
+        self, operator_node: OperatorNode, cache_key: Optional[str]
+    ) -> Optional[Dict[PortKey, Port]]:
+        if self.cache is None or cache_key is None:
+            return None
+
+        output_ports = self.cache.get(cache_key)
+        if output_ports is None:
+            self.observer.on_operator_cache_miss(self, operator_node, self.cache)
+        else:
+            self.observer.on_operator_cache_hit(self, operator_node, self.cache)
+
+        return output_ports
+
+    def _cache_outputs(
+        self, cache_key: Optional[str], output_ports: Dict[PortKey, Port]
+    ):
+        if self.cache is not None and cache_key is not None:
+            self.cache.put(cache_key, output_ports)
+
+    def _drop_outputs(self, output_ports: Dict[PortKey, Port]):
+        for port in output_ports.values():
+            if not isinstance(port.data, PlasmaArray):
+                continue
+
+            # Outputs may be inputs passed through, that are still held
+            if not self.client.is_retained(port.data.object_id):
+                self.client.release(port.data.object_id)
+
+    def _operator_error(self, operator_node: OperatorNode, op_err: OperatorException):
+        self.observer.on_operator_error(self, operator_node, op_err)
+        logger.error(f"Operator error: id={operator_node.id}")
+        logger.error(op_err)
+
+    def _complete_merged(
+        self, operator_node: OperatorNode, output_ports: Dict[PortKey, Port]
+    ) -> List[OperatorNode]:
+        """Complete an operator, and fan its outputs out to its duplicates
+
+        Returns the completed operator nodes.
+        """
+        aliases = [
+            cast(OperatorNode, self.nodes[id])
+            for id in self._merged.get(operator_node.id, [])
+        ]
+
+        self._record_complete(operator_node, output_ports)
+
+        if not aliases:
+            self._complete_operator(operator_node, output_ports)
+            return [operator_node]
+
+        # Read the inputs of the duplicates before any of them are released
+        alias_inputs = [self._input_ports(alias.id) for alias in aliases]
+
+        # Hold the outputs until every duplicate has taken its own reference
+        objects = [
+            cast(PlasmaArray, port.data).object_id
+            for port in output_ports.values()
+            if port.data is not None
+        ]
+        for object_id in objects:
+            self.client.retain(object_id)
+
+        self._complete_operator(operator_node, output_ports)
+
+        for alias, input_ports in zip(aliases, alias_inputs):
+            self.executions[alias.id] = ExecutionRecord(time.time())
+            self.observer.on_operator_start(self, alias, input_ports)
+            self._record_complete(alias, {})
+            self._complete_operator(alias, dict(output_ports))
+
+        for object_id in objects:
+            self.client.release(object_id)
+
+        return [operator_node, *aliases]
+
+    def _record_complete(
+        self, operator_node: OperatorNode, output_ports: Dict[PortKey, Port]
+    ):
+        record = self.executions.get(operator_node.id)
+        if record is None:
+            return
+
+        record.end = time.time()
+        for port in output_ports.values():
+            if port.data is not None:
+                object_id = cast(PlasmaArray, port.data).object_id
+                record.nbytes += self.client.object_size(object_id)
+
+    def _complete_operator(
+        self, operator_node: OperatorNode, output_ports: Dict[PortKey, Port]
+    ):
+        displayed: Set[PortKey] = set()
+        for edge in self.plan.output_edges[operator_node.id]:
+            # If there is a display output from this operator, render it
+            # immediately
+            if edge.output_port.type == PortType.Display:
+                port = output_ports[edge.output_port.name]
+                display_node: Any = self.nodes.get(edge.input_node_id)
+                if (
+                    display_node is not None
+                    and display_node.type == NodeType.Display
+                    and display_node.display is not None
+                ):
+                    display: DisplayHandle = display_node.display
+                    display.add(edge.output_node_id, port)
+                    displayed.add(edge.output_port.name)
+
+        for name, port in output_ports.items():
+            sink_port_id = port_id(operator_node.id, name)
+            if port.data is not None:
+                self.client.retain(cast(PlasmaArray, port.data).object_id)
+
+            # Replace the port from a previous run, if any
+            self._drop_port(sink_port_id)
+
+            if name in displayed:
+                # The displays may read their ports until they are cleared
+                self.display_ports[sink_port_id] = port
+                continue
+
+            # Save the port for use by the downstream operators
+            self.ports[sink_port_id] = port
+
+        self.dirty.discard(operator_node.id)
+        self.observer.on_operator_complete(self, operator_node, output_ports)
+
+        # Release the outputs that nothing reads
+        for name in output_ports:
+            sink_port_id = port_id(operator_node.id, name)
+            if sink_port_id in self.ports and not self._consumers.get(sink_port_id):
+                self._release_port(sink_port_id)
+
+        if self._retain:
+            # Keep the inputs for the next incremental run
+            return
+
+        # This operator no longer needs its inputs
+        for edge in self.plan.input_edges[operator_node.id]:
+            source_port_id = port_id(edge.output_node_id, edge.output_port.name)
+            self._consumers[source_port_id] -= 1
+            if self._consumers[source_port_id] == 0:
+                self._release_port(source_port_id)
+
+    def _release_port(self, source_port_id: str):
+        if source_port_id not in self.keep_ports:
+            self._drop_port(source_port_id)
+
+    def _drop_port(self, source_port_id: str):
+        port = self.ports.pop(source_port_id, None)
+        if port is None:
+            port = self.display_ports.pop(source_port_id, None)
+
+        if port is not None and port.data is not None:
+            self.client.release(cast(PlasmaArray, port.data).object_id)
 
 
 class PipelineObserver:
@@ -370,6 +1325,16 @@ class PipelineObserver:
     ):
         pass
 
+    def on_operator_cache_hit(
+        self, pipeline: Pipeline, operator: OperatorNode, cache: OperatorResultCache
+    ):
+        pass
+
+    def on_operator_cache_miss(
+        self, pipeline: Pipeline, operator: OperatorNode, cache: OperatorResultCache
+    ):
+        pass
+
 
 class DebugPipelineObserver(PipelineObserver):
     def __init__(self, print_fn=None):
@@ -402,6 +1367,28 @@ class DebugPipelineObserver(PipelineObserver):
     def on_operator_error(self, pipeline: Pipeline, operator: OperatorNode, error: Any):
         self.print("Pipeline: ", pipeline.id, " Failed Operator", operator.id, error)
 
+    def on_operator_cache_hit(
+        self, pipeline: Pipeline, operator: OperatorNode, cache: OperatorResultCache
+    ):
+        self.print(
+            "Pipeline: ",
+            pipeline.id,
+            " Cache Hit Operator",
+            operator.id,
+            f"hits={cache.hits} misses={cache.misses}",
+        )
+
+    def on_operator_cache_miss(
+        self, pipeline: Pipeline, operator: OperatorNode, cache: OperatorResultCache
+    ):
+        self.print(
+            "Pipeline: ",
+            pipeline.id,
+            " Cache Miss Operator",
+            operator.id,
+            f"hits={cache.hits} misses={cache.misses}",
+        )
+
 
 def validate_port_type(type):
     valid_types = [
@@ -416,6 +1403,25 @@ def validate_port_type(type):
     return type
 
 
+def deserialize_edge(_edge: EdgeJSON) -> PipelineEdge:
+    port_type = _edge.type
+    from_node = _edge.start
+    to_node = _edge.stop
+    from_port = PortInfo(type=port_type, name=from_node.port)
+    to_port = PortInfo(type=port_type, name=to_node.port)
+
+    return PipelineEdge(from_node.id, from_port, to_node.id, to_port)
+
+
+def same_edge(a: PipelineEdge, b: PipelineEdge) -> bool:
+    return (
+        a.output_node_id == b.output_node_id
+        and a.output_port == b.output_port
+        and a.input_node_id == b.input_node_id
+        and a.input_port == b.input_port
+    )
+
+
 noop_display_factory: DisplayFactory = lambda id, type: NoopDisplayHandle(id, type)
 
 
@@ -451,8 +1457,10 @@ def deserialize_pipeline(
             input_queue = registry.input_queue(_image_name)
             operator_config = registry.operator_config(_image_name)
 
+            digest = registry.digest(_image_name)
+
             operator = OperatorHandle(
-                _image_name, name, input_queue, client, operator_config
+                _image_name, name, input_queue, client, operator_config, digest
             )
             operator.parameters = params
 
@@ -473,17 +1481,7 @@ def deserialize_pipeline(
 
             nodes.append(node)
 
-    edges: Sequence[PipelineEdge] = []
-
-    for _edge in _edges:
-        port_type = _edge.type
-        from_node = _edge.start
-        to_node = _edge.stop
-        from_port = PortInfo(type=port_type, name=from_node.port)
-        to_port = PortInfo(type=port_type, name=to_node.port)
-        edge = PipelineEdge(from_node.id, from_port, to_node.id, to_port)
-
-        edges.append(edge)
+    edges: Sequence[PipelineEdge] = [deserialize_edge(_edge) for _edge in _edges]
 
     pipeline = Pipeline(client, registry, _id)
 
@@ -0,0 +1,125 @@
+from collections import OrderedDict
+import hashlib
+import json
+import threading
+from typing import Dict, List, Optional
+
+from oremda.pipeline.operator import OperatorHandle
+from oremda.plasma_client import PlasmaArray, PlasmaClient
+from oremda.typing import JSONType, Port, PortKey
+
+
+class CacheEntry:
+    def __init__(self, outputs: Dict[PortKey, Port], nbytes: int):
+        self.outputs = outputs
+        self.nbytes = nbytes
+
+
+class OperatorResultCache:
+    """A least recently used cache of operator results
+
+    Results are keyed by the digest of the operator image, its parameters and
+    the identity of its inputs, so an operator whose inputs did not change is
+    not executed again. The cache holds a reference to the Plasma objects of
+    the cached outputs, and evicts the least recently used results once they
+    take more than ``max_bytes`` of the store.
+
+    The cache may be shared by several pipelines.
+    """
+
+    def __init__(self, client: PlasmaClient, max_bytes: int):
+        self.client = client
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(
+        self,
+        operator: OperatorHandle,
+        inputs: Dict[PortKey, Port],
+        parameters: Optional[JSONType] = None,
+    ) -> str:
+        if parameters is None:
+            parameters = operator.parameters
+
+        serialized_inputs = {}
+        for name, port in inputs.items():
+            data = None
+            if isinstance(port.data, PlasmaArray):
+                data = port.data.hex_id
+
+            serialized_inputs[name] = {"meta": port.meta, "data": data}
+
+        obj = {
+            "image": operator.digest,
+            "params": parameters,
+            "inputs": serialized_inputs,
+        }
+        serialized = json.dumps(obj, sort_keys=True, default=str)
+
+        return hashlib.sha256(serialized.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[PortKey, Port]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+
+            return dict(entry.outputs)
+
+    def put(self, key: str, outputs: Dict[PortKey, Port]):
+        nbytes = 0
+        for port in outputs.values():
+            if isinstance(port.data, PlasmaArray):
+                nbytes += self.client.object_size(port.data.object_id)
+
+        if nbytes > self.max_bytes:
+            # It would evict everything else, and itself
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+
+            for port in outputs.values():
+                if isinstance(port.data, PlasmaArray):
+                    self.client.retain(port.data.object_id)
+
+            self._entries[key] = CacheEntry(dict(outputs), nbytes)
+            self.nbytes += nbytes
+
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._release(evicted)
+
+    def ports(self) -> List[Port]:
+        """The ports held by the cache"""
+        with self._lock:
+            return [
+                port
+                for entry in self._entries.values()
+                for port in entry.outputs.values()
+            ]
+
+    def clear(self):
+        with self._lock:
+            while self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._release(evicted)
+
+    def _release(self, entry: CacheEntry):
+        self.nbytes -= entry.nbytes
+        for port in entry.outputs.values():
+            if isinstance(port.data, PlasmaArray):
+                self.client.release(port.data.object_id)
@@ -0,0 +1,83 @@
+import threading
+import time
+from typing import Optional
+
+from oremda.pipeline.operator import OperatorException
+
+# How often, in seconds, a wait for a container checks whether the run was
+# cancelled
+CANCEL_POLL_INTERVAL = 0.1
+
+
+class RunCancelled(Exception):
+    """The run was cancelled, or ran past its deadline"""
+
+
+class OperatorTimeout(OperatorException):
+    """An operator ran past its deadline"""
+
+
+class RunToken:
+    """Cancels a run, and bounds its duration
+
+    The token is shared by every operator execution of a run. It may be
+    cancelled from any thread.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self.timeout = timeout
+        self.expires = None if timeout is None else time.monotonic() + timeout
+        self._reason: Optional[str] = None
+        self._event = threading.Event()
+
+    def cancel(self, reason: str = "The run was cancelled"):
+        if not self._event.is_set():
+            self._reason = reason
+            self._event.set()
+
+    @property
+    def reason(self) -> Optional[str]:
+        """Why the run must stop, or None if it may go on"""
+        if self._event.is_set():
+            return self._reason
+
+        if self.expires is not None and time.monotonic() >= self.expires:
+            self.cancel(f"The run timed out after {self.timeout}s")
+            return self._reason
+
+        return None
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def check(self):
+        reason = self.reason
+        if reason is not None:
+            raise RunCancelled(reason)
+
+
+class Deadline:
+    """The deadline of an operator execution, within its run"""
+
+    def __init__(self, token: RunToken, timeout: Optional[float] = None):
+        self.token = token
+        self.timeout = timeout
+        self.expires = None if timeout is None else time.monotonic() + timeout
+
+    def check(self):
+        """Raise if the execution must stop"""
+        self.token.check()
+
+        if self.expires is not None and time.monotonic() >= self.expires:
+            msg = f"The operator timed out after {self.timeout}s"
+            raise OperatorTimeout(msg)
+
+    def wait_time(self) -> float:
+        """How long to wait for the container before checking again"""
+        wait = CANCEL_POLL_INTERVAL
+        for expires in (self.expires, self.token.expires):
+            if expires is not None:
+                wait = min(wait, expires - time.monotonic())
+
+        return max(wait, 0)
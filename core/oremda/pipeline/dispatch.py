@@ -0,0 +1,72 @@
+from collections import deque
+from typing import Dict, List, Set
+
+from oremda.typing import OperateTaskMessage, ResultTaskMessage
+
+
+class ParallelDispatch:
+    """Decides when the tasks of a parallel execution are sent
+
+    With a ``window`` of at least the number of tasks, every task is sent
+    right away, and each container takes its share from the input queue.
+
+    With a smaller window, as many tasks as containers, only ``window`` tasks
+    are running at any time, and the next one is sent as a result comes back.
+    The containers share the input queue, so each one pulls a new task as
+    soon as it is free, and the slow tasks do not hold the others back.
+
+    If ``speculative`` is True, once every task has been sent, the containers
+    that would be left idle run a copy of the oldest unfinished tasks. The
+    first result of a task is kept, and the results of its copy are dropped.
+    """
+
+    def __init__(
+        self, tasks: List[OperateTaskMessage], window: int, speculative: bool = False
+    ):
+        self.tasks = tasks
+        self.window = window
+        self.speculative = speculative
+        self.pending = deque(tasks)
+        # The tasks sent and not completed, in the order they were sent
+        self.outstanding: Dict[int, OperateTaskMessage] = {}
+        self.copied: Set[int] = set()
+        self.completed: Set[int] = set()
+        # The copies of the tasks running in the containers
+        self.running = 0
+
+    @property
+    def done(self) -> bool:
+        return len(self.completed) == len(self.tasks)
+
+    def to_send(self) -> List[OperateTaskMessage]:
+        """The tasks to send now"""
+        sends = []
+        while self.pending and self.running < self.window:
+            task = self.pending.popleft()
+            self.outstanding[task.parallel_index] = task
+            self.running += 1
+            sends.append(task)
+
+        if self.speculative and not self.pending:
+            for index, task in self.outstanding.items():
+                if self.running >= self.window:
+                    break
+
+                if index not in self.copied:
+                    self.copied.add(index)
+                    self.running += 1
+                    sends.append(task)
+
+        return sends
+
+    def accept(self, result: ResultTaskMessage) -> bool:
+        """Whether a result is the first one of its task"""
+        self.running -= 1
+
+        index = result.parallel_index
+        if index in self.completed:
+            return False
+
+        self.completed.add(index)
+        self.outstanding.pop(index, None)
+        return True
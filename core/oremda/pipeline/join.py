@@ -0,0 +1,347 @@
+from abc import ABC, abstractmethod
+import importlib
+import itertools
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type
+
+import numpy as np
+
+from oremda.plasma_client import PlasmaArray, PlasmaClient
+from oremda.typing import DataType
+
+
+class Join(ABC):
+    """Joins the partial outputs of a parallel operator
+
+    The parts are given to add() as they arrive, in any order, and result()
+    returns the joined output once they have all been added.
+    """
+
+    # Whether add() is done with a part when it returns, so the part may be
+    # freed right away instead of after result()
+    streaming = False
+
+    def __init__(self, sizes: Sequence[int]):
+        # The number of items of each part
+        self.sizes = list(sizes)
+        self.num_parts = len(self.sizes)
+
+    @abstractmethod
+    def add(self, index: int, data: DataType):
+        pass
+
+    @abstractmethod
+    def result(self) -> DataType:
+        pass
+
+    def output(self, client: PlasmaClient) -> PlasmaArray:
+        """The joined output, in the store"""
+        return PlasmaArray(client, self.result())
+
+    def discard(self):
+        """Drop the join of an execution that failed"""
+        pass
+
+
+JOIN_METHODS: Dict[str, Type[Join]] = {}
+
+
+def register_join(name: str) -> Callable[[Type[Join]], Type[Join]]:
+    """Register a join method, which operators may then name in their config"""
+
+    def register(cls: Type[Join]) -> Type[Join]:
+        JOIN_METHODS[name] = cls
+        return cls
+
+    return register
+
+
+@register_join("stack")
+class StackJoin(Join):
+    """Stack the parts in the order of their index, like np.hstack"""
+
+    def __init__(self, sizes: Sequence[int]):
+        super().__init__(sizes)
+        self.parts: Dict[int, DataType] = {}
+
+    def add(self, index: int, data: DataType):
+        self.parts[index] = data
+
+    def result(self) -> DataType:
+        return np.hstack([self.parts[i] for i in sorted(self.parts)])
+
+
+@register_join("concat")
+class ConcatJoin(StackJoin):
+    """Concatenate the parts in the order of their index, along ``axis``"""
+
+    def __init__(self, sizes: Sequence[int], axis: int = 0):
+        super().__init__(sizes)
+        self.axis = axis
+
+    def result(self) -> DataType:
+        parts = [self.parts[i] for i in sorted(self.parts)]
+        return np.concatenate(parts, axis=self.axis)
+
+
+class PreallocatedStackJoin(Join):
+    """Stack the parts straight into an output of a known shape
+
+    The output is created in the store up front, and each part is copied into
+    its slice as it arrives. So the parts may be freed right away, and the
+    output is not copied once more into the store when complete.
+
+    ``sizes`` are the number of items of each part, which set the width of
+    its slice along the stacking axis.
+    """
+
+    streaming = True
+
+    def __init__(
+        self,
+        sizes: Sequence[int],
+        client: PlasmaClient,
+        shape: Sequence[int],
+        dtype: str,
+    ):
+        super().__init__(sizes)
+        self.client = client
+        # The axis of np.hstack
+        self.axis = 0 if len(shape) <= 1 else 1
+
+        total = sum(sizes)
+        length = shape[self.axis] if shape else 1
+        width, extra = divmod(length, total) if total else (0, length)
+        if extra:
+            msg = f"The output shape {shape} does not fit {total} items"
+            raise Exception(msg)
+
+        self.bounds: List[int] = [width * x for x in itertools.accumulate([0, *sizes])]
+        self.object_id, self.array = client.create_array(shape, dtype)
+        self.sealed = False
+
+    def add(self, index: int, data: DataType):
+        start, stop = self.bounds[index], self.bounds[index + 1]
+        view = self.array[(slice(None),) * self.axis + (slice(start, stop),)]
+
+        part = np.atleast_1d(data)
+        if part.shape != view.shape:
+            msg = f"The part {index} has the shape {part.shape}, not {view.shape}"
+            raise Exception(msg)
+
+        view[...] = part
+
+    def result(self) -> DataType:
+        return self.array
+
+    def output(self, client: PlasmaClient) -> PlasmaArray:
+        self._seal()
+        return PlasmaArray(client, self.object_id)
+
+    def discard(self):
+        if not self.sealed:
+            self._seal()
+            self.client.delete_objects([self.object_id])
+
+    def _seal(self):
+        # The writable view must be gone before the object is sealed
+        self.array = None
+        self.client.seal(self.object_id)
+        self.sealed = True
+
+
+class AccumulateJoin(Join):
+    """Fold the parts into a single accumulator with a ufunc, as they arrive"""
+
+    streaming = True
+    ufunc: Callable = np.add
+
+    def __init__(self, sizes: Sequence[int]):
+        super().__init__(sizes)
+        self.total: Optional[np.ndarray] = None
+
+    def add(self, index: int, data: DataType):
+        if self.total is None:
+            # A copy, the part may be freed once this returns
+            self.total = self.start(data)
+        elif np.can_cast(np.result_type(self.total, data), self.total.dtype):
+            self.ufunc(self.total, data, out=self.total)
+        else:
+            self.total = self.ufunc(self.total, data)
+
+    def start(self, data: DataType) -> np.ndarray:
+        return np.array(data)
+
+    def result(self) -> DataType:
+        return self.total
+
+
+@register_join("sum")
+class SumJoin(AccumulateJoin):
+    """Sum the parts into a single accumulator as they arrive"""
+
+
+@register_join("min")
+class MinJoin(AccumulateJoin):
+    """The element-wise minimum of the parts"""
+
+    ufunc = np.minimum
+
+
+@register_join("max")
+class MaxJoin(AccumulateJoin):
+    """The element-wise maximum of the parts"""
+
+    ufunc = np.maximum
+
+
+@register_join("histogram")
+class HistogramJoin(AccumulateJoin):
+    """Merge the counts of histograms over the same bins
+
+    The counts are accumulated as 64 bit integers, or floats for weighted
+    histograms, so the small integer types of the parts do not overflow.
+    """
+
+    def add(self, index: int, data: DataType):
+        if self.total is not None and np.shape(data) != self.total.shape:
+            msg = (
+                f"The histogram of the part {index} has the shape "
+                f"{np.shape(data)}, not {self.total.shape}"
+            )
+            raise Exception(msg)
+
+        super().add(index, data)
+
+    def start(self, data: DataType) -> np.ndarray:
+        return np.array(data, dtype=np.result_type(data, np.int64))
+
+
+@register_join("weighted_mean")
+class WeightedMeanJoin(Join):
+    """The mean of the parts, weighted by their number of items by default
+
+    So the means computed by each part over its items are joined into the
+    mean over all the items.
+    """
+
+    streaming = True
+
+    def __init__(self, sizes: Sequence[int], weights: Optional[List[float]] = None):
+        super().__init__(sizes)
+        if weights is None:
+            weights = self.sizes
+        elif len(weights) != self.num_parts:
+            msg = f"{len(weights)} weights given for {self.num_parts} parts"
+            raise Exception(msg)
+
+        self.weights = weights
+        self.total: Optional[np.ndarray] = None
+        self.total_weight = 0.0
+        # Holds the weighted part, to not allocate one for every part
+        self._scratch: Optional[np.ndarray] = None
+
+    def add(self, index: int, data: DataType):
+        weight = self.weights[index]
+        self.total_weight += weight
+
+        if self.total is None:
+            # An array even for scalar parts, so it can be added to in place
+            dtype = np.result_type(data, np.float64)
+            self.total = np.array(data, dtype=dtype, copy=True)
+            self.total *= weight
+            return
+
+        if weight == 1:
+            np.add(self.total, data, out=self.total)
+            return
+
+        if self._scratch is None:
+            self._scratch = np.empty_like(self.total)
+
+        np.multiply(data, weight, out=self._scratch)
+        np.add(self.total, self._scratch, out=self.total)
+
+    def result(self) -> DataType:
+        if self.total_weight == 0:
+            raise Exception("The weights of the parts add up to zero")
+
+        return self.total / self.total_weight
+
+
+@register_join("mean")
+class MeanJoin(WeightedMeanJoin):
+    """The mean of the parts, each one with the same weight"""
+
+    def __init__(self, sizes: Sequence[int]):
+        super().__init__(sizes, [1.0] * len(sizes))
+
+
+@register_join("points")
+class PointsJoin(Join):
+    """Merge lists of sparse points
+
+    Each part is an array with a row per point, its coordinates then its
+    value. The rows are concatenated in the order of the parts. With
+    ``sum_duplicates``, the points at the same coordinates are merged into
+    one, the sum of their values, and the points are sorted by coordinates.
+    """
+
+    def __init__(self, sizes: Sequence[int], sum_duplicates: bool = False):
+        super().__init__(sizes)
+        self.sum_duplicates = sum_duplicates
+        self.parts: Dict[int, np.ndarray] = {}
+
+    def add(self, index: int, data: DataType):
+        part = np.asarray(data)
+        if part.size == 0:
+            return
+
+        if part.ndim != 2:
+            msg = f"The points of the part {index} are not 2D: {part.shape}"
+            raise Exception(msg)
+
+        self.parts[index] = part
+
+    def result(self) -> DataType:
+        if not self.parts:
+            return np.empty((0, 0))
+
+        points = np.concatenate([self.parts[i] for i in sorted(self.parts)])
+        if not self.sum_duplicates:
+            return points
+
+        coordinates, inverse = np.unique(points[:, :-1], axis=0, return_inverse=True)
+        values = np.bincount(inverse.ravel(), weights=points[:, -1])
+        return np.column_stack([coordinates, values])
+
+
+def join_class(method_name: str) -> Type[Join]:
+    """The join registered under a name, or a Join class given by its path
+
+    A path, such as ``package.module.MyJoin``, lets a join be declared in the
+    operator config without being registered by the engine.
+    """
+    if method_name in JOIN_METHODS:
+        return JOIN_METHODS[method_name]
+
+    module_name, _, class_name = method_name.rpartition(".")
+    if not module_name:
+        raise NotImplementedError(method_name)
+
+    cls = getattr(importlib.import_module(module_name), class_name, None)
+    if not isinstance(cls, type) or not issubclass(cls, Join):
+        raise Exception(f"{method_name} is not a Join class")
+
+    return cls
+
+
+def create_join(
+    method_name: str,
+    sizes: Sequence[int],
+    params: Optional[Dict[str, Any]] = None,
+) -> Join:
+    cls = join_class(method_name)
+    try:
+        return cls(sizes, **(params or {}))
+    except TypeError as e:
+        raise Exception(f"Invalid parameters for the join {method_name}: {e}")
@@ -0,0 +1,344 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import heapq
+import json
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    cast,
+)
+
+from oremda.pipeline.deadline import RunCancelled
+from oremda.pipeline.operator import OperatorException
+from oremda.plasma_client import PlasmaArray
+from oremda.typing import IdType, JSONType, NodeType, Port, PortKey, PortType
+from oremda.utils.id import port_id
+
+if TYPE_CHECKING:
+    from oremda.pipeline import OperatorNode, Pipeline
+
+# An execution of an operator, for a lane
+TaskKey = Tuple[int, IdType]
+
+# A port produced by an execution
+PortRef = Tuple[TaskKey, str]
+
+LaneCallback = Callable[[int, Dict[str, Port]], None]
+
+
+class LaneRun:
+    """Run several variants of a pipeline through the same containers
+
+    Every lane overrides the parameters of some operators. An operator only
+    runs once for all the lanes in which it has the same parameters and the
+    same inputs, so the operators upstream of any override run only once,
+    and their outputs are shared by every lane. Like in a run, the operators
+    equivalent to an earlier one (see equivalent_operators()) reuse its
+    outputs, in the lanes where neither is overridden differently.
+
+    Executions are dispatched lowest lane first, so a lane is carried through
+    the graph before the next ones are started: an operator processes lane
+    k + 1 while its consumers process lane k, and only a few lanes are held
+    in the store at any time.
+    """
+
+    def __init__(
+        self,
+        pipeline: "Pipeline",
+        lanes: Sequence[Dict[IdType, JSONType]],
+        on_lane_complete: Optional[LaneCallback] = None,
+    ):
+        self.pipeline = pipeline
+        self.plan = pipeline.plan
+        self.lanes = lanes
+        self.on_lane_complete = on_lane_complete
+
+        for lane in lanes:
+            for node_id in lane:
+                node = pipeline.nodes.get(node_id)
+                if node is None or node.type != NodeType.Operator:
+                    raise Exception(f"The operator node {node_id} does not exist.")
+
+        # The execution computing each operator of each lane
+        self.executed_by: Dict[TaskKey, TaskKey] = {}
+        self.counters: Dict[TaskKey, int] = {}
+        self.dependents: Dict[TaskKey, List[TaskKey]] = {}
+        self.consumers: Dict[PortRef, int] = {}
+        # The lanes waiting on each execution, and the executions of each lane
+        self.waiting: Dict[TaskKey, List[int]] = {}
+        self.remaining = [0] * len(lanes)
+        # The equivalent operators whose outputs an execution also provides
+        self.aliases: Dict[TaskKey, List[IdType]] = {}
+
+        # The executions of every operator, and of the ones equivalent to it
+        seen: Dict[IdType, Dict[str, TaskKey]] = {}
+        for id in self.plan.order:
+            canonical_id = pipeline.equivalent.get(id, id)
+            executions = seen.setdefault(canonical_id, {})
+            for lane in range(len(lanes)):
+                sources = sorted(
+                    (edge.input_port.name, self._source(edge, lane))
+                    for edge in self.plan.input_edges[id]
+                )
+                obj = [lanes[lane].get(id), sources]
+                signature = json.dumps(obj, sort_keys=True, default=str)
+
+                key = executions.setdefault(signature, (lane, id))
+                self.executed_by[(lane, id)] = key
+                self.waiting.setdefault(key, []).append(lane)
+                self.remaining[lane] += 1
+
+                if key[1] != id:
+                    aliases = self.aliases.setdefault(key, [])
+                    if id not in aliases:
+                        aliases.append(id)
+
+                if key != (lane, id):
+                    continue
+
+                self.counters[key] = len(sources)
+                for _, source in sources:
+                    self.dependents.setdefault(source[0], []).append(key)
+                    self.consumers[source] = self.consumers.get(source, 0) + 1
+
+        self.ports: Dict[PortRef, Port] = {}
+
+        # The ports handed over to on_lane_complete, and the number of lanes
+        # that have yet to be handed each of them
+        self.kept = [
+            (id, name)
+            for id in self.plan.order
+            for name in self.pipeline.nodes[id].outputs
+            if port_id(id, name) in self.pipeline.keep_ports
+        ]
+        self.kept_refs: Dict[PortRef, int] = {}
+        for lane in range(len(lanes)):
+            for id, name in self.kept:
+                ref = (self.executed_by[(lane, id)], name)
+                self.kept_refs[ref] = self.kept_refs.get(ref, 0) + 1
+
+    def run(self, max_in_flight: int) -> bool:
+        if max_in_flight < 1:
+            raise Exception(f"max_in_flight must be at least 1: {max_in_flight}")
+
+        position = {id: i for i, id in enumerate(self.plan.order)}
+
+        def priority(key: TaskKey):
+            lane, id = key
+            return (lane, position[id])
+
+        ready = [
+            (priority(key), key) for key, count in self.counters.items() if count == 0
+        ]
+        heapq.heapify(ready)
+
+        pool = ThreadPoolExecutor(max_workers=max_in_flight)
+        in_flight: Dict[Future, Tuple[TaskKey, Optional[str]]] = {}
+        failed = False
+
+        def complete(key: TaskKey, output_ports: Dict[PortKey, Port]):
+            self._complete(key, output_ports)
+
+            for next_key in self.dependents.get(key, []):
+                self.counters[next_key] -= 1
+                if self.counters[next_key] == 0:
+                    heapq.heappush(ready, (priority(next_key), next_key))
+
+            for lane in self.waiting[key]:
+                self.remaining[lane] -= 1
+                if self.remaining[lane] == 0:
+                    self._finish_lane(lane)
+
+        try:
+            while in_flight or (ready and not failed):
+                # Stop dispatching once cancelled
+                failed = failed or self.pipeline._token.cancelled
+                while ready and not failed and len(in_flight) < max_in_flight:
+                    _, key = ready[0]
+                    lane, id = key
+                    operator_node = cast("OperatorNode", self.pipeline.nodes[id])
+                    input_ports = self._input_ports(key)
+                    admitted = self.pipeline._admit(
+                        operator_node, input_ports, bool(in_flight), lane
+                    )
+                    if not admitted:
+                        # Wait for the running executions to free some memory
+                        break
+
+                    heapq.heappop(ready)
+                    operator = self.pipeline._start_operator(operator_node, input_ports)
+                    parameters = self._parameters(key)
+                    cache_key = self.pipeline._cache_key(
+                        operator, input_ports, parameters
+                    )
+
+                    output_ports = self.pipeline._cached_outputs(
+                        operator_node, cache_key
+                    )
+                    if output_ports is not None:
+                        self.pipeline._release_memory(operator_node, output_ports, lane)
+                        complete(key, output_ports)
+                        continue
+
+                    future = pool.submit(
+                        self.pipeline._execute_operator,
+                        operator_node,
+                        operator,
+                        input_ports,
+                        parameters,
+                        lane,
+                    )
+                    in_flight[future] = (key, cache_key)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key, cache_key = in_flight.pop(future)
+                    lane, id = key
+                    operator_node = cast("OperatorNode", self.pipeline.nodes[id])
+                    try:
+                        output_ports = future.result()
+                    except OperatorException as op_err:
+                        # Stop dispatching, but let the running operators finish
+                        self.pipeline._release_memory(operator_node, lane=lane)
+                        self.pipeline._operator_error(operator_node, op_err)
+                        failed = True
+                        continue
+                    except RunCancelled:
+                        self.pipeline._release_memory(operator_node, lane=lane)
+                        failed = True
+                        continue
+                    except Exception as err:
+                        self.pipeline._release_memory(operator_node, lane=lane)
+                        self.pipeline.observer.on_error(self.pipeline, err)
+                        raise
+
+                    self.pipeline._release_memory(operator_node, output_ports, lane)
+                    if self.pipeline._token.cancelled:
+                        # A late result, the run is abandoned
+                        self.pipeline._drop_outputs(output_ports)
+                        failed = True
+                        continue
+
+                    self.pipeline._cache_outputs(cache_key, output_ports)
+                    complete(key, output_ports)
+        finally:
+            pool.shutdown(wait=True)
+            for (lane, id), _ in in_flight.values():
+                operator_node = cast("OperatorNode", self.pipeline.nodes[id])
+                self.pipeline._release_memory(operator_node, lane=lane)
+
+            for ref in list(self.ports):
+                self._drop(ref)
+
+        return not failed
+
+    def _source(self, edge: Any, lane: int) -> PortRef:
+        key = self.executed_by[(lane, edge.output_node_id)]
+        return (key, edge.output_port.name)
+
+    def _parameters(self, key: TaskKey) -> Optional[JSONType]:
+        lane, id = key
+        if id not in self.lanes[lane]:
+            return None
+
+        operator_node = cast("OperatorNode", self.pipeline.nodes[id])
+        parameters = operator_node.operator.parameters  # type: ignore
+        return {**parameters, **self.lanes[lane][id]}
+
+    def _input_ports(self, key: TaskKey) -> Dict[PortKey, Port]:
+        lane, id = key
+        return {
+            edge.input_port.name: self.ports[self._source(edge, lane)]
+            for edge in self.plan.input_edges[id]
+        }
+
+    def _complete(self, key: TaskKey, output_ports: Dict[PortKey, Port]):
+        lane, id = key
+        pipeline = self.pipeline
+        operator_node = cast("OperatorNode", pipeline.nodes[id])
+        pipeline._record_complete(operator_node, output_ports)
+
+        for name, port in output_ports.items():
+            if port.data is not None:
+                pipeline.client.retain(cast(PlasmaArray, port.data).object_id)
+
+            self.ports[(key, name)] = port
+
+        # The equivalent operators complete along with the one that ran
+        for node_id in [id, *self.aliases.get(key, [])]:
+            node = cast("OperatorNode", pipeline.nodes[node_id])
+            self._show(node_id, output_ports)
+            pipeline.observer.on_operator_complete(pipeline, node, output_ports)
+
+        # Release the outputs that nothing reads
+        for name in output_ports:
+            ref = (key, name)
+            if ref in self.ports and not self.consumers.get(ref):
+                self._release(ref)
+
+        # This execution no longer needs its inputs
+        for edge in self.plan.input_edges[id]:
+            source = self._source(edge, lane)
+            self.consumers[source] -= 1
+            if self.consumers[source] == 0:
+                self._release(source)
+
+    def _show(self, id: IdType, output_ports: Dict[PortKey, Port]):
+        """Add the outputs of an operator to its displays"""
+        pipeline = self.pipeline
+        for edge in self.plan.output_edges[id]:
+            if edge.output_port.type != PortType.Display:
+                continue
+
+            display_node: Any = pipeline.nodes[edge.input_node_id]
+            if display_node.display is None:
+                continue
+
+            # The displays show the latest lane
+            port = output_ports[edge.output_port.name]
+            display_node.display.add(id, port)
+
+            # The displays may read their ports until they are cleared
+            sink_port_id = port_id(id, edge.output_port.name)
+            if pipeline.display_ports.get(sink_port_id) is port:
+                continue
+
+            if port.data is not None:
+                pipeline.client.retain(cast(PlasmaArray, port.data).object_id)
+
+            pipeline._drop_port(sink_port_id)
+            pipeline.display_ports[sink_port_id] = port
+
+    def _finish_lane(self, lane: int):
+        outputs: Dict[str, Port] = {}
+        refs = []
+        for id, name in self.kept:
+            ref = (self.executed_by[(lane, id)], name)
+            port = self.ports.get(ref)
+            if port is not None:
+                outputs[port_id(id, name)] = port
+                refs.append(ref)
+
+        if self.on_lane_complete is not None:
+            self.on_lane_complete(lane, outputs)
+
+        for ref in refs:
+            self.kept_refs[ref] -= 1
+            self._release(ref)
+
+    def _release(self, ref: PortRef):
+        # Kept ports are held until every lane reading them has completed
+        if self.kept_refs.get(ref) or self.consumers.get(ref):
+            return
+
+        self._drop(ref)
+
+    def _drop(self, ref: PortRef):
+        port = self.ports.pop(ref, None)
+        if port is not None and port.data is not None:
+            self.pipeline.client.release(cast(PlasmaArray, port.data).object_id)
@@ -0,0 +1,130 @@
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from oremda.pipeline.operator import OperatorHandle
+from oremda.plasma_client import PlasmaArray, PlasmaClient
+from oremda.typing import Port, PortKey
+
+
+class Reservation:
+    def __init__(self, digest: str, input_bytes: int, nbytes: int):
+        self.digest = digest
+        self.input_bytes = input_bytes
+        self.nbytes = nbytes
+
+
+class MemoryBudget:
+    """Admission control against the capacity of the Plasma store
+
+    Before an operator is dispatched, the bytes its outputs will take are
+    estimated and reserved, and the operator is held back while the objects
+    in the store and the reservations of the running operators would not
+    leave room for them. An operator is always admitted if nothing else of
+    its run is running, so a run makes progress even if the estimates are
+    too high.
+
+    The output size of an operator is estimated, in order of preference:
+
+    * from the ``output_bytes`` of its configuration,
+    * from the ``output_ratio`` of its configuration, times its input bytes,
+    * from its last execution, scaled by its input bytes,
+    * as the size of its inputs.
+
+    The budget may be shared by several pipelines using the same store. The
+    usage of the store is read from the store, so it covers the objects of
+    every pipeline and client.
+    """
+
+    def __init__(self, client: PlasmaClient, capacity: int):
+        self.client = client
+        self.capacity = capacity
+        # The number of times an operator was held back
+        self.held = 0
+        # The highest number of bytes used and reserved when admitting
+        self.peak = 0
+        # The last (input bytes, output bytes) of every operator image
+        self._history: Dict[str, Tuple[int, int]] = {}
+        self._reserved: Dict[Any, Reservation] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def reserved(self) -> int:
+        with self._lock:
+            return sum(x.nbytes for x in self._reserved.values())
+
+    def admit(
+        self,
+        key: Any,
+        operator: OperatorHandle,
+        inputs: Dict[PortKey, Port],
+        running: bool,
+    ) -> bool:
+        """Reserve room for the outputs of an operator, if there is some
+
+        ``key`` identifies the execution until release() is called, and
+        ``running`` is whether the caller has operators running.
+        """
+        input_bytes = self.nbytes(inputs.values())
+        estimate = self._estimate(operator, input_bytes)
+        used_bytes = self.client.used_bytes()
+
+        with self._lock:
+            total = used_bytes + estimate
+            total += sum(x.nbytes for x in self._reserved.values())
+            if running and total > self.capacity:
+                self.held += 1
+                return False
+
+            self.peak = max(self.peak, total)
+            self._reserved[key] = Reservation(operator.digest, input_bytes, estimate)
+
+        return True
+
+    def release(self, key: Any, outputs: Optional[Dict[PortKey, Port]] = None):
+        """Drop the reservation of an execution
+
+        If the execution completed, ``outputs`` are used to refine the next
+        estimates for the operator.
+        """
+        with self._lock:
+            reservation = self._reserved.pop(key, None)
+
+        if reservation is None or outputs is None:
+            return
+
+        output_bytes = self.nbytes(outputs.values())
+        with self._lock:
+            self._history[reservation.digest] = (reservation.input_bytes, output_bytes)
+
+    def nbytes(self, ports: Iterable[Port]) -> int:
+        """The bytes taken by the distinct objects of some ports"""
+        sizes: Dict[Any, int] = {}
+        for port in ports:
+            if not isinstance(port.data, PlasmaArray):
+                continue
+
+            object_id = port.data.object_id
+            if object_id not in sizes:
+                sizes[object_id] = self.client.object_size(object_id)
+
+        return sum(sizes.values())
+
+    def _estimate(self, operator: OperatorHandle, input_bytes: int) -> int:
+        config = operator.operator_config
+        if config.output_bytes is not None:
+            return config.output_bytes
+
+        if config.output_ratio is not None:
+            return int(config.output_ratio * input_bytes)
+
+        with self._lock:
+            history = self._history.get(operator.digest)
+
+        if history is not None:
+            last_input_bytes, last_output_bytes = history
+            if last_input_bytes == 0:
+                return last_output_bytes
+
+            return int(last_output_bytes * input_bytes / last_input_bytes)
+
+        return input_bytes
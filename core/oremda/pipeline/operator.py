@@ -1,13 +1,27 @@
+import asyncio
+from contextlib import contextmanager
 import copy
-from typing import Callable, Dict, Union, List
-
-import numpy as np
+import threading
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+    List,
+    cast,
+)
+import uuid
 
-from oremda.messengers import MQPMessenger
+from oremda.messengers import Messenger
 from oremda.plasma_client import PlasmaClient, PlasmaArray
 from oremda.typing import (
     ErrorTaskMessage,
     JSONType,
+    LocationType,
+    Message,
     OperateTaskMessage,
     PortKey,
     OperatorConfig,
@@ -15,9 +29,17 @@ from oremda.typing import (
     RawPort,
     ResultTaskMessage,
     MessageType,
+    TimingSpan,
+    as_message,
 )
+from oremda.pipeline.dispatch import ParallelDispatch
+from oremda.pipeline.join import Join, PreallocatedStackJoin, create_join
+from oremda.pipeline.replies import ReplyRouter
 from oremda.utils.concurrency import distribute_tasks
+from oremda.utils.timing import timed
 
+if TYPE_CHECKING:
+    from oremda.pipeline.deadline import Deadline
 
 KernelFn = Callable[
     [Dict[PortKey, RawPort], JSONType],
@@ -38,55 +60,458 @@ class OperatorHandle:
         input_queue: str,
         client: PlasmaClient,
         operator_config: OperatorConfig,
+        digest: Optional[str] = None,
     ):
         self.image_name = image_name
+        # Identifies the content of the image, falls back to its name
+        self.digest = digest or image_name
         self.name = name
         self.input_queue = input_queue
         self.parameters: JSONType = {}
-        self.messenger = MQPMessenger(client)
+        self.messenger = Messenger(LocationType.Local, client)
         self.client = client
         self.operator_config = operator_config
+        # The output queues used so far, kept for the next executions
+        self.output_queues: Set[str] = set()
+        # Executions running at the same time share their output queue
+        self.replies = ReplyRouter()
 
     def execute(
         self,
         inputs: Dict[PortKey, Port],
         output_queue: str,
+        parameters: Optional[JSONType] = None,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
     ) -> Dict[PortKey, Port]:
-        try:
-            return self.execute_func(inputs, output_queue)
-        finally:
-            # Clean up the output queue
+        """Execute the operator on its container
+
+        If ``parameters`` is given, it is used instead of ``self.parameters``.
+        If ``timings`` is given, the steps of the execution are appended to it,
+        including the ones timed by the containers.
+        If ``deadline`` is given, the execution is abandoned when it expires or
+        its run is cancelled. The results of an abandoned execution are
+        dropped when they arrive.
+        """
+        self.output_queues.add(output_queue)
+        return self.execute_func(inputs, output_queue, parameters, timings, deadline)
+
+    async def execute_async(
+        self,
+        inputs: Dict[PortKey, Port],
+        output_queue: str,
+        parameters: Optional[JSONType] = None,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
+    ) -> Dict[PortKey, Port]:
+        """Like execute(), but waits on the container without holding a thread"""
+        if self.operator_config.parallel:
+            execute = self.execute_parallel_async
+        else:
+            execute = self.execute_serial_async
+
+        self.output_queues.add(output_queue)
+        return await execute(inputs, output_queue, parameters, timings, deadline)
+
+    def close(self):
+        """Remove the output queues, once the operator will not run again"""
+        self.drop_late_results()
+        for output_queue in self.output_queues:
             self.messenger.unlink(output_queue)
 
+        self.output_queues = set()
+        self.messenger.close()
+
+    def drop_late_results(self):
+        """Drop the late results of abandoned executions, left in the queues
+
+        No execution may be waiting on the queues. The queues are kept, the
+        containers keep them open for the next executions.
+        """
+        for output_queue in self.output_queues:
+            while True:
+                try:
+                    serialized_msg = self.messenger.recv_encoded(output_queue, 0)
+                except TimeoutError:
+                    break
+
+                self.drop_result(self.messenger.decode(serialized_msg))
+
     @property
     def execute_func(self):
         settings = self.operator_config
         return self.execute_parallel if settings.parallel else self.execute_serial
 
-    def execute_serial(self, inputs: Dict[PortKey, Port], output_queue: str):
-        task = OperateTaskMessage(
+    def execute_serial(
+        self,
+        inputs: Dict[PortKey, Port],
+        output_queue: str,
+        parameters: Optional[JSONType] = None,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
+    ):
+        task = self.serial_task(inputs, output_queue, parameters)
+
+        with self.expect_results(task.task_id):
+            self.send_task(task, timings, deadline)
+            return self.receive_result(
+                output_queue, timings, deadline, task.task_id
+            ).outputs
+
+    async def execute_serial_async(
+        self,
+        inputs: Dict[PortKey, Port],
+        output_queue: str,
+        parameters: Optional[JSONType] = None,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
+    ):
+        task = self.serial_task(inputs, output_queue, parameters)
+
+        with self.expect_results(task.task_id):
+            await self.send_task_async(task, timings, deadline)
+            result = await self.receive_result_async(
+                output_queue, timings, deadline, task.task_id
+            )
+            return result.outputs
+
+    def execute_parallel(
+        self,
+        inputs: Dict[PortKey, Port],
+        output_queue: str,
+        parameters: Optional[JSONType] = None,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
+    ):
+        settings, tasks = self.parallel_tasks(inputs, output_queue, parameters)
+        task_id = tasks[0].task_id if tasks else None
+        dispatch = self.dispatch(settings, tasks)
+
+        # Receive the outputs, and join them as they arrive
+        join = self.create_join(settings, tasks)
+        outputs: List[Optional[Dict[PortKey, Port]]] = [None] * len(tasks)
+        with self.expect_results(task_id):
+            try:
+                while not dispatch.done:
+                    for task in dispatch.to_send():
+                        self.send_task(task, timings, deadline)
+
+                    result = self.receive_result(
+                        output_queue, timings, deadline, task_id
+                    )
+                    if not dispatch.accept(result):
+                        # The result of a copy of a task that already completed
+                        self.free_outputs([result.outputs])
+                        continue
+
+                    outputs[result.parallel_index] = result.outputs
+                    with timed(timings, "join"):
+                        self.fold_result(settings, join, result)
+
+                with timed(timings, "join"):
+                    return self.join_outputs(settings, outputs, join)
+            except BaseException:
+                if join is not None:
+                    join.discard()
+                self.free_outputs(outputs)
+                raise
+
+    async def execute_parallel_async(
+        self,
+        inputs: Dict[PortKey, Port],
+        output_queue: str,
+        parameters: Optional[JSONType] = None,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
+    ):
+        settings, tasks = self.parallel_tasks(inputs, output_queue, parameters)
+        task_id = tasks[0].task_id if tasks else None
+        dispatch = self.dispatch(settings, tasks)
+
+        join = self.create_join(settings, tasks)
+        outputs: List[Optional[Dict[PortKey, Port]]] = [None] * len(tasks)
+        with self.expect_results(task_id):
+            try:
+                while not dispatch.done:
+                    for task in dispatch.to_send():
+                        await self.send_task_async(task, timings, deadline)
+
+                    result = await self.receive_result_async(
+                        output_queue, timings, deadline, task_id
+                    )
+                    if not dispatch.accept(result):
+                        self.free_outputs([result.outputs])
+                        continue
+
+                    outputs[result.parallel_index] = result.outputs
+                    with timed(timings, "join"):
+                        self.fold_result(settings, join, result)
+
+                with timed(timings, "join"):
+                    return self.join_outputs(settings, outputs, join)
+            except BaseException:
+                if join is not None:
+                    join.discard()
+                self.free_outputs(outputs)
+                raise
+
+    def send_task(
+        self,
+        task: OperateTaskMessage,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
+    ):
+        with timed(timings, "encode"):
+            serialized_msg = self.messenger.encode(task)
+
+        with timed(timings, "send"):
+            if deadline is None:
+                self.messenger.send_encoded(serialized_msg, self.input_queue)
+                return
+
+            # The queue stays full if the container hangs
+            while True:
+                deadline.check()
+                try:
+                    timeout = deadline.wait_time()
+                    self.messenger.send_encoded(
+                        serialized_msg, self.input_queue, timeout
+                    )
+                    return
+                except TimeoutError:
+                    pass
+
+    async def send_task_async(
+        self,
+        task: OperateTaskMessage,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
+    ):
+        with timed(timings, "encode"):
+            serialized_msg = self.messenger.encode(task)
+
+        with timed(timings, "send"):
+            send = self.messenger.send_encoded_async
+            if deadline is None:
+                await send(serialized_msg, self.input_queue)
+                return
+
+            while True:
+                deadline.check()
+                try:
+                    timeout = deadline.wait_time()
+                    await send(serialized_msg, self.input_queue, timeout)
+                    return
+                except TimeoutError:
+                    pass
+
+    def receive_result(
+        self,
+        output_queue: str,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
+        task_id: Optional[str] = None,
+    ) -> ResultTaskMessage:
+        # The wait covers the time spent in the queue and in the container
+        with timed(timings, "wait"):
+            message = self.receive_message(output_queue, timings, deadline, task_id)
+
+        return self.accept_result(message, timings)
+
+    async def receive_result_async(
+        self,
+        output_queue: str,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
+        task_id: Optional[str] = None,
+    ) -> ResultTaskMessage:
+        with timed(timings, "wait"):
+            message = await self.receive_message_async(
+                output_queue, timings, deadline, task_id
+            )
+
+        return self.accept_result(message, timings)
+
+    def receive_message(
+        self,
+        output_queue: str,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
+        task_id: Optional[str] = None,
+    ) -> Message:
+        """Wait for a result of ``task_id``, see ReplyRouter"""
+        woken = threading.Event()
+        waker = woken.set
+        try:
+            while True:
+                message, receiving = self.replies.claim(task_id, waker)
+                if message is not None:
+                    return message
+
+                timeout = None if deadline is None else deadline.wait_time()
+                if receiving:
+                    try:
+                        serialized_msg = self.messenger.recv_encoded(
+                            output_queue, timeout
+                        )
+                    except TimeoutError:
+                        serialized_msg = None
+                    finally:
+                        self.replies.stop_receiving()
+
+                    message = self.route_result(serialized_msg, timings, task_id)
+                    if message is not None:
+                        return message
+                else:
+                    woken.wait(timeout)
+                    woken.clear()
+
+                if deadline is not None:
+                    deadline.check()
+        finally:
+            self.replies.forget(waker)
+
+    async def receive_message_async(
+        self,
+        output_queue: str,
+        timings: Optional[List[TimingSpan]] = None,
+        deadline: Optional["Deadline"] = None,
+        task_id: Optional[str] = None,
+    ) -> Message:
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+
+        def waker():
+            loop.call_soon_threadsafe(woken.set)
+
+        recv = self.messenger.recv_encoded_async
+        try:
+            while True:
+                message, receiving = self.replies.claim(task_id, waker)
+                if message is not None:
+                    return message
+
+                timeout = None if deadline is None else deadline.wait_time()
+                if receiving:
+                    try:
+                        serialized_msg = await recv(output_queue, timeout)
+                    except TimeoutError:
+                        serialized_msg = None
+                    finally:
+                        self.replies.stop_receiving()
+
+                    message = self.route_result(serialized_msg, timings, task_id)
+                    if message is not None:
+                        return message
+                else:
+                    try:
+                        await asyncio.wait_for(woken.wait(), timeout)
+                    except asyncio.TimeoutError:
+                        pass
+                    woken.clear()
+
+                if deadline is not None:
+                    deadline.check()
+        finally:
+            self.replies.forget(waker)
+
+    def route_result(
+        self,
+        serialized_msg: Optional[bytes],
+        timings: Optional[List[TimingSpan]] = None,
+        task_id: Optional[str] = None,
+    ) -> Optional[Message]:
+        """Decode a result, None if it belongs to another execution
+
+        The results of the other executions sharing the output queue are
+        handed over to them.
+        """
+        if serialized_msg is None:
+            return None
+
+        with timed(timings, "decode"):
+            message = self.messenger.decode(serialized_msg)
+
+        if getattr(message, "task_id", None) in (None, task_id):
+            return message
+
+        if not self.replies.hand_over(message):
+            # A late result of an abandoned execution
+            self.drop_result(message)
+
+        return None
+
+    def accept_result(
+        self, message: Message, timings: Optional[List[TimingSpan]] = None
+    ) -> ResultTaskMessage:
+        result = self.result(message)
+        if timings is not None:
+            timings.extend(result.timings)
+
+        return result
+
+    @contextmanager
+    def expect_results(self, task_id: Optional[str]):
+        """Route the results of ``task_id`` to this execution while it waits"""
+        if task_id is None:
+            yield
+            return
+
+        self.replies.register(task_id)
+        try:
+            yield
+        finally:
+            for message in self.replies.unregister(task_id):
+                self.drop_result(message)
+
+    def drop_result(self, message: Message):
+        if message.type != MessageType.Complete:
+            return
+
+        result = as_message(message, ResultTaskMessage)
+        for port in result.outputs.values():
+            self.free_port(port)
+
+    def free_port(self, port: Port):
+        if not isinstance(port.data, PlasmaArray):
+            return
+
+        # Outputs may be inputs passed through, that are still held
+        if not self.client.is_retained(port.data.object_id):
+            self.client.release(port.data.object_id)
+
+    def free_outputs(self, outputs: List[Optional[Dict[PortKey, Port]]]):
+        for x in outputs:
+            for port in (x or {}).values():
+                self.free_port(port)
+
+    def serial_task(
+        self,
+        inputs: Dict[PortKey, Port],
+        output_queue: str,
+        parameters: Optional[JSONType] = None,
+    ) -> OperateTaskMessage:
+        if parameters is None:
+            parameters = self.parameters
+
+        return OperateTaskMessage(
             **{
                 "inputs": inputs,
-                "params": self.parameters,
+                "params": parameters,
                 "output_queue": output_queue,
+                "task_id": uuid.uuid4().hex,
             }
         )
 
-        self.messenger.send(task, self.input_queue)
-        message = self.messenger.recv(output_queue)
-
-        if message.type == MessageType.Complete:
-            result = ResultTaskMessage(**message.dict())
-            return result.outputs
-        elif message.type == MessageType.Error:
-            error = ErrorTaskMessage(**message.dict())
-            raise OperatorException(error.error_string)
-        else:
-            raise Exception(f"Unknown message type: {message.type}")
-
-    def execute_parallel(self, inputs: Dict[PortKey, Port], output_queue: str):
+    def parallel_tasks(
+        self,
+        inputs: Dict[PortKey, Port],
+        output_queue: str,
+        parameters: Optional[JSONType] = None,
+    ) -> Tuple[OperatorConfig, List[OperateTaskMessage]]:
         settings = self.operator_config
-        parameters = self.parameters
+        if parameters is None:
+            parameters = self.parameters
 
         if settings.parallel_aware_operator:
             # The operator itself is parallel-aware. Override our settings
@@ -100,15 +525,15 @@ class OperatorHandle:
 
         self.validate_parallel_param(settings, parameters)
 
-        msg = OperateTaskMessage(
-            **{
-                "inputs": inputs,
-                "output_queue": output_queue,
-            }
-        )
-
         task_list = parameters[settings.parallel_param]  # type: ignore
-        if settings.distribute_parallel_tasks:
+        if self.dynamic(settings):
+            # Many small chunks, pulled by the containers as they become free
+            size = cast(int, settings.parallel_chunk_size)
+            task_list = [
+                task_list[start : start + size]
+                for start in range(0, len(task_list), size)
+            ]
+        elif settings.distribute_parallel_tasks:
             distributed = distribute_tasks(len(task_list), settings.num_containers)
             task_list = [task_list[start:stop] for start, stop in distributed]
 
@@ -116,69 +541,150 @@ class OperatorHandle:
             # There should only be one task in each. Let's reduce it down.
             task_list = [x[0] for x in task_list]
 
-        # Message queue messengers are non-blocking. Send them all right away.
+        # The tasks are parts of the same execution
+        task_id = uuid.uuid4().hex
+        tasks = []
         for i, task in enumerate(task_list):
             params = copy.deepcopy(parameters)
             params[settings.parallel_param] = task  # type: ignore
-            msg.params = params
-            msg.parallel_index = i
-            self.messenger.send(msg, self.input_queue)
+            msg = OperateTaskMessage(
+                **{
+                    "inputs": inputs,
+                    "params": params,
+                    "output_queue": output_queue,
+                    "parallel_index": i,
+                    "task_id": task_id,
+                }
+            )
+            tasks.append(msg)
 
-        # Now receive the outputs
-        outputs: List[Dict[PortKey, Port]] = [{}] * len(task_list)
-        for _ in outputs:
-            message = self.messenger.recv(output_queue)
+        return settings, tasks
 
-            if message.type == MessageType.Error:
-                error = ErrorTaskMessage(**message.dict())
-                raise OperatorException(error.error_string)
-            elif message.type != MessageType.Complete:
-                raise Exception(f"Unknown message type: {message.type}")
+    @staticmethod
+    def dynamic(settings: OperatorConfig) -> bool:
+        return (
+            settings.parallel_chunk_size is not None
+            and settings.distribute_parallel_tasks
+            and not settings.parallel_aware_operator
+        )
+
+    def dispatch(
+        self, settings: OperatorConfig, tasks: List[OperateTaskMessage]
+    ) -> ParallelDispatch:
+        if not self.dynamic(settings):
+            # Message queue messengers are non-blocking. Send them all right away.
+            return ParallelDispatch(tasks, len(tasks))
+
+        return ParallelDispatch(
+            tasks, settings.num_containers, settings.parallel_speculative
+        )
+
+    @staticmethod
+    def result(message: Message) -> ResultTaskMessage:
+        if message.type == MessageType.Complete:
+            return as_message(message, ResultTaskMessage)
+        elif message.type == MessageType.Error:
+            error = as_message(message, ErrorTaskMessage)
+            raise OperatorException(error.error_string)
+        else:
+            raise Exception(f"Unknown message type: {message.type}")
+
+    def create_join(
+        self, settings: OperatorConfig, tasks: List[OperateTaskMessage]
+    ) -> Optional[Join]:
+        if settings.parallel_output_to_join is None:
+            return None
 
-            result = ResultTaskMessage(**message.dict())
-            i = result.parallel_index
-            outputs[i] = result.outputs
+        method_name = settings.parallel_output_join_method
+        sizes = [self.task_size(settings, task) for task in tasks]
+        shape = settings.parallel_output_shape
+        if method_name == "stack" and shape is not None:
+            dtype = settings.parallel_output_dtype
+            return PreallocatedStackJoin(sizes, self.client, shape, dtype)
 
+        return create_join(method_name, sizes, settings.parallel_output_join_params)
+
+    @staticmethod
+    def task_size(settings: OperatorConfig, task: OperateTaskMessage) -> int:
+        """The number of items of a parallel task"""
+        items = task.params[settings.parallel_param]  # type: ignore
+        return len(items) if isinstance(items, list) else 1
+
+    def fold_result(
+        self, settings: OperatorConfig, join: Optional[Join], result: ResultTaskMessage
+    ):
+        """Add the part of a parallel execution to the join, as it arrives"""
+        output_to_join = settings.parallel_output_to_join
+        if join is None or output_to_join is None:
+            return
+
+        port = result.outputs.get(output_to_join)
+        if port is None:
+            raise Exception(
+                f"{output_to_join} is not in all outputs: {result.outputs=}"
+            )
+
+        if port.data is None:
+            return
+
+        join.add(result.parallel_index, port.data.data)
+
+        if join.streaming:
+            # Folded into the join, the part is no longer needed
+            self.free_port(port)
+            result.outputs[output_to_join] = Port(meta=port.meta)
+
+    def join_outputs(
+        self,
+        settings: OperatorConfig,
+        outputs: List[Optional[Dict[PortKey, Port]]],
+        join: Optional[Join] = None,
+    ) -> Dict[PortKey, Port]:
+        """Join the outputs of a parallel execution
+
+        The parts may already have been added to ``join``, see fold_result().
+        Every part is freed, except the outputs of the first one that are not
+        joined, which are returned.
+        """
         if any(x is None for x in outputs):
             raise Exception(f"Failed to receive some outputs: {outputs=}")
 
-        output = outputs[0]
+        parts = cast(List[Dict[PortKey, Port]], outputs)
+        output = dict(parts[0])
 
         # Now grab the output parameter to stack
         output_to_join = settings.parallel_output_to_join
 
         if output_to_join is not None:
-            if any(output_to_join not in x for x in outputs):
+            if any(output_to_join not in x for x in parts):
                 raise Exception(f"{output_to_join} is not in all outputs: {outputs=}")
 
-            # Join methods take a list of arrays to join
-            join_methods = {
-                "stack": np.hstack,
-                "sum": sum,
-            }
-            method_name = settings.parallel_output_join_method
-            if method_name not in join_methods:
-                raise NotImplementedError(method_name)
-
-            join = join_methods[method_name]
-
-            # Join.
-            join_args = []
-            for x in outputs:
-                port = x[output_to_join]
-                if port.data is not None:
-                    join_args.append(port.data.data)
+            if join is None:
+                method_name = settings.parallel_output_join_method
+                params = settings.parallel_output_join_params
+                join = create_join(method_name, [1] * len(parts), params)
+                for i, x in enumerate(parts):
+                    port = x[output_to_join]
+                    if port.data is not None:
+                        join.add(i, port.data.data)
 
             output[output_to_join] = Port(
                 **{
-                    "data": PlasmaArray(
-                        self.client,
-                        join(join_args),
-                    ),
-                    "meta": outputs[0][output_to_join].meta,
+                    "data": join.output(self.client),
+                    "meta": parts[0][output_to_join].meta,
                 }
             )
 
+            if not join.streaming:
+                for x in parts:
+                    self.free_port(x[output_to_join])
+
+        # The other outputs of the other parts are not used
+        for x in parts[1:]:
+            for name, port in x.items():
+                if name != output_to_join and port is not output.get(name):
+                    self.free_port(port)
+
         return output
 
     @staticmethod
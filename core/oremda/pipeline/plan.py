@@ -0,0 +1,188 @@
+from collections import deque
+import json
+from typing import TYPE_CHECKING, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from oremda.typing import IdType, NodeType, PortType
+from oremda.utils.id import port_id
+
+if TYPE_CHECKING:
+    from oremda.pipeline import PipelineEdge, PipelineNode
+
+
+class ExecutionPlan:
+    """A precompiled view of a pipeline graph
+
+    The plan is built once when the graph is set, so that running the pipeline
+    only needs to walk it instead of re-scanning every node and edge.
+
+    Attributes:
+        order: the operator node ids, in topological order.
+        input_edges: the edges entering each node.
+        output_edges: the edges leaving each node.
+        in_degree: the number of edges entering each operator node, used as
+                   the initial value of the dependency counters.
+        port_consumers: the number of edges reading each data port, keyed by
+                        port id. Ports without consumers are not listed.
+    """
+
+    def __init__(
+        self,
+        order: List[IdType],
+        input_edges: Dict[IdType, Tuple["PipelineEdge", ...]],
+        output_edges: Dict[IdType, Tuple["PipelineEdge", ...]],
+        in_degree: Dict[IdType, int],
+        port_consumers: Dict[str, int],
+    ):
+        self.order = order
+        self.input_edges = input_edges
+        self.output_edges = output_edges
+        self.in_degree = in_degree
+        self.port_consumers = port_consumers
+
+    def counters(self, operator_ids: Optional[Set[IdType]] = None) -> Dict[IdType, int]:
+        """A fresh copy of the dependency counters for a run
+
+        If ``operator_ids`` is given, only those operators are counted, and
+        only the edges coming from operators of the set are dependencies.
+        """
+        if operator_ids is None:
+            return dict(self.in_degree)
+
+        return {
+            id: sum(e.output_node_id in operator_ids for e in self.input_edges[id])
+            for id in self.order
+            if id in operator_ids
+        }
+
+    def downstream(self, operator_ids: Iterable[IdType]) -> Set[IdType]:
+        """The given operators and every operator depending on them"""
+        result = set(operator_ids)
+        for id in self.order:
+            if id not in result:
+                continue
+
+            for edge in self.output_edges[id]:
+                if edge.input_node_id in self.in_degree:
+                    result.add(edge.input_node_id)
+
+        return result
+
+    def upstream(self, operator_ids: Iterable[IdType]) -> Set[IdType]:
+        """The given operators and every operator they depend on"""
+        result = set(operator_ids)
+        for id in reversed(self.order):
+            if id not in result:
+                continue
+
+            for edge in self.input_edges[id]:
+                result.add(edge.output_node_id)
+
+        return result
+
+    def consumers(self, operator_ids: Optional[Set[IdType]] = None) -> Dict[str, int]:
+        """A fresh copy of the port consumer counters for a run
+
+        If ``operator_ids`` is given, only the edges read by operators of the
+        set are counted.
+        """
+        if operator_ids is None:
+            return dict(self.port_consumers)
+
+        consumers: Dict[str, int] = {}
+        for id in self.order:
+            if id not in operator_ids:
+                continue
+
+            for edge in self.input_edges[id]:
+                source_port_id = port_id(edge.output_node_id, edge.output_port.name)
+                consumers[source_port_id] = consumers.get(source_port_id, 0) + 1
+
+        return consumers
+
+
+def compile_plan(
+    nodes: Mapping[IdType, "PipelineNode"], edges: Mapping[IdType, "PipelineEdge"]
+) -> ExecutionPlan:
+    input_edges: Dict[IdType, List["PipelineEdge"]] = {id: [] for id in nodes}
+    output_edges: Dict[IdType, List["PipelineEdge"]] = {id: [] for id in nodes}
+    port_consumers: Dict[str, int] = {}
+
+    for edge in edges.values():
+        output_edges[edge.output_node_id].append(edge)
+        input_edges[edge.input_node_id].append(edge)
+
+        if edge.output_port.type != PortType.Display:
+            source_port_id = port_id(edge.output_node_id, edge.output_port.name)
+            port_consumers[source_port_id] = port_consumers.get(source_port_id, 0) + 1
+
+    operator_ids = [id for id, node in nodes.items() if node.type == NodeType.Operator]
+    in_degree = {id: len(input_edges[id]) for id in operator_ids}
+
+    # Kahn's algorithm, keeping the insertion order of the nodes for ties
+    counters = dict(in_degree)
+    ready = deque(id for id in operator_ids if counters[id] == 0)
+    order: List[IdType] = []
+
+    while ready:
+        node_id = ready.popleft()
+        order.append(node_id)
+
+        for edge in output_edges[node_id]:
+            next_id = edge.input_node_id
+            if next_id not in counters:
+                # Not an operator (e.g. a display)
+                continue
+
+            counters[next_id] -= 1
+            if counters[next_id] == 0:
+                ready.append(next_id)
+
+    if len(order) != len(operator_ids):
+        cycle = [id for id in operator_ids if counters[id] > 0]
+        msg = f"The pipeline contains a cycle, these nodes cannot be resolved: {cycle}"
+        raise Exception(msg)
+
+    return ExecutionPlan(
+        order,
+        {id: tuple(x) for id, x in input_edges.items()},
+        {id: tuple(x) for id, x in output_edges.items()},
+        in_degree,
+        port_consumers,
+    )
+
+
+def equivalent_operators(
+    nodes: Mapping[IdType, "PipelineNode"], plan: ExecutionPlan
+) -> Dict[IdType, IdType]:
+    """Map every operator that duplicates an earlier one to that operator
+
+    Two operators are equivalent if they run the same image with the same
+    parameters on equivalent inputs, so only one of them needs to run.
+    Operators that are not cacheable may not be deterministic, and are never
+    merged.
+    """
+    equivalent: Dict[IdType, IdType] = {}
+    seen: Dict[str, IdType] = {}
+
+    for id in plan.order:
+        operator = getattr(nodes[id], "operator", None)
+        if operator is None or not operator.operator_config.cacheable:
+            continue
+
+        inputs = sorted(
+            (
+                edge.input_port.name,
+                str(equivalent.get(edge.output_node_id, edge.output_node_id)),
+                edge.output_port.name,
+            )
+            for edge in plan.input_edges[id]
+        )
+        obj = [operator.digest, operator.parameters, inputs]
+        key = json.dumps(obj, sort_keys=True, default=str)
+
+        if key in seen:
+            equivalent[id] = seen[key]
+        else:
+            seen[key] = id
+
+    return equivalent
@@ -0,0 +1,89 @@
+from collections import deque
+import threading
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from oremda.typing import Message
+
+Waker = Callable[[], None]
+
+
+class ReplyRouter:
+    """Share the output queue of an operator between its executions
+
+    The executions of an operator running at the same time, like the lanes of
+    a batch, wait on the same output queue. One of them receives from the
+    queue at a time, and hands the results of the others over to them,
+    matched by task id. The others wait to be woken up, either because their
+    result was handed over, or because the queue is free to receive from.
+
+    The results of task ids that are not registered, the late results of
+    abandoned executions, are not handed over, the receiver drops them.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._results: Dict[str, Deque[Message]] = {}
+        self._wakers: Set[Waker] = set()
+        self._receiving = False
+
+    def register(self, task_id: str):
+        """Expect results for a task id, before its tasks are sent"""
+        with self._lock:
+            self._results.setdefault(task_id, deque())
+
+    def unregister(self, task_id: str) -> List[Message]:
+        """Stop expecting results for a task id
+
+        Returns the results handed over but not taken, to be dropped.
+        """
+        with self._lock:
+            return list(self._results.pop(task_id, ()))
+
+    def claim(self, task_id: str, waker: Waker) -> Tuple[Optional[Message], bool]:
+        """A result handed over for ``task_id``, or the right to receive
+
+        Returns the result if there is one. Otherwise, returns whether the
+        caller may receive from the queue, until it calls stop_receiving(). If
+        it may not, ``waker`` is called once there is something new.
+        """
+        with self._lock:
+            results = self._results.get(task_id)
+            if results:
+                self._wakers.discard(waker)
+                return results.popleft(), False
+
+            if not self._receiving:
+                self._receiving = True
+                self._wakers.discard(waker)
+                return None, True
+
+            self._wakers.add(waker)
+            return None, False
+
+    def stop_receiving(self):
+        with self._lock:
+            self._receiving = False
+            self._wake()
+
+    def hand_over(self, message: Message) -> bool:
+        """Hand a result over to its execution, False if none expects it"""
+        task_id = getattr(message, "task_id", None)
+        with self._lock:
+            results = self._results.get(task_id)  # type: ignore
+            if results is None:
+                return False
+
+            results.append(message)
+            self._wake()
+
+        return True
+
+    def forget(self, waker: Waker):
+        """Forget the waker of a caller that stopped waiting"""
+        with self._lock:
+            self._wakers.discard(waker)
+
+    def _wake(self):
+        wakers, self._wakers = self._wakers, set()
+        for waker in wakers:
+            waker()
@@ -0,0 +1,162 @@
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from oremda.typing import IdType
+
+if TYPE_CHECKING:
+    from oremda.pipeline import Pipeline
+
+
+class ExecutionRecord:
+    """When an operator ran during the last run, and what it produced
+
+    In a batch, the record spans every execution of the operator.
+    """
+
+    def __init__(self, start: float):
+        self.start = start
+        self.end: Optional[float] = None
+        self.nbytes = 0
+
+    @property
+    def duration(self) -> float:
+        if self.end is None:
+            return 0.0
+
+        return self.end - self.start
+
+
+class OperatorReport:
+    def __init__(
+        self,
+        id: IdType,
+        duration: float,
+        slack: float,
+        share: float,
+        nbytes: int,
+        critical: bool,
+    ):
+        self.id = id
+        self.duration = duration
+        self.slack = slack
+        self.share = share
+        self.nbytes = nbytes
+        self.critical = critical
+
+
+class RunReport:
+    """The critical path and bottlenecks of a completed run
+
+    Attributes:
+        wall_time: the time from the first operator start to the last
+                   operator completion.
+        critical_path: the chain of dependent operators that took the
+                       longest, in execution order. Speeding up anything else
+                       does not shorten the run.
+        operators: the report of every operator that ran, where ``slack`` is
+                   how much later it could have completed without delaying
+                   the run, and ``share`` its fraction of the wall time.
+    """
+
+    def __init__(
+        self,
+        wall_time: float,
+        critical_path: List[IdType],
+        operators: Dict[IdType, OperatorReport],
+    ):
+        self.wall_time = wall_time
+        self.critical_path = critical_path
+        self.operators = operators
+
+    def format(self) -> str:
+        lines = [
+            f"Wall time: {self.wall_time:.3f} s",
+            "Critical path: " + " -> ".join(str(id) for id in self.critical_path),
+            "",
+            f"{'operator':<40} {'time (s)':>10} {'share':>7} {'slack (s)':>10} "
+            f"{'bytes':>12}",
+        ]
+
+        operators = sorted(self.operators.values(), key=lambda x: -x.duration)
+        for op in operators:
+            marker = "*" if op.critical else " "
+            lines.append(
+                f"{marker}{str(op.id):<39} {op.duration:>10.3f} {op.share:>7.1%} "
+                f"{op.slack:>10.3f} {op.nbytes:>12}"
+            )
+
+        return "\n".join(lines)
+
+
+def analyze_run(pipeline: "Pipeline") -> RunReport:
+    """Compute the critical path of the last run of a pipeline
+
+    Only the operators that completed are part of the analysis.
+    """
+    records = {
+        id: record
+        for id, record in pipeline.executions.items()
+        if record.end is not None
+    }
+
+    if not records:
+        return RunReport(0.0, [], {})
+
+    plan = pipeline.plan
+    order = [id for id in plan.order if id in records]
+    duration = {id: records[id].duration for id in order}
+
+    def predecessors(id: IdType) -> List[IdType]:
+        return [
+            edge.output_node_id
+            for edge in plan.input_edges[id]
+            if edge.output_node_id in records
+        ]
+
+    def successors(id: IdType) -> List[IdType]:
+        return [
+            edge.input_node_id
+            for edge in plan.output_edges[id]
+            if edge.input_node_id in records
+        ]
+
+    # Earliest finish of every operator if it started as soon as its inputs
+    # were ready
+    earliest: Dict[IdType, float] = {}
+    for id in order:
+        start = max((earliest[x] for x in predecessors(id)), default=0.0)
+        earliest[id] = start + duration[id]
+
+    length = max(earliest.values())
+
+    # Latest finish that does not delay the run
+    latest: Dict[IdType, float] = {}
+    for id in reversed(order):
+        latest[id] = min(
+            (latest[x] - duration[x] for x in successors(id)), default=length
+        )
+
+    # Walk back from the operator finishing last
+    critical_path: List[IdType] = []
+    current: Optional[IdType] = max(order, key=lambda x: earliest[x])
+    while current is not None:
+        critical_path.append(current)
+        current = max(predecessors(current), key=lambda x: earliest[x], default=None)
+
+    critical_path.reverse()
+
+    wall_time = max(r.end for r in records.values()) - min(  # type: ignore
+        r.start for r in records.values()
+    )
+
+    operators = {}
+    for id in order:
+        operators[id] = OperatorReport(
+            id,
+            duration[id],
+            max(latest[id] - earliest[id], 0.0),
+            duration[id] / wall_time if wall_time > 0 else 0.0,
+            records[id].nbytes,
+            id in critical_path,
+        )
+
+    return RunReport(wall_time, critical_path, operators)
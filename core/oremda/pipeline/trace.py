@@ -0,0 +1,107 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional
+
+from oremda.typing import IdType, TimingSpan
+
+# The Chrome trace format expects microseconds
+MICROSECONDS = 1e6
+
+
+class TraceRecord:
+    def __init__(
+        self, operator_id: IdType, spans: List[TimingSpan], lane: Optional[int] = None
+    ):
+        self.operator_id = operator_id
+        self.spans = spans
+        self.lane = lane
+
+
+class Trace:
+    """The timings of the operator executions of a pipeline
+
+    Set an instance as ``pipeline.trace`` to record every execution. The
+    records can be exported to the Chrome trace format, which can be opened
+    in chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    def __init__(self):
+        self.records: List[TraceRecord] = []
+        self._lock = threading.Lock()
+
+    def add(
+        self, operator_id: IdType, spans: List[TimingSpan], lane: Optional[int] = None
+    ):
+        with self._lock:
+            self.records.append(TraceRecord(operator_id, spans, lane))
+
+    def clear(self):
+        with self._lock:
+            self.records = []
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Convert the records to the Chrome trace event format
+
+        The steps run by the pipeline get one track per operator node, and
+        the steps run by the containers get one track per container.
+        """
+        spans = [span for record in self.records for span in record.spans]
+        if not spans:
+            return {"traceEvents": []}
+
+        origin = min(span.start for span in spans)
+
+        pipeline_pid = 1
+        containers_pid = 2
+        tracks: Dict[Any, int] = {}
+        events: List[Dict[str, Any]] = [
+            process_name_event(pipeline_pid, "pipeline"),
+            process_name_event(containers_pid, "containers"),
+        ]
+
+        for record in self.records:
+            for span in record.spans:
+                if span.worker is None:
+                    pid, name = pipeline_pid, f"operator {record.operator_id}"
+                else:
+                    pid, name = containers_pid, span.worker
+
+                if (pid, name) not in tracks:
+                    tracks[(pid, name)] = len(tracks) + 1
+                    events.append(thread_name_event(pid, tracks[(pid, name)], name))
+
+                args: Dict[str, Any] = {"operator": str(record.operator_id)}
+                if record.lane is not None:
+                    args["lane"] = record.lane
+
+                events.append(
+                    {
+                        "name": span.name,
+                        "ph": "X",
+                        "ts": (span.start - origin) * MICROSECONDS,
+                        "dur": (span.end - span.start) * MICROSECONDS,
+                        "pid": pid,
+                        "tid": tracks[(pid, name)],
+                        "args": args,
+                    }
+                )
+
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: str):
+        with open(path, "w") as wf:
+            json.dump(self.to_chrome(), wf)
+
+
+def process_name_event(pid: int, name: str) -> Dict[str, Any]:
+    return {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": name}}
+
+
+def thread_name_event(pid: int, tid: int, name: str) -> Dict[str, Any]:
+    return {
+        "name": "thread_name",
+        "ph": "M",
+        "pid": pid,
+        "tid": tid,
+        "args": {"name": name},
+    }
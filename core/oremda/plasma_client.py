@@ -1,19 +1,83 @@
+import threading
+
 from oremda.typing import DataType, ObjectId, DataArray
-from typing import Any, Union, get_args
+from typing import Any, Dict, Sequence, Tuple, Union, get_args
 
+import numpy as np
+import pyarrow
 import pyarrow.plasma as plasma
 
 
 class PlasmaClient:
     def __init__(self, plasma_socket: str):
         self.plasma_client = plasma.connect(plasma_socket)
+        self._refs: Dict[plasma.ObjectID, int] = {}
+        self._refs_lock = threading.Lock()
 
     def create_object(self, obj: DataType) -> plasma.ObjectID:
         return self.plasma_client.put(obj)
 
+    def create_array(
+        self, shape: Sequence[int], dtype: str
+    ) -> Tuple[plasma.ObjectID, np.ndarray]:
+        """Create an array in the store, to be filled in before seal()
+
+        Returns the id of the object and a writable view of its data. The
+        object cannot be read, from this client or any other, until sealed.
+        """
+        serialized = pyarrow.serialize(np.zeros(shape, dtype))
+        object_id = plasma.ObjectID.from_random()
+        buffer = self.plasma_client.create(object_id, serialized.total_bytes)
+        serialized.write_to(pyarrow.FixedSizeBufferWriter(buffer))
+
+        # The array read back from the buffer is read-only. Make a writable
+        # view of the same bytes.
+        template = pyarrow.deserialize(buffer)
+        offset = template.ctypes.data - buffer.address
+        array = np.frombuffer(buffer, template.dtype, template.size, offset)
+        return object_id, array.reshape(template.shape)
+
+    def seal(self, object_id: plasma.ObjectID):
+        self.plasma_client.seal(object_id)
+
     def get_object(self, object_id: plasma.ObjectID) -> DataType:
         return self.plasma_client.get(object_id)
 
+    def object_size(self, object_id: plasma.ObjectID) -> int:
+        obj: Any = self.get_object(object_id)
+        return obj.nbytes if hasattr(obj, "nbytes") else len(obj)
+
+    def used_bytes(self) -> int:
+        """The bytes taken in the store by every object, of every client"""
+        objects = self.plasma_client.list().values()
+        return sum(x["data_size"] + x.get("metadata_size", 0) for x in objects)
+
+    def delete_objects(self, object_ids: Sequence[plasma.ObjectID]):
+        self.plasma_client.delete(list(object_ids))
+
+    def retain(self, object_id: plasma.ObjectID):
+        """Add a reference to an object, so it is kept alive until released"""
+        with self._refs_lock:
+            self._refs[object_id] = self._refs.get(object_id, 0) + 1
+
+    def is_retained(self, object_id: plasma.ObjectID) -> bool:
+        with self._refs_lock:
+            return object_id in self._refs
+
+    def release(self, object_id: plasma.ObjectID):
+        """Remove a reference to an object
+
+        The object is deleted from the store once its last reference is
+        released. Releasing an object that was never retained deletes it.
+        """
+        with self._refs_lock:
+            count = self._refs.pop(object_id, 1) - 1
+            if count > 0:
+                self._refs[object_id] = count
+                return
+
+        self.delete_objects([object_id])
+
 
 class PlasmaArray(DataArray):
     def __init__(
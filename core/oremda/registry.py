@@ -1,11 +1,12 @@
 import json
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 from pydantic import BaseModel, Field
 
 from oremda.typing import (
     IOType,
     JSONType,
+    LocationType,
     OperatorConfig,
     PortKey,
     PortInfo,
@@ -14,7 +15,7 @@ from oremda.typing import (
 from oremda.plasma_client import PlasmaClient
 from oremda.clients.base.client import ClientBase as ContainerClient
 from oremda.clients.base.container import ContainerBase
-from oremda.messengers import MQPMessenger
+from oremda.messengers import Messenger
 from oremda.utils.mpi import mpi_rank
 
 
@@ -27,6 +28,7 @@ class ImageInfo(BaseModel):
     running: bool = False
     operator_config: OperatorConfig = OperatorConfig()
     metadata: Optional[Dict[str, JSONType]] = None
+    digest: Optional[str] = None
 
     class Config:
         arbitrary_types_allowed = True
@@ -55,7 +57,8 @@ class Registry:
             # Already registered
             return
 
-        labels = self._inspect(image_name)
+        image = self._image(image_name)
+        labels = image.labels
 
         operator_config = self.operator_config_dict.get(image_name, {})
 
@@ -72,6 +75,7 @@ class Registry:
                 },
                 "params": {k: v.dict() for k, v in labels.params.items()},
                 "operator_config": OperatorConfig(**operator_config),
+                "digest": image.digest,
             }
         )
 
@@ -80,9 +84,8 @@ class Registry:
 
         self.images[image_name] = info
 
-    def _inspect(self, image_name: str):
-        image: Any = self.container_client.image(image_name)
-        return image.labels
+    def _image(self, image_name: str) -> Any:
+        return self.container_client.image(image_name)
 
     def _info(self, image_name: str) -> ImageInfo:
         return self.images[image_name]
@@ -114,6 +117,10 @@ class Registry:
         info = self._info(image_name)
         return info.input_queue
 
+    def digest(self, image_name):
+        info = self._info(image_name)
+        return info.digest
+
     def run(
         self,
         image_name,
@@ -123,6 +130,10 @@ class Registry:
             # Already running
             return
 
+        # The image may have been rebuilt or pulled again under the same name
+        # since it was registered, identify what the containers will run
+        info.digest = self._image(image_name).digest
+
         operator_config = info.operator_config
         operator_config.validate_params()
         num_to_run = operator_config.num_containers_on_this_rank
@@ -159,11 +170,14 @@ class Registry:
     def image_names(self):
         return list(self.images.keys())
 
-    def start_containers(self):
-        return [self.run(name) for name in self.image_names]
+    def start_containers(self, image_names: Optional[Iterable[str]] = None):
+        if image_names is None:
+            image_names = self.image_names
+
+        return [self.run(name) for name in image_names]
 
     def stop(self, image_name):
-        messenger = MQPMessenger(self.plasma_client)
+        messenger = Messenger(LocationType.Local, self.plasma_client)
         input_queue = self.input_queue(image_name)
         info = self._info(image_name)
 
@@ -172,9 +186,12 @@ class Registry:
 
         # Tell it to unlink, so the queue gets removed
         messenger.unlink(input_queue)
+        messenger.close()
 
+        info.containers = []
         info.running = False
 
     def release(self):
         for image_name in self.images:
-            self.stop(image_name)
+            if self.running(image_name):
+                self.stop(image_name)
@@ -1,4 +1,4 @@
-from typing import Any, Callable, Dict, Optional, Sequence, Union, List
+from typing import Any, Callable, Dict, Optional, Sequence, Type, TypeVar, Union, List
 from abc import ABC, abstractmethod
 from uuid import UUID
 import numpy as np
@@ -129,6 +129,12 @@ class LocationType(str, Enum):
     Remote = "remote"
 
 
+class RunPriority(str, Enum):
+    # Runs waiting on a user, they go ahead of the batch ones
+    Interactive = "interactive"
+    Batch = "batch"
+
+
 class DataArray(ABC):
     @property
     @abstractmethod
@@ -219,6 +225,22 @@ class OperateTaskMessage(Message):
     params: JSONType = {}
     output_queue: str
     parallel_index: int = 0
+    # Identifies the execution, the results carry it back
+    task_id: Optional[str] = None
+
+
+class TimingSpan(BaseModel):
+    """A timed step of an operator execution
+
+    ``start`` and ``end`` are wall clock times, in seconds since the epoch.
+    ``worker`` identifies the container the step ran in, it is None for the
+    steps run by the pipeline itself.
+    """
+
+    name: str
+    start: float
+    end: float
+    worker: Optional[str] = None
 
 
 class ResultTaskMessage(Message):
@@ -228,17 +250,21 @@ class ResultTaskMessage(Message):
     type = MessageType.Complete
     outputs: Dict[PortKey, Port] = {}
     parallel_index: int = 0
+    # The steps of the execution, timed by the operator
+    timings: List[TimingSpan] = []
+    task_id: Optional[str] = None
 
 
 class ErrorTaskMessage(Message):
     type = MessageType.Error
     error_string: str
     parallel_index: int = 0
+    task_id: Optional[str] = None
 
 
 class TerminateTaskMessage(Message):
-    def __init__(self) -> None:
-        super().__init__(type=MessageType.Terminate)
+    def __init__(self, **data) -> None:
+        super().__init__(**{**data, "type": MessageType.Terminate})
 
     type = MessageType.Terminate
 
@@ -248,6 +274,20 @@ class MPINodeReadyMessage(Message):
     queue: Optional[str] = None
 
 
+M = TypeVar("M", bound=Message)
+
+
+def as_message(message: Message, cls: Type[M]) -> M:
+    """The message as a ``cls``, only converted and validated if it is not one
+
+    The messengers decode the messages into the class of their type already.
+    """
+    if isinstance(message, cls):
+        return message
+
+    return cls(**message.dict())
+
+
 class PortJSON(BaseModel):
     id: IdType
     port: PortKey
@@ -283,6 +323,33 @@ class PipelineJSON(BaseModel):
     edges: Sequence[EdgeJSON] = []
 
 
+class PipelineDiffJSON(BaseModel):
+    """A change to the graph of an existing pipeline
+
+    ``params`` maps operator node ids to the parameters that changed, and
+    edges are matched on their end points when they are removed.
+    """
+
+    params: Dict[IdType, JSONType] = {}
+    added_edges: Sequence[EdgeJSON] = Field([], alias="addedEdges")
+    removed_edges: Sequence[EdgeJSON] = Field([], alias="removedEdges")
+
+    class Config:
+        allow_population_by_field_name = True
+
+
+class PipelineRunJSON(PipelineJSON):
+    """A pipeline to create, and the priority of its run"""
+
+    priority: RunPriority = RunPriority.Interactive
+
+
+class PipelineUpdateJSON(PipelineDiffJSON):
+    """A change to a pipeline, and the priority of the run that follows"""
+
+    priority: RunPriority = RunPriority.Interactive
+
+
 class PortLabels(BaseModel):
     type: PortType = PortType.Data
     required: bool = True
@@ -313,7 +380,28 @@ class OperatorConfig(BaseModel):
     distribute_parallel_tasks: bool = True
     parallel_param: Optional[str] = None
     parallel_output_to_join: Optional[str] = None
+    # A join registered in oremda.pipeline.join, or the path of a Join class
     parallel_output_join_method: str = "stack"
+    # The keyword arguments of the join, such as the axis of "concat"
+    parallel_output_join_params: Dict[str, Any] = {}
+    # If set, the tasks are cut into chunks of this size, which the containers
+    # pull as they become free, instead of one equal share per container
+    parallel_chunk_size: Optional[int] = None
+    # Whether idle containers run a copy of the slowest chunks
+    parallel_speculative: bool = False
+    # The shape and dtype of the stacked output, if known. The output is then
+    # created in the store up front, and the parts are copied into it as they
+    # arrive.
+    parallel_output_shape: Optional[List[int]] = None
+    parallel_output_dtype: str = "float64"
+    # Whether the results of the operator may be reused for identical inputs
+    cacheable: bool = True
+    # The bytes of the outputs, if known, used for the admission control
+    output_bytes: Optional[int] = None
+    # Otherwise, the bytes of the outputs per byte of the inputs, if known
+    output_ratio: Optional[float] = None
+    # The seconds an execution may take before it is abandoned, if limited
+    timeout: Optional[float] = None
 
     @property
     def num_containers(self):
@@ -331,6 +419,10 @@ class OperatorConfig(BaseModel):
             )
             raise Exception(msg)
 
+        if self.parallel_chunk_size is not None and self.parallel_chunk_size < 1:
+            msg = f"parallel_chunk_size must be at least 1: {self.parallel_chunk_size}"
+            raise Exception(msg)
+
         if self.parallel and not self.parallel_aware_operator:
             if not self.parallel_param or not self.parallel_output_to_join:
                 msg = (
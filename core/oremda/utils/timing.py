@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+import time
+from typing import List, Optional
+
+from oremda.typing import TimingSpan
+
+
+@contextmanager
+def timed(spans: Optional[List[TimingSpan]], name: str, worker: Optional[str] = None):
+    """Time the enclosed block, and append it to spans
+
+    Nothing is recorded if spans is None.
+    """
+    if spans is None:
+        yield
+        return
+
+    start = time.time()
+    try:
+        yield
+    finally:
+        span = TimingSpan(name=name, start=start, end=time.time(), worker=worker)
+        spans.append(span)
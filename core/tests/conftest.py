@@ -0,0 +1,11 @@
+import pytest
+
+from oremda.plasma_client import PlasmaClient
+from oremda.utils.plasma import start_plasma_store
+
+
+@pytest.fixture(scope="session")
+def plasma_client(tmp_path_factory):
+    socket_path = str(tmp_path_factory.mktemp("plasma") / "plasma.sock")
+    with start_plasma_store(50_000_000, socket_path):
+        yield PlasmaClient(socket_path)
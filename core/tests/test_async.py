@@ -0,0 +1,111 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from oremda.pipeline.deadline import RunCancelled
+from oremda.pipeline.operator import OperatorException
+from oremda.utils.id import port_id
+
+from .utils import fan_out, max_overlap
+
+
+def test_run_async(plasma_client):
+    pipeline, source, branches, sink = fan_out(plasma_client, 4)
+
+    asyncio.run(pipeline.run_async(max_in_flight=4))
+
+    assert max_overlap(branches) == 4
+    assert max_overlap([source, sink, branches[0]]) == 1
+    np.testing.assert_array_equal(
+        pipeline.ports[port_id("sink", "out")].data.data, np.full(4, 8)
+    )
+    assert len(pipeline.observer.completed) == 1
+    pipeline.release()
+
+
+@pytest.mark.parametrize("max_in_flight", [1, 3])
+def test_max_in_flight(plasma_client, max_in_flight):
+    pipeline, source, branches, sink = fan_out(plasma_client, 4, delay=0.05)
+
+    asyncio.run(pipeline.run_async(max_in_flight=max_in_flight))
+
+    assert max_overlap([source, *branches, sink]) == max_in_flight
+    assert len(pipeline.observer.completed) == 1
+    pipeline.release()
+
+
+def test_invalid_max_in_flight(plasma_client):
+    pipeline, *_ = fan_out(plasma_client, 2)
+
+    with pytest.raises(Exception, match="max_in_flight"):
+        asyncio.run(pipeline.run_async(max_in_flight=0))
+
+
+def test_loop_is_not_blocked(plasma_client):
+    pipeline, *_ = fan_out(plasma_client, 2, delay=0.2)
+    ticks = []
+
+    async def main():
+        async def tick():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.ensure_future(tick())
+        await pipeline.run_async()
+        ticker.cancel()
+
+    asyncio.run(main())
+
+    assert len(ticks) > 5
+    pipeline.release()
+
+
+def test_failure(plasma_client):
+    def fail_first(inputs, parameters):
+        if parameters["index"] == 0:
+            raise OperatorException("Failed")
+
+        return {"out": inputs["in"]}
+
+    pipeline, source, branches, sink = fan_out(
+        plasma_client, 3, delay=0.05, kernel=fail_first
+    )
+
+    asyncio.run(pipeline.run_async(max_in_flight=3))
+
+    # The running operators finish, nothing else is dispatched
+    assert all(len(x.calls) == 1 and x.running == 0 for x in branches)
+    assert not sink.calls
+    assert [id for id, _ in pipeline.observer.operator_errors] == ["branch0"]
+    assert not pipeline.observer.completed
+
+
+def test_cancel(plasma_client):
+    pipeline, source, branches, sink = fan_out(plasma_client, 2, delay=5.0)
+
+    async def main():
+        run = asyncio.ensure_future(pipeline.run_async())
+        while not branches[0].running:
+            await asyncio.sleep(0.005)
+
+        pipeline.cancel()
+        await asyncio.wait_for(run, 5)
+
+    asyncio.run(main())
+
+    assert not sink.calls
+    assert [type(x) for x in pipeline.observer.errors] == [RunCancelled]
+    assert not pipeline.ports
+
+
+def test_timeout(plasma_client):
+    pipeline, source, branches, sink = fan_out(plasma_client, 2, delay=5.0)
+
+    asyncio.run(asyncio.wait_for(pipeline.run_async(timeout=0.1), 5))
+
+    assert not sink.calls
+    (error,) = pipeline.observer.errors
+    assert isinstance(error, RunCancelled)
+    assert "timed out" in str(error)
@@ -0,0 +1,170 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from oremda.pipeline.deadline import RunCancelled
+from oremda.pipeline.operator import OperatorException
+from oremda.utils.id import port_id
+
+from .utils import LocalOperator, data_edge, make_pipeline, max_overlap, operator_node
+
+
+def scale(inputs, parameters):
+    if parameters["factor"] < 0:
+        raise OperatorException("Negative factor")
+
+    time.sleep(parameters.get("sleep", 0))
+
+    return {"out": inputs["in"] * parameters["factor"]}
+
+
+def chain(client, delay=0.0):
+    """source -> scale -> total, with the scale factor overridden by the items"""
+    source = LocalOperator(client, "source", lambda i, p: {"out": np.arange(4)})
+    scaler = LocalOperator(client, "scale", scale, {"factor": 1}, delay=delay)
+    total = LocalOperator(
+        client, "total", lambda i, p: {"out": i["in"].sum()}, delay=delay
+    )
+    nodes = [
+        operator_node("source", source),
+        operator_node("scale", scaler, inputs=["in"]),
+        operator_node("total", total, inputs=["in"]),
+    ]
+    edges = [data_edge("source", "scale"), data_edge("scale", "total")]
+    pipeline = make_pipeline(client, nodes, edges)
+    pipeline.keep("total", "out")
+    return pipeline, source, scaler, total
+
+
+def items(*factors):
+    return [{"scale": {"factor": x}} for x in factors]
+
+
+def collect(results, order=None):
+    def on_item(index, outputs):
+        if order is not None:
+            order.append(index)
+
+        results[index] = outputs[port_id("total", "out")].data.data.copy()
+
+    return on_item
+
+
+def test_batch(plasma_client):
+    pipeline, source, scaler, total = chain(plasma_client)
+    results = {}
+
+    assert pipeline.run_batch(items(1, 2, 3), collect(results))
+
+    assert results == {0: 6, 1: 12, 2: 18}
+    # The operator upstream of the overrides runs once for every item
+    assert len(source.calls) == 1
+    assert [x["factor"] for x in scaler.calls] == [1, 2, 3]
+    assert len(pipeline.observer.completed) == 1
+    # The ports of the items are released once they are handed over
+    assert not pipeline.ports
+
+
+def test_identical_items_run_once(plasma_client):
+    pipeline, source, scaler, total = chain(plasma_client)
+    results = {}
+
+    assert pipeline.run_batch(items(2, 2), collect(results))
+
+    assert results == {0: 12, 1: 12}
+    assert len(scaler.calls) == len(total.calls) == 1
+
+
+def test_lowest_lane_first(plasma_client):
+    pipeline, source, scaler, total = chain(plasma_client)
+    order = []
+
+    assert pipeline.run_batch(items(1, 2, 3, 4), collect({}, order), max_in_flight=1)
+
+    assert order == [0, 1, 2, 3]
+    # A lane is carried through the graph before the next one starts
+    starts = sorted(
+        (start, x.name) for x in (scaler, total) for start, _ in x.intervals
+    )
+    assert [name for _, name in starts] == ["scale", "total"] * 4
+
+
+def test_lanes_are_pipelined(plasma_client):
+    pipeline, source, scaler, total = chain(plasma_client)
+    lanes = [{"scale": {"factor": 1, "sleep": x}} for x in (0.0, 0.3)]
+
+    assert pipeline.run_batch(lanes, max_in_flight=2)
+
+    # The first lane is totalled while the second one is still scaled
+    first_total = min(start for start, _ in total.intervals)
+    assert first_total < max(end for _, end in scaler.intervals)
+
+
+@pytest.mark.parametrize("max_in_flight", [1, 3])
+def test_max_in_flight(plasma_client, max_in_flight):
+    pipeline, source, scaler, total = chain(plasma_client, delay=0.05)
+
+    assert pipeline.run_batch(items(1, 2, 3, 4), max_in_flight=max_in_flight)
+
+    assert max_overlap([source, scaler, total]) == max_in_flight
+
+
+def test_invalid_max_in_flight(plasma_client):
+    pipeline, *_ = chain(plasma_client)
+
+    with pytest.raises(Exception, match="max_in_flight"):
+        pipeline.run_batch(items(1), max_in_flight=0)
+
+
+def test_unknown_operator(plasma_client):
+    pipeline, *_ = chain(plasma_client)
+
+    with pytest.raises(Exception, match="does not exist"):
+        pipeline.run_batch([{"missing": {"factor": 1}}])
+
+
+def test_failed_item(plasma_client):
+    pipeline, source, scaler, total = chain(plasma_client)
+    results = {}
+
+    completed = pipeline.run_batch(items(1, -1, 3), collect(results), max_in_flight=1)
+
+    assert not completed
+    # The lanes ahead of the failure completed, nothing was dispatched after it
+    assert results == {0: 6}
+    assert [x["factor"] for x in scaler.calls] == [1, -1]
+    assert [id for id, _ in pipeline.observer.operator_errors] == ["scale"]
+    assert not pipeline.observer.completed
+    assert not pipeline.ports
+
+
+def test_cancel(plasma_client):
+    pipeline, source, scaler, total = chain(plasma_client)
+    gate = threading.Event()
+    scaler.gate = gate
+    result = []
+
+    thread = threading.Thread(
+        target=lambda: result.append(pipeline.run_batch(items(1, 2, 3)))
+    )
+    thread.start()
+    while not scaler.running:
+        time.sleep(0.005)
+
+    pipeline.cancel()
+    thread.join(5)
+
+    assert result == [False]
+    assert not total.calls
+    assert [type(x) for x in pipeline.observer.errors] == [RunCancelled]
+
+
+def test_timeout(plasma_client):
+    pipeline, source, scaler, total = chain(plasma_client, delay=5.0)
+
+    assert not pipeline.run_batch(items(1, 2), timeout=0.1)
+
+    (error,) = pipeline.observer.errors
+    assert isinstance(error, RunCancelled)
@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from oremda.pipeline.cache import OperatorResultCache
+from oremda.registry import Registry
+from oremda.typing import OperatorLabels, PortsLabels
+
+from .utils import LocalOperator, data_edge, make_pipeline, operator_node
+
+
+def cached_pipeline(client):
+    source = LocalOperator(client, "source", lambda i, p: {"out": np.arange(4)})
+    double = LocalOperator(client, "double", lambda i, p: {"out": i["in"] * 2})
+    nodes = [
+        operator_node("source", source),
+        operator_node("double", double, inputs=["in"]),
+    ]
+    pipeline = make_pipeline(client, nodes, [data_edge("source", "double")])
+    pipeline.keep("double", "out")
+    pipeline.cache = OperatorResultCache(client, 1_000_000)
+    return pipeline, source, double
+
+
+def test_cache_hit(plasma_client):
+    pipeline, source, double = cached_pipeline(plasma_client)
+    pipeline.registry.digests = {"source": "a", "double": "b"}
+
+    pipeline.run()
+    pipeline.run()
+
+    assert len(source.calls) == len(double.calls) == 1
+    assert pipeline.cache.hits == 2
+    pipeline.release()
+    pipeline.cache.clear()
+
+
+def test_image_changed_between_runs(plasma_client):
+    pipeline, source, double = cached_pipeline(plasma_client)
+    pipeline.registry.digests = {"source": "a", "double": "b"}
+
+    pipeline.run()
+    # The image of double is rebuilt under the same name
+    pipeline.registry.digests["double"] = "c"
+    pipeline.run()
+
+    assert len(source.calls) == 1
+    assert len(double.calls) == 2
+    assert double.digest == "c"
+    pipeline.release()
+    pipeline.cache.clear()
+
+
+class FakeContainerClient:
+    def __init__(self):
+        self.digest = "a"
+        self.containers = []
+
+    def image(self, name):
+        labels = OperatorLabels(name=name, ports=PortsLabels())
+        return SimpleNamespace(labels=labels, digest=self.digest)
+
+    def run(self, image_name, **kwargs):
+        container = SimpleNamespace(image=image_name, digest=self.digest)
+        self.containers.append(container)
+        return container
+
+
+def test_registry_digest_resolved_on_start(plasma_client):
+    container_client = FakeContainerClient()
+    registry = Registry(plasma_client, container_client)
+    registry.register("op")
+
+    registry.start_containers()
+    assert registry.digest("op") == "a"
+
+    # Rebuilt while its containers run, they still run the old image
+    container_client.digest = "b"
+    registry.start_containers()
+    assert registry.digest("op") == "a"
+
+    # Restarted, as stop() would leave it
+    info = registry.images["op"]
+    info.containers = []
+    info.running = False
+    registry.start_containers()
+    assert registry.digest("op") == "b"
@@ -0,0 +1,52 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from oremda.pipeline.deadline import RunCancelled
+
+from .utils import LocalOperator, data_edge, make_pipeline, operator_node
+
+
+def chain(client):
+    source = LocalOperator(client, "source", lambda i, p: {"out": np.arange(4)})
+    double = LocalOperator(client, "double", lambda i, p: {"out": i["in"] * 2})
+    nodes = [
+        operator_node("source", source),
+        operator_node("double", double, inputs=["in"]),
+    ]
+    pipeline = make_pipeline(client, nodes, [data_edge("source", "double")])
+    pipeline.keep("double", "out")
+    return pipeline, [source, double]
+
+
+@pytest.mark.parametrize("mode", ["serial", "concurrent", "async", "batch"])
+def test_cancel_while_starting_containers(plasma_client, mode):
+    pipeline, operators = chain(plasma_client)
+    pipeline.registry.on_start = pipeline.cancel
+
+    if mode == "serial":
+        pipeline.run()
+    elif mode == "concurrent":
+        pipeline.run(concurrent=True)
+    elif mode == "async":
+        asyncio.run(pipeline.run_async())
+    else:
+        assert pipeline.run_batch([{}, {}]) is False
+
+    assert all(not x.calls for x in operators)
+    assert not pipeline.observer.completed
+    assert [type(x) for x in pipeline.observer.errors] == [RunCancelled]
+    assert not pipeline.ports
+
+
+def test_cancel_before_run_does_not_carry_over(plasma_client):
+    pipeline, operators = chain(plasma_client)
+    pipeline.cancel()
+
+    pipeline.run()
+
+    assert all(len(x.calls) == 1 for x in operators)
+    assert pipeline.observer.completed
+    assert pipeline.ports["double/out"].data.data.tolist() == [0, 2, 4, 6]
+    pipeline.release()
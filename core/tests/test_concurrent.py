@@ -0,0 +1,116 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from oremda.pipeline.deadline import RunCancelled
+from oremda.pipeline.operator import OperatorException
+from oremda.utils.id import port_id
+
+from .utils import fan_out, max_overlap
+
+
+def test_branches_overlap(plasma_client):
+    pipeline, source, branches, sink = fan_out(plasma_client, 4)
+
+    pipeline.run(concurrent=True, max_in_flight=4)
+
+    assert max_overlap(branches) == 4
+    np.testing.assert_array_equal(
+        pipeline.ports[port_id("sink", "out")].data.data, np.full(4, 8)
+    )
+    assert len(pipeline.observer.completed) == 1
+    pipeline.release()
+
+
+@pytest.mark.parametrize("max_in_flight", [1, 2])
+def test_max_in_flight(plasma_client, max_in_flight):
+    pipeline, source, branches, sink = fan_out(plasma_client, 4, delay=0.05)
+
+    pipeline.run(concurrent=True, max_in_flight=max_in_flight)
+
+    assert max_overlap([source, *branches, sink]) == max_in_flight
+    assert len(pipeline.observer.completed) == 1
+    pipeline.release()
+
+
+def test_invalid_max_in_flight(plasma_client):
+    pipeline, *_ = fan_out(plasma_client, 2)
+
+    with pytest.raises(Exception, match="max_in_flight"):
+        pipeline.run(concurrent=True, max_in_flight=0)
+
+
+def test_dependencies_run_first(plasma_client):
+    pipeline, source, branches, sink = fan_out(plasma_client, 3, delay=0.0)
+
+    pipeline.run(concurrent=True)
+
+    (source_interval,) = source.intervals
+    (sink_interval,) = sink.intervals
+    for branch in branches:
+        (interval,) = branch.intervals
+        assert source_interval[1] <= interval[0]
+        assert interval[1] <= sink_interval[0]
+
+    pipeline.release()
+
+
+def test_failure_stops_dispatch(plasma_client):
+    def fail_first(inputs, parameters):
+        if parameters["index"] == 0:
+            raise OperatorException("Failed")
+
+        return {"out": inputs["in"]}
+
+    pipeline, source, branches, sink = fan_out(
+        plasma_client, 4, delay=0.05, kernel=fail_first
+    )
+
+    pipeline.run(concurrent=True, max_in_flight=1)
+
+    # The operators ready after the failure are not dispatched
+    assert len(branches[0].calls) == 1
+    assert all(not x.calls for x in branches[1:])
+    assert not sink.calls
+    assert [id for id, _ in pipeline.observer.operator_errors] == ["branch0"]
+    assert not pipeline.observer.completed
+
+
+def test_failure_lets_running_operators_finish(plasma_client):
+    def fail_first(inputs, parameters):
+        if parameters["index"] == 0:
+            raise OperatorException("Failed")
+
+        return {"out": inputs["in"]}
+
+    pipeline, source, branches, sink = fan_out(
+        plasma_client, 3, delay=0.1, kernel=fail_first
+    )
+
+    pipeline.run(concurrent=True, max_in_flight=3)
+
+    assert all(len(x.calls) == 1 for x in branches)
+    assert all(x.running == 0 for x in branches)
+    assert not sink.calls
+    assert not pipeline.observer.completed
+
+
+def test_cancel_during_run(plasma_client):
+    pipeline, source, branches, sink = fan_out(plasma_client, 2, delay=0.0)
+    gate = threading.Event()
+    branches[0].gate = gate
+
+    thread = threading.Thread(target=pipeline.run, kwargs={"concurrent": True})
+    thread.start()
+    while not branches[0].running:
+        time.sleep(0.005)
+
+    pipeline.cancel()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert not sink.calls
+    assert [type(x) for x in pipeline.observer.errors] == [RunCancelled]
+    assert not pipeline.ports
@@ -0,0 +1,133 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from oremda.pipeline.operator import OperatorException
+from oremda.pipeline.plan import equivalent_operators
+from oremda.typing import OperatorConfig
+from oremda.utils.id import port_id
+
+from .utils import LocalOperator, data_edge, make_pipeline, operator_node
+
+
+def scale(inputs, parameters):
+    if parameters.get("fail"):
+        raise OperatorException("Failed")
+
+    return {"out": inputs["in"] * parameters["factor"]}
+
+
+def duplicates(client, first=None, second=None, config=None):
+    """A source feeding a blur, a duplicate of it, and a sum of each"""
+    first = first or {"factor": 2}
+    second = second or first
+    source = LocalOperator(client, "source", lambda i, p: {"out": np.arange(4)})
+    blurs = [
+        LocalOperator(client, "blur", scale, first, config=config),
+        LocalOperator(client, "blur", scale, second, config=config),
+    ]
+    sums = [
+        LocalOperator(client, "sum", lambda i, p: {"out": i["in"].sum()}) for _ in blurs
+    ]
+
+    nodes = [operator_node("source", source)]
+    edges = []
+    for i, (blur, total) in enumerate(zip(blurs, sums)):
+        nodes.append(operator_node(f"blur{i}", blur, inputs=["in"]))
+        nodes.append(operator_node(f"sum{i}", total, inputs=["in"]))
+        edges.append(data_edge("source", f"blur{i}"))
+        edges.append(data_edge(f"blur{i}", f"sum{i}"))
+
+    pipeline = make_pipeline(client, nodes, edges)
+    for i in range(len(blurs)):
+        pipeline.keep(f"blur{i}", "out")
+        pipeline.keep(f"sum{i}", "out")
+
+    return pipeline, blurs, sums
+
+
+def test_equivalent_operators(plasma_client):
+    pipeline, *_ = duplicates(plasma_client)
+
+    # Downstream operators of duplicates are duplicates as well
+    assert equivalent_operators(pipeline.nodes, pipeline.plan) == {
+        "blur1": "blur0",
+        "sum1": "sum0",
+    }
+
+
+def test_different_parameters(plasma_client):
+    pipeline, *_ = duplicates(plasma_client, {"factor": 2}, {"factor": 3})
+
+    assert equivalent_operators(pipeline.nodes, pipeline.plan) == {}
+
+
+def test_not_cacheable(plasma_client):
+    config = OperatorConfig(cacheable=False)
+    pipeline, *_ = duplicates(plasma_client, config=config)
+
+    assert equivalent_operators(pipeline.nodes, pipeline.plan) == {}
+
+
+@pytest.mark.parametrize("mode", ["serial", "concurrent", "async"])
+def test_merged_run(plasma_client, mode):
+    pipeline, blurs, sums = duplicates(plasma_client)
+
+    if mode == "serial":
+        pipeline.run()
+    elif mode == "concurrent":
+        pipeline.run(concurrent=True)
+    else:
+        asyncio.run(pipeline.run_async())
+
+    assert sum(len(x.calls) for x in blurs) == 1
+    assert sum(len(x.calls) for x in sums) == 1
+    for i in range(2):
+        blurred = pipeline.ports[port_id(f"blur{i}", "out")].data.data
+        np.testing.assert_array_equal(blurred, np.arange(4) * 2)
+        assert pipeline.ports[port_id(f"sum{i}", "out")].data.data == 12
+
+    assert len(pipeline.observer.completed) == 1
+    pipeline.release()
+
+
+def test_merged_batch(plasma_client):
+    pipeline, blurs, sums = duplicates(plasma_client)
+    results = {}
+
+    def on_item(index, outputs):
+        results[index] = {id: port.data.data.copy() for id, port in outputs.items()}
+
+    items = [{"blur0": {"factor": 3}, "blur1": {"factor": 3}}, {}]
+    assert pipeline.run_batch(items, on_item)
+
+    # One execution of the duplicates per item
+    assert sum(len(x.calls) for x in blurs) == 2
+    assert sum(len(x.calls) for x in sums) == 2
+    for index, factor in enumerate([3, 2]):
+        outputs = results[index]
+        for i in range(2):
+            blurred = outputs[port_id(f"blur{i}", "out")]
+            np.testing.assert_array_equal(blurred, np.arange(4) * factor)
+            assert outputs[port_id(f"sum{i}", "out")] == 6 * factor
+
+
+def test_merged_batch_overridden_apart(plasma_client):
+    pipeline, blurs, sums = duplicates(plasma_client)
+
+    # The duplicates differ in this item, both run
+    assert pipeline.run_batch([{"blur1": {"factor": 3}}])
+    assert sum(len(x.calls) for x in blurs) == 2
+    assert sum(len(x.calls) for x in sums) == 2
+
+
+def test_merged_failure(plasma_client):
+    pipeline, blurs, sums = duplicates(plasma_client, {"factor": 2, "fail": True})
+
+    pipeline.run(concurrent=True)
+
+    assert sum(len(x.calls) for x in blurs) == 1
+    assert not any(x.calls for x in sums)
+    assert len(pipeline.observer.operator_errors) == 1
+    assert not pipeline.observer.completed
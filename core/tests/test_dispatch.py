@@ -0,0 +1,146 @@
+import time
+
+import numpy as np
+
+from oremda.pipeline.dispatch import ParallelDispatch
+from oremda.typing import OperateTaskMessage, OperatorConfig, ResultTaskMessage
+
+from .utils import FakeContainers, container_operator
+
+
+def tasks(count):
+    return [
+        OperateTaskMessage(output_queue="/out", parallel_index=i) for i in range(count)
+    ]
+
+
+def result(index):
+    return ResultTaskMessage(parallel_index=index)
+
+
+def indices(sends):
+    return [x.parallel_index for x in sends]
+
+
+def test_send_everything():
+    dispatch = ParallelDispatch(tasks(3), 3)
+
+    assert indices(dispatch.to_send()) == [0, 1, 2]
+    assert dispatch.to_send() == []
+
+    for i in [2, 0, 1]:
+        assert dispatch.accept(result(i))
+
+    assert dispatch.done
+
+
+def test_window():
+    dispatch = ParallelDispatch(tasks(5), 2)
+
+    assert indices(dispatch.to_send()) == [0, 1]
+    assert dispatch.to_send() == []
+
+    # The next task is sent as a result comes back
+    assert dispatch.accept(result(1))
+    assert indices(dispatch.to_send()) == [2]
+    assert dispatch.accept(result(0))
+    assert dispatch.accept(result(2))
+    assert indices(dispatch.to_send()) == [3, 4]
+    assert not dispatch.done
+
+    dispatch.accept(result(3))
+    dispatch.accept(result(4))
+    assert dispatch.done
+
+
+def test_speculative():
+    dispatch = ParallelDispatch(tasks(3), 2, speculative=True)
+
+    assert indices(dispatch.to_send()) == [0, 1]
+    assert dispatch.accept(result(1))
+    # Nothing is pending anymore, the free container copies the oldest task
+    assert indices(dispatch.to_send()) == [2]
+    assert dispatch.accept(result(2))
+    assert indices(dispatch.to_send()) == [0]
+
+    # The first result of a task wins, its copy is rejected
+    assert dispatch.accept(result(0))
+    assert dispatch.done
+    assert not dispatch.accept(result(0))
+
+    # Each task is copied at most once
+    assert dispatch.to_send() == []
+
+
+def test_not_speculative():
+    dispatch = ParallelDispatch(tasks(2), 2)
+
+    assert indices(dispatch.to_send()) == [0, 1]
+    dispatch.accept(result(1))
+    assert dispatch.to_send() == []
+
+
+def chunked_operator(client, speculative=False, items=range(8)):
+    config = OperatorConfig(
+        run_locations=[0, 0],
+        parallel=True,
+        parallel_param="items",
+        parallel_output_to_join="out",
+        parallel_chunk_size=2,
+        parallel_speculative=speculative,
+    )
+    return container_operator(client, "op", config, {"items": list(items)})
+
+
+def double(inputs, parameters):
+    return {"out": np.array(parameters["items"]) * 2}
+
+
+def test_containers_pull_chunks(plasma_client):
+    operator = chunked_operator(plasma_client)
+
+    def delay(task):
+        # The first chunk is slow, the other container takes the others
+        return 0.3 if task.parallel_index == 0 else 0.01
+
+    with FakeContainers(operator, double, delay) as containers:
+        outputs = operator.execute({}, "/out")
+
+    np.testing.assert_array_equal(outputs["out"].data.data, np.arange(8) * 2)
+    assert [x.params["items"] for x in containers.tasks] == [
+        [0, 1],
+        [2, 3],
+        [4, 5],
+        [6, 7],
+    ]
+    # The slow chunk did not hold the others back
+    assert indices(containers.sent) == [1, 2, 3, 0]
+
+
+def test_speculative_copy(plasma_client):
+    operator = chunked_operator(plasma_client, speculative=True, items=range(4))
+
+    def delay(task):
+        # Only the first run of the first chunk is slow, not its copy
+        first = [x for x in containers.tasks if x.parallel_index == 0]
+        return 0.5 if task.parallel_index == 0 and len(first) == 1 else 0.01
+
+    with FakeContainers(operator, double, delay) as containers:
+        outputs = operator.execute({}, "/out")
+        assert indices(containers.tasks) == [0, 1, 0]
+        np.testing.assert_array_equal(outputs["out"].data.data, np.arange(4) * 2)
+
+        while len(containers.sent) < 3:
+            time.sleep(0.01)
+
+        # The late result of the slow chunk is dropped, and freed, by the next
+        # execution, which is not confused by it
+        (late,) = containers.sent[2:]
+        late_object = late.outputs["out"].data.object_id
+        assert late.parallel_index == 0
+        assert plasma_client.plasma_client.contains(late_object)
+        operator.parameters = {"items": [10, 11]}
+        outputs = operator.execute({}, "/out")
+        np.testing.assert_array_equal(outputs["out"].data.data, [20, 22])
+
+    assert not plasma_client.plasma_client.contains(late_object)
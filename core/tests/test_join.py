@@ -0,0 +1,213 @@
+import numpy as np
+import pytest
+
+from oremda.pipeline.join import (
+    JOIN_METHODS,
+    HistogramJoin,
+    MaxJoin,
+    MeanJoin,
+    MinJoin,
+    PointsJoin,
+    StackJoin,
+    SumJoin,
+    WeightedMeanJoin,
+    create_join,
+    join_class,
+)
+from oremda.typing import OperatorConfig
+
+from .utils import FakeContainers, container_operator
+
+
+def test_weighted_mean_join_arrays():
+    join = WeightedMeanJoin([1, 3])
+    join.add(1, np.array([4, 8]))
+    join.add(0, np.array([0, 4]))
+
+    np.testing.assert_allclose(join.result(), [3.0, 7.0])
+
+
+def test_weighted_mean_join_scalar_parts():
+    join = WeightedMeanJoin([1, 2, 1])
+    join.add(0, 1.0)
+    join.add(1, np.float32(2.0))
+    join.add(2, np.array(5))
+
+    assert isinstance(join.total, np.ndarray)
+    np.testing.assert_allclose(join.result(), 2.5)
+
+
+def test_mean_join_scalar_parts():
+    join = MeanJoin([4, 4])
+    join.add(0, 1)
+    join.add(1, 2)
+
+    np.testing.assert_allclose(join.result(), 1.5)
+
+
+def test_sum_join_scalar_parts():
+    join = SumJoin([1, 1, 1])
+    for i in range(3):
+        join.add(i, i + 1)
+
+    assert join.result() == 6
+
+
+def test_stack_join_orders_the_parts():
+    join = StackJoin([2, 1])
+    join.add(1, np.array([3]))
+    join.add(0, np.array([1, 2]))
+
+    np.testing.assert_array_equal(join.result(), [1, 2, 3])
+
+
+def test_concat_join_axis():
+    join = create_join("concat", [1, 1], {"axis": 1})
+    join.add(1, np.ones((2, 1)))
+    join.add(0, np.zeros((2, 2)))
+
+    np.testing.assert_array_equal(join.result(), [[0, 0, 1], [0, 0, 1]])
+
+
+def test_min_max_joins():
+    parts = [np.array([1, 5, 3]), np.array([4, 2, 6])]
+    joins = [MinJoin([1, 1]), MaxJoin([1, 1])]
+    for join in joins:
+        for i, part in enumerate(parts):
+            join.add(i, part)
+
+    np.testing.assert_array_equal(joins[0].result(), [1, 2, 3])
+    np.testing.assert_array_equal(joins[1].result(), [4, 5, 6])
+
+
+def test_sum_join_does_not_alias_the_first_part():
+    part = np.array([1, 2])
+    join = SumJoin([1, 1])
+    join.add(0, part)
+    join.add(1, np.array([1, 1]))
+
+    np.testing.assert_array_equal(part, [1, 2])
+    np.testing.assert_array_equal(join.result(), [2, 3])
+
+
+def test_sum_join_upcasts():
+    join = SumJoin([1, 1])
+    join.add(0, np.array([1, 2]))
+    join.add(1, np.array([0.5, 0.5]))
+
+    np.testing.assert_allclose(join.result(), [1.5, 2.5])
+
+
+def test_histogram_join_does_not_overflow():
+    join = HistogramJoin([1, 1])
+    join.add(0, np.array([200, 1], dtype=np.uint8))
+    join.add(1, np.array([100, 1], dtype=np.uint8))
+
+    np.testing.assert_array_equal(join.result(), [300, 2])
+    assert join.result().dtype == np.int64
+
+
+def test_histogram_join_bins_mismatch():
+    join = HistogramJoin([1, 1])
+    join.add(0, np.zeros(4))
+
+    with pytest.raises(Exception, match="shape"):
+        join.add(1, np.zeros(5))
+
+
+def test_weighted_mean_join_by_sizes():
+    # The means of 1 and 3 items
+    join = WeightedMeanJoin([1, 3])
+    join.add(0, 4.0)
+    join.add(1, 0.0)
+
+    np.testing.assert_allclose(join.result(), 1.0)
+
+
+def test_weighted_mean_join_weights():
+    with pytest.raises(Exception, match="weights"):
+        WeightedMeanJoin([1, 1], [1.0])
+
+    join = WeightedMeanJoin([1, 1], [0.0, 0.0])
+    join.add(0, 1.0)
+    join.add(1, 2.0)
+    with pytest.raises(Exception, match="zero"):
+        join.result()
+
+
+def test_points_join():
+    join = PointsJoin([1, 1, 1])
+    join.add(1, np.array([[0, 1, 5.0]]))
+    join.add(2, np.empty((0, 3)))
+    join.add(0, np.array([[0, 0, 1.0], [0, 1, 2.0]]))
+
+    np.testing.assert_array_equal(
+        join.result(), [[0, 0, 1.0], [0, 1, 2.0], [0, 1, 5.0]]
+    )
+
+
+def test_points_join_sum_duplicates():
+    join = PointsJoin([1, 1], sum_duplicates=True)
+    join.add(0, np.array([[1, 1, 1.0], [0, 1, 2.0]]))
+    join.add(1, np.array([[0, 1, 5.0]]))
+
+    np.testing.assert_array_equal(join.result(), [[0, 1, 7.0], [1, 1, 1.0]])
+
+
+def test_points_join_invalid():
+    join = PointsJoin([1])
+    assert join.result().shape == (0, 0)
+
+    with pytest.raises(Exception, match="2D"):
+        join.add(0, np.zeros(3))
+
+
+def test_join_class():
+    assert join_class("sum") is SumJoin
+    assert join_class("oremda.pipeline.join.MaxJoin") is MaxJoin
+
+    with pytest.raises(NotImplementedError):
+        join_class("unknown")
+
+    with pytest.raises(Exception, match="not a Join class"):
+        join_class("oremda.pipeline.join.create_join")
+
+
+def test_registered_join_methods():
+    expected = {
+        "stack",
+        "concat",
+        "sum",
+        "min",
+        "max",
+        "histogram",
+        "weighted_mean",
+        "mean",
+        "points",
+    }
+    assert expected <= set(JOIN_METHODS)
+
+
+def test_create_join_invalid_params():
+    with pytest.raises(Exception, match="Invalid parameters"):
+        create_join("sum", [1], {"axis": 0})
+
+
+def test_operator_join_config(plasma_client):
+    config = OperatorConfig(
+        run_locations=[0, 0],
+        parallel=True,
+        parallel_param="items",
+        parallel_output_to_join="out",
+        parallel_output_join_method="concat",
+        parallel_output_join_params={"axis": 1},
+    )
+    operator = container_operator(plasma_client, "op", config, {"items": [0, 1, 2]})
+
+    def columns(inputs, parameters):
+        return {"out": np.array([parameters["items"]] * 2)}
+
+    with FakeContainers(operator, columns):
+        outputs = operator.execute({}, "/out")
+
+    np.testing.assert_array_equal(outputs["out"].data.data, [[0, 1, 2], [0, 1, 2]])
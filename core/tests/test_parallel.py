@@ -0,0 +1,104 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from oremda.pipeline.operator import OperatorException
+from oremda.typing import OperatorConfig
+
+from .utils import FakeContainers, container_operator
+
+
+def square(inputs, parameters):
+    if -1 in parameters["items"]:
+        raise OperatorException("Bad item")
+
+    return {"out": np.square(parameters["items"]), "other": np.zeros(1)}
+
+
+def total(inputs, parameters):
+    return {"out": np.array([sum(x * x for x in parameters["items"])])}
+
+
+def parallel_operator(client, method="stack", containers=2, items=range(6)):
+    config = OperatorConfig(
+        run_locations=[0] * containers,
+        parallel=True,
+        parallel_param="items",
+        parallel_output_to_join="out",
+        parallel_output_join_method=method,
+    )
+    return container_operator(client, "op", config, {"items": list(items)})
+
+
+def stored(client, object_id):
+    return client.plasma_client.contains(object_id)
+
+
+@pytest.mark.parametrize("mode", ["sync", "async"])
+def test_stack(plasma_client, mode):
+    operator = parallel_operator(plasma_client, containers=3)
+
+    with FakeContainers(operator, square) as containers:
+        if mode == "sync":
+            outputs = operator.execute({}, "/out")
+        else:
+            outputs = asyncio.run(operator.execute_async({}, "/out"))
+
+    np.testing.assert_array_equal(outputs["out"].data.data, np.square(range(6)))
+    assert len(containers.tasks) == 3
+
+    # The parts, and the other outputs of all but the first part, are freed
+    kept = [outputs["out"].data.object_id, outputs["other"].data.object_id]
+    for object_id in containers.objects:
+        assert stored(plasma_client, object_id) == (object_id in kept)
+
+
+def test_sum_folds_the_parts_as_they_arrive(plasma_client):
+    operator = parallel_operator(plasma_client, "sum", containers=1)
+    freed_before = []
+
+    def delay(task):
+        # How many parts were freed when this one started
+        parts = containers.objects
+        freed_before.append(sum(not stored(plasma_client, x) for x in parts))
+        return 0.05
+
+    operator.operator_config.parallel_chunk_size = 2
+    with FakeContainers(operator, total, delay) as containers:
+        outputs = operator.execute({}, "/out")
+
+    assert outputs["out"].data.data == [sum(x * x for x in range(6))]
+    # Each part is freed as soon as it is folded, not at the end
+    assert freed_before == [0, 1, 2]
+
+
+def test_results_are_placed_by_index(plasma_client):
+    operator = parallel_operator(plasma_client, containers=3)
+
+    def delay(task):
+        # The first parts complete last
+        return 0.1 - 0.04 * task.parallel_index
+
+    with FakeContainers(operator, square, delay):
+        outputs = operator.execute({}, "/out")
+
+    np.testing.assert_array_equal(outputs["out"].data.data, np.square(range(6)))
+
+
+@pytest.mark.parametrize("method", ["stack", "sum"])
+def test_failed_part(plasma_client, method):
+    operator = parallel_operator(plasma_client, method, 3, [0, 1, 2, 3, -1, 5])
+
+    def delay(task):
+        # The failure arrives last
+        return 0.1 if -1 in task.params["items"] else 0.0
+
+    with FakeContainers(operator, square, delay) as containers:
+        with pytest.raises(OperatorException, match="Bad item"):
+            operator.execute({}, "/out")
+
+    # The parts received before the failure are freed
+    objects = containers.objects
+    assert len(objects) == 4
+    assert not any(stored(plasma_client, x) for x in objects)
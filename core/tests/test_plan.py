@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from oremda.utils.id import port_id
+
+from .utils import LocalOperator, data_edge, make_pipeline, operator_node
+
+
+def identity(inputs, parameters):
+    return {"out": next(iter(inputs.values()), np.zeros(1))}
+
+
+def diamond(client, names=("d", "b", "c", "a")):
+    """a feeds b and c, which feed d, with the nodes given out of order"""
+    operators = {x: LocalOperator(client, x, identity) for x in "abcd"}
+    inputs = {"a": [], "b": ["in"], "c": ["in"], "d": ["b", "c"]}
+    nodes = [operator_node(x, operators[x], inputs=inputs[x]) for x in names]
+    edges = [
+        data_edge("a", "b"),
+        data_edge("a", "c"),
+        data_edge("b", "d", input_port="b"),
+        data_edge("c", "d", input_port="c"),
+    ]
+    return make_pipeline(client, nodes, edges), operators
+
+
+def test_topological_order(plasma_client):
+    pipeline, _ = diamond(plasma_client)
+    plan = pipeline.plan
+
+    # The ties keep the order of the edges
+    assert plan.order == ["a", "b", "c", "d"]
+    assert plan.in_degree == {"a": 0, "b": 1, "c": 1, "d": 2}
+    assert plan.port_consumers == {
+        port_id("a", "out"): 2,
+        port_id("b", "out"): 1,
+        port_id("c", "out"): 1,
+    }
+
+
+def test_counters_of_a_subset(plasma_client):
+    pipeline, _ = diamond(plasma_client)
+    plan = pipeline.plan
+
+    assert plan.counters({"b", "d"}) == {"b": 0, "d": 1}
+    # The ports read by the operators of the subset, whoever produces them
+    assert plan.consumers({"b", "d"}) == {
+        port_id("a", "out"): 1,
+        port_id("b", "out"): 1,
+        port_id("c", "out"): 1,
+    }
+
+    # The counters are copies
+    plan.counters()["d"] = 0
+    assert plan.in_degree["d"] == 2
+
+
+def test_downstream_and_upstream(plasma_client):
+    pipeline, _ = diamond(plasma_client)
+    plan = pipeline.plan
+
+    assert plan.downstream(["b"]) == {"b", "d"}
+    assert plan.downstream(["a"]) == {"a", "b", "c", "d"}
+    assert plan.upstream(["c"]) == {"a", "c"}
+    assert plan.upstream(["d"]) == {"a", "b", "c", "d"}
+
+
+def test_serial_run_follows_the_plan(plasma_client):
+    pipeline, operators = diamond(plasma_client)
+    pipeline.keep("d", "out")
+
+    pipeline.run()
+
+    starts = sorted((x.intervals[0][0], name) for name, x in operators.items())
+    assert [name for _, name in starts] == pipeline.plan.order
+    assert len(pipeline.observer.completed) == 1
+    pipeline.release()
+
+
+def test_cycle(plasma_client):
+    operators = {x: LocalOperator(plasma_client, x, identity) for x in "abc"}
+    nodes = [
+        operator_node("a", operators["a"]),
+        operator_node("b", operators["b"], inputs=["in"]),
+        operator_node("c", operators["c"], inputs=["in"]),
+    ]
+    edges = [data_edge("b", "c"), data_edge("c", "b")]
+
+    with pytest.raises(Exception, match="cycle") as exc_info:
+        make_pipeline(plasma_client, nodes, edges)
+
+    assert "'b'" in str(exc_info.value) and "'c'" in str(exc_info.value)
+    assert "'a'" not in str(exc_info.value)
+
+
+def test_set_graph_recompiles_the_plan(plasma_client):
+    pipeline, operators = diamond(plasma_client)
+    nodes = [operator_node(x, operators[x]) for x in "ab"]
+    nodes[1].inputs = {}
+
+    pipeline.set_graph(nodes, [])
+
+    assert pipeline.plan.order == ["a", "b"]
+    assert pipeline.plan.in_degree == {"a": 0, "b": 0}
+    assert pipeline.plan.port_consumers == {}
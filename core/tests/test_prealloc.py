@@ -0,0 +1,109 @@
+import time
+
+import numpy as np
+import pytest
+
+from oremda.pipeline.join import PreallocatedStackJoin
+from oremda.pipeline.operator import OperatorException
+from oremda.typing import OperatorConfig
+
+from .utils import FakeContainers, container_operator
+
+
+def test_stack_1d(plasma_client):
+    join = PreallocatedStackJoin([1, 2, 3], plasma_client, [6], "int64")
+    join.add(2, [3, 4, 5])
+    join.add(0, 0)
+    join.add(1, [1, 2])
+
+    output = join.output(plasma_client)
+    np.testing.assert_array_equal(output.data, np.arange(6))
+    assert join.sealed
+    plasma_client.release(output.object_id)
+
+
+def test_stack_2d(plasma_client):
+    # Each item is two columns wide
+    join = PreallocatedStackJoin([1, 2], plasma_client, [2, 6], "float32")
+    expected = np.arange(12, dtype="float32").reshape(2, 6)
+    join.add(1, expected[:, 2:])
+    join.add(0, expected[:, :2])
+
+    output = join.output(plasma_client)
+    np.testing.assert_array_equal(output.data, expected)
+    assert output.data.dtype == np.float32
+    plasma_client.release(output.object_id)
+
+
+def test_shape_does_not_fit(plasma_client):
+    with pytest.raises(Exception, match="does not fit"):
+        PreallocatedStackJoin([1, 2], plasma_client, [7], "int64")
+
+
+def test_part_of_the_wrong_shape(plasma_client):
+    join = PreallocatedStackJoin([1, 1], plasma_client, [4], "int64")
+
+    with pytest.raises(Exception, match="shape"):
+        join.add(0, [1, 2, 3])
+
+    join.discard()
+
+
+def test_discard(plasma_client):
+    join = PreallocatedStackJoin([1, 1], plasma_client, [4], "int64")
+    object_id = join.object_id
+    join.add(0, [1, 2])
+
+    join.discard()
+
+    assert join.sealed
+    assert not plasma_client.plasma_client.contains(object_id)
+
+
+def squares(inputs, parameters):
+    if -1 in parameters["items"]:
+        raise OperatorException("Bad item")
+
+    return {"out": np.square(parameters["items"]).astype("float64")}
+
+
+def preallocated_operator(client, items):
+    config = OperatorConfig(
+        run_locations=[0, 0, 0],
+        parallel=True,
+        parallel_param="items",
+        parallel_output_to_join="out",
+        parallel_output_shape=[len(items)],
+    )
+    return container_operator(client, "op", config, {"items": list(items)})
+
+
+def test_operator(plasma_client):
+    operator = preallocated_operator(plasma_client, range(7))
+
+    with FakeContainers(operator, squares) as containers:
+        outputs = operator.execute({}, "/out")
+
+    np.testing.assert_array_equal(outputs["out"].data.data, np.square(range(7)))
+    # The parts were copied into the output, and freed
+    assert len(containers.objects) == 3
+    assert not any(plasma_client.plasma_client.contains(x) for x in containers.objects)
+    plasma_client.release(outputs["out"].data.object_id)
+
+
+def test_operator_failure(plasma_client):
+    operator = preallocated_operator(plasma_client, [0, 1, 2, 3, -1, 5])
+    before = plasma_client.used_bytes()
+
+    with FakeContainers(operator, squares) as containers:
+        with pytest.raises(OperatorException):
+            operator.execute({}, "/out")
+
+        # The parts completing after the failure are late results
+        while len(containers.sent) < 3:
+            time.sleep(0.01)
+
+        operator.drop_late_results()
+
+    # Neither the parts nor the preallocated output are left in the store
+    assert plasma_client.used_bytes() == before
@@ -0,0 +1,218 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from oremda.messengers.mqp import utils as mqp_utils
+from oremda.messengers.mqp.utils import QueueCache
+from oremda.pipeline.deadline import Deadline, RunCancelled, RunToken
+from oremda.pipeline.replies import ReplyRouter
+from oremda.typing import OperatorConfig, ResultTaskMessage
+
+from .utils import (
+    FakeContainers,
+    LocalOperator,
+    container_operator,
+    make_pipeline,
+    operator_node,
+)
+
+
+def result(task_id):
+    return ResultTaskMessage(task_id=task_id)
+
+
+def test_one_receiver_at_a_time():
+    router = ReplyRouter()
+    router.register("a")
+    router.register("b")
+    woken = []
+
+    assert router.claim("a", lambda: woken.append("a")) == (None, True)
+    assert router.claim("b", lambda: woken.append("b")) == (None, False)
+
+    # The receiver got the result of b, and hands it over
+    message = result("b")
+    assert router.hand_over(message)
+    assert woken == ["b"]
+    assert router.claim("b", lambda: woken.append("b")) == (message, False)
+
+    # b waits again, and is woken when the queue is free
+    assert router.claim("b", lambda: woken.append("b")) == (None, False)
+    router.stop_receiving()
+    assert woken == ["b", "b"]
+    assert router.claim("b", lambda: woken.append("b")) == (None, True)
+
+
+def test_unexpected_results():
+    router = ReplyRouter()
+    router.register("a")
+
+    # The late result of an abandoned execution
+    assert not router.hand_over(result("old"))
+
+    # The results handed over and not taken are returned, to be dropped
+    message = result("a")
+    assert router.hand_over(message)
+    assert router.unregister("a") == [message]
+    assert not router.hand_over(result("a"))
+
+
+def test_forget():
+    router = ReplyRouter()
+    woken = []
+    waker = lambda: woken.append(None)  # noqa: E731
+
+    router.claim(None, lambda: None)
+    router.claim("a", waker)
+    router.forget(waker)
+    router.stop_receiving()
+
+    assert woken == []
+
+
+def shared_operator(client):
+    config = OperatorConfig(run_locations=[0, 0])
+    return container_operator(client, "op", config, {"value": 0})
+
+
+def value(inputs, parameters):
+    return {"out": np.array([parameters["value"]])}
+
+
+def test_executions_share_the_output_queue(plasma_client):
+    operator = shared_operator(plasma_client)
+    outputs = {}
+
+    def delay(task):
+        # The first executions get their results last
+        return 0.2 - 0.05 * task.params["value"]
+
+    def execute(i):
+        ports = operator.execute({}, "/out", {"value": i})
+        outputs[i] = ports["out"].data.data[0]
+
+    with FakeContainers(operator, value, delay):
+        threads = [threading.Thread(target=execute, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+    assert outputs == {0: 0, 1: 1, 2: 2, 3: 3}
+    assert operator.output_queues == {"/out"}
+
+
+def test_late_result_is_dropped(plasma_client):
+    operator = shared_operator(plasma_client)
+    token = RunToken()
+
+    def delay(task):
+        return 0.3 if task.params["value"] == 1 else 0.0
+
+    with FakeContainers(operator, value, delay) as containers:
+        threading.Timer(0.05, token.cancel).start()
+        with pytest.raises(RunCancelled):
+            operator.execute({}, "/out", {"value": 1}, deadline=Deadline(token))
+
+        while not containers.sent:
+            time.sleep(0.01)
+
+        # The next execution drops the late result, and frees it
+        (late,) = containers.objects
+        outputs = operator.execute({}, "/out", {"value": 2})
+        assert outputs["out"].data.data[0] == 2
+        assert not plasma_client.plasma_client.contains(late)
+
+
+def test_set_graph_closes_the_removed_operators(plasma_client):
+    operators = {
+        x: LocalOperator(plasma_client, x, lambda i, p: {"out": np.zeros(1)})
+        for x in "abc"
+    }
+    closed = []
+    for name, operator in operators.items():
+        operator.close = lambda name=name: closed.append(name)
+
+    pipeline = make_pipeline(
+        plasma_client, [operator_node(x, operators[x]) for x in "abc"]
+    )
+    pipeline.set_graph([operator_node(x, operators[x]) for x in "ac"], [])
+    assert closed == ["b"]
+
+    pipeline.close()
+    assert sorted(closed) == ["a", "b", "c"]
+
+
+class FakeQueue:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def queues(monkeypatch):
+    created = []
+
+    def create_queue(name, create=False, reuse=False):
+        created.append(FakeQueue(name))
+        return created[-1]
+
+    monkeypatch.setattr(mqp_utils, "create_queue", create_queue)
+    return created
+
+
+def test_queue_cache_reuses_queues(queues):
+    cache = QueueCache()
+
+    with cache.open("/a") as first:
+        pass
+    with cache.open("/a") as second:
+        pass
+
+    assert first is second
+    assert len(queues) == 1 and not first.closed
+
+
+def test_queue_cache_evicts_the_least_recently_used(queues):
+    cache = QueueCache(max_open=2)
+
+    for name in ["/a", "/b", "/a", "/c"]:
+        with cache.open(name):
+            pass
+
+    assert {x.name: x.closed for x in queues} == {"/a": False, "/b": True, "/c": False}
+
+
+def test_queue_cache_never_closes_a_queue_in_use(queues):
+    cache = QueueCache(max_open=1)
+
+    with cache.open("/a") as a:
+        with cache.open("/b"):
+            pass
+
+        # Over the limit, but /a is in use
+        assert not a.closed
+        cache.close("/a")
+        assert not a.closed
+
+    assert a.closed
+
+    # A queue detached is opened again on its next use
+    with cache.open("/a") as again:
+        assert again is not a
+
+
+def test_queue_cache_close(queues):
+    cache = QueueCache()
+    for name in ["/a", "/b"]:
+        with cache.open(name):
+            pass
+
+    cache.close()
+
+    assert all(x.closed for x in queues)
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from oremda.pipeline.deadline import RunCancelled
+from oremda.pipeline.operator import OperatorException
+from oremda.utils.id import port_id
+
+from .utils import LocalOperator, data_edge, make_pipeline, operator_node
+
+
+def scale(inputs, parameters):
+    if parameters["factor"] == 3:
+        raise OperatorException("Bad factor")
+
+    return {"out": inputs["in"] * parameters["factor"]}
+
+
+def sweep_pipeline(client, kernel=scale, delay=0.0):
+    source = LocalOperator(client, "source", lambda i, p: {"out": np.arange(4)})
+    scaler = LocalOperator(client, "scale", kernel, {"factor": 1}, delay=delay)
+    nodes = [
+        operator_node("source", source),
+        operator_node("scale", scaler, inputs=["in"]),
+    ]
+    pipeline = make_pipeline(client, nodes, [data_edge("source", "scale")])
+    pipeline.keep("scale", "out")
+    return pipeline, source, scaler
+
+
+def test_sweep(plasma_client):
+    pipeline, source, _ = sweep_pipeline(plasma_client)
+
+    results = pipeline.sweep({"scale": {"factor": [1, 2]}})
+
+    assert sorted(results) == [(1,), (2,)]
+    for (factor,), ports in results.items():
+        np.testing.assert_array_equal(
+            ports[port_id("scale", "out")].data.data, np.arange(4) * factor
+        )
+
+    assert len(source.calls) == 1
+    pipeline.release()
+
+
+def test_sweep_failed_point(plasma_client):
+    pipeline, _, _ = sweep_pipeline(plasma_client)
+
+    with pytest.raises(Exception, match=r"\(3,\)"):
+        pipeline.sweep({"scale": {"factor": [1, 2, 3]}})
+
+    assert not pipeline._sweep_ports
+    assert pipeline.observer.operator_errors
+
+
+def test_sweep_timeout(plasma_client):
+    pipeline, _, _ = sweep_pipeline(plasma_client, delay=0.5)
+
+    with pytest.raises(RunCancelled):
+        pipeline.sweep({"scale": {"factor": [1, 2]}}, timeout=0.1)
+
+    assert not pipeline._sweep_ports
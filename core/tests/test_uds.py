@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from oremda.messengers.uds.broker import start_uds_broker
+from oremda.messengers.uds.messenger import UDSMessenger
+from oremda.messengers.uds.utils import MAX_IDLE_CONNECTIONS
+
+
+def wait_for_connections(broker, count, timeout=5.0):
+    end = time.monotonic() + timeout
+    while len(broker.connections) != count and time.monotonic() < end:
+        time.sleep(0.01)
+
+    return len(broker.connections)
+
+
+def test_connections_outlive_the_thread_pools(tmp_path):
+    with start_uds_broker(str(tmp_path / "messages.sock")) as broker:
+        messenger = UDSMessenger(None)
+
+        def echo(i):
+            messenger.send_encoded(str(i).encode(), f"/q{i}")
+            return messenger.recv_encoded(f"/q{i}", timeout=5)
+
+        # Every run creates a new thread pool, like run(concurrent=True)
+        for _ in range(10):
+            with ThreadPoolExecutor(4) as executor:
+                replies = list(executor.map(echo, range(4)))
+
+            assert replies == [b"0", b"1", b"2", b"3"]
+            assert len(messenger._sockets) <= 4
+
+        assert wait_for_connections(broker, len(messenger._sockets)) <= 4
+
+        messenger.close()
+        assert wait_for_connections(broker, 0) == 0
+
+
+def test_idle_connections_are_bounded(tmp_path):
+    with start_uds_broker(str(tmp_path / "messages.sock")):
+        messenger = UDSMessenger(None)
+        count = MAX_IDLE_CONNECTIONS + 4
+
+        def wait(i):
+            return messenger.recv_encoded(f"/w{i}", timeout=0.2)
+
+        def timed_out(i):
+            try:
+                wait(i)
+            except TimeoutError:
+                return True
+
+        with ThreadPoolExecutor(count) as executor:
+            assert all(executor.map(timed_out, range(count)))
+
+        assert len(messenger._sockets) == MAX_IDLE_CONNECTIONS
+        messenger.close()
@@ -0,0 +1,373 @@
+import asyncio
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, cast
+
+import numpy as np
+
+from oremda.pipeline import OperatorNode, Pipeline, PipelineEdge, PipelineObserver
+from oremda.pipeline.operator import OperatorException, OperatorHandle
+from oremda.plasma_client import PlasmaArray, PlasmaClient
+from oremda.typing import (
+    ErrorTaskMessage,
+    Message,
+    MessageType,
+    OperateTaskMessage,
+    OperatorConfig,
+    Port,
+    PortInfo,
+    PortType,
+    ResultTaskMessage,
+    as_message,
+)
+
+Kernel = Callable[[Dict[str, Any], Dict[str, Any]], Dict[str, Any]]
+
+
+class LocalOperator(OperatorHandle):
+    """Runs a kernel in the test process, instead of in a container
+
+    Every execution is recorded, with the number of executions running at
+    the same time. The executions wait ``delay`` seconds, and for ``gate``
+    to be set if there is one, while checking their deadline like the
+    executions waiting on a container.
+    """
+
+    def __init__(
+        self,
+        client: PlasmaClient,
+        name: str,
+        kernel: Kernel,
+        parameters: Optional[Dict[str, Any]] = None,
+        delay: float = 0.0,
+        config: Optional[OperatorConfig] = None,
+    ):
+        super().__init__(name, name, f"/{name}", client, config or OperatorConfig())
+        self.kernel = kernel
+        self.parameters = parameters or {}
+        self.delay = delay
+        self.gate: Optional[threading.Event] = None
+        self.calls: List[Dict[str, Any]] = []
+        self.intervals: List[Tuple[float, float]] = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def execute(
+        self, inputs, output_queue, parameters=None, timings=None, deadline=None
+    ):
+        if parameters is None:
+            parameters = self.parameters
+
+        with self._lock:
+            self.calls.append(dict(parameters))
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+
+        start = time.monotonic()
+        try:
+            end = start + self.delay
+            while time.monotonic() < end or (self.gate and not self.gate.is_set()):
+                if deadline is not None:
+                    deadline.check()
+                time.sleep(0.005)
+
+            values = {
+                name: port.data.data
+                for name, port in inputs.items()
+                if port.data is not None
+            }
+            outputs = self.kernel(values, parameters)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.intervals.append((start, time.monotonic()))
+
+        return {
+            name: Port(data=PlasmaArray(self.client, np.asarray(value)))
+            for name, value in outputs.items()
+        }
+
+    async def execute_async(
+        self, inputs, output_queue, parameters=None, timings=None, deadline=None
+    ):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, self.execute, inputs, output_queue, parameters, timings, deadline
+        )
+
+
+class FakeMessenger:
+    """Message queues in the test process, the messages are not encoded"""
+
+    def __init__(self):
+        self.queues: Dict[str, queue.Queue] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def type(self) -> str:
+        return "fake"
+
+    def queue(self, name: str) -> queue.Queue:
+        with self._lock:
+            return self.queues.setdefault(name, queue.Queue())
+
+    def encode(self, msg: Message) -> Message:
+        return msg
+
+    def decode(self, msg: Message) -> Message:
+        return msg
+
+    def send_encoded(self, msg: Message, dest: str, timeout=None):
+        self.queue(dest).put(msg)
+
+    def recv_encoded(self, source: str, timeout=None) -> Message:
+        try:
+            return self.queue(source).get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No message was received from {source}")
+
+    async def send_encoded_async(self, msg: Message, dest: str, timeout=None):
+        self.send_encoded(msg, dest)
+
+    async def recv_encoded_async(self, source: str, timeout=None) -> Message:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.recv_encoded, source, timeout)
+
+    def unlink(self, name: str):
+        pass
+
+    def close(self, name=None):
+        pass
+
+
+class FakeContainers:
+    """Threads standing in for the containers of an operator
+
+    They take the tasks from the input queue of ``operator``, and send back
+    the outputs of ``kernel``. A kernel raising OperatorException sends an
+    error instead. ``delay`` maps the tasks to the seconds they take. Every
+    task taken is recorded in ``tasks``, every message sent in ``sent``, and
+    the ids of the output objects sent in ``objects``.
+    """
+
+    def __init__(
+        self,
+        operator: OperatorHandle,
+        kernel: Kernel,
+        delay: Optional[Callable[[OperateTaskMessage], float]] = None,
+    ):
+        self.operator = operator
+        self.messenger = cast(FakeMessenger, operator.messenger)
+        self.kernel = kernel
+        self.delay = delay
+        self.tasks: List[OperateTaskMessage] = []
+        self.sent: List[Message] = []
+        self.objects: List[Any] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._serve, daemon=True)
+            for _ in range(operator.operator_config.num_containers)
+        ]
+
+    def __enter__(self):
+        for thread in self._threads:
+            thread.start()
+
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                msg = self.messenger.recv_encoded(self.operator.input_queue, 0.01)
+            except TimeoutError:
+                continue
+
+            task = as_message(msg, OperateTaskMessage)
+            with self._lock:
+                self.tasks.append(task)
+
+            if self.delay is not None:
+                time.sleep(self.delay(task))
+
+            reply = self._operate(task)
+            with self._lock:
+                self.sent.append(reply)
+                if reply.type == MessageType.Complete:
+                    for port in as_message(reply, ResultTaskMessage).outputs.values():
+                        self.objects.append(port.data.object_id)
+
+            self.messenger.send_encoded(reply, task.output_queue)
+
+    def _operate(self, task: OperateTaskMessage) -> Message:
+        values = {
+            name: port.data.data
+            for name, port in task.inputs.items()
+            if port.data is not None
+        }
+        try:
+            outputs = self.kernel(values, task.params)
+        except OperatorException as e:
+            return ErrorTaskMessage(
+                error_string=str(e),
+                parallel_index=task.parallel_index,
+                task_id=task.task_id,
+            )
+
+        client = self.operator.client
+        return ResultTaskMessage(
+            outputs={
+                name: Port(data=PlasmaArray(client, np.asarray(value)))
+                for name, value in outputs.items()
+            },
+            parallel_index=task.parallel_index,
+            task_id=task.task_id,
+        )
+
+
+def container_operator(
+    client: PlasmaClient,
+    name: str,
+    config: OperatorConfig,
+    parameters: Optional[Dict[str, Any]] = None,
+) -> OperatorHandle:
+    """An operator sending its tasks to FakeContainers"""
+    operator = OperatorHandle(name, name, f"/{name}", client, config)
+    operator.messenger = FakeMessenger()  # type: ignore
+    operator.parameters = parameters or {}
+    return operator
+
+
+class FakeRegistry:
+    """Starts no container, calls ``on_start`` instead if set
+
+    ``digests`` maps image names to the digest of the image the containers
+    would run.
+    """
+
+    def __init__(self):
+        self.on_start: Optional[Callable[[], None]] = None
+        self.started = 0
+        self.digests: Dict[str, str] = {}
+
+    def start_containers(self, image_names=None):
+        self.started += 1
+        if self.on_start is not None:
+            self.on_start()
+
+    def digest(self, image_name):
+        return self.digests.get(image_name)
+
+
+class RecordingObserver(PipelineObserver):
+    def __init__(self):
+        self.completed: List[Any] = []
+        self.errors: List[Any] = []
+        self.operator_errors: List[Any] = []
+
+    def on_complete(self, pipeline):
+        self.completed.append(pipeline)
+
+    def on_error(self, pipeline, error):
+        self.errors.append(error)
+
+    def on_operator_error(self, pipeline, operator, error):
+        self.operator_errors.append((operator.id, error))
+
+
+def max_overlap(operators: Sequence[LocalOperator]) -> int:
+    """The most executions of the operators that ran at the same time"""
+    events = sorted(
+        (time, step)
+        for operator in operators
+        for start, end in operator.intervals
+        for time, step in ((start, 1), (end, -1))
+    )
+
+    running = most = 0
+    for _, step in events:
+        running += step
+        most = max(most, running)
+
+    return most
+
+
+def operator_node(
+    id: str,
+    operator: OperatorHandle,
+    inputs: Sequence[str] = (),
+    outputs: Sequence[str] = ("out",),
+) -> OperatorNode:
+    node = OperatorNode(id)
+    node.operator = operator
+    node.inputs = {x: PortInfo(type=PortType.Data, name=x) for x in inputs}
+    node.outputs = {x: PortInfo(type=PortType.Data, name=x) for x in outputs}
+    return node
+
+
+def data_edge(
+    output_id: str, input_id: str, input_port: str = "in", output_port: str = "out"
+) -> PipelineEdge:
+    return PipelineEdge(
+        output_id,
+        PortInfo(type=PortType.Data, name=output_port),
+        input_id,
+        PortInfo(type=PortType.Data, name=input_port),
+    )
+
+
+def make_pipeline(
+    client: PlasmaClient,
+    nodes: Sequence[OperatorNode],
+    edges: Sequence[PipelineEdge] = (),
+) -> Pipeline:
+    pipeline = Pipeline(client, FakeRegistry())  # type: ignore
+    pipeline.set_graph(nodes, edges)
+    pipeline.observer = RecordingObserver()
+    return pipeline
+
+
+def _add(inputs: Dict[str, Any], parameters: Dict[str, Any]) -> Dict[str, Any]:
+    return {"out": sum(inputs.values())}
+
+
+def fan_out(
+    client: PlasmaClient,
+    width: int,
+    delay: float = 0.1,
+    kernel: Optional[Kernel] = None,
+):
+    """A source, ``width`` branches reading it, and a sink reading them all"""
+    source = LocalOperator(client, "source", lambda i, p: {"out": np.ones(4)})
+    branches = [
+        LocalOperator(
+            client,
+            f"branch{i}",
+            kernel or (lambda i, p: {"out": i["in"] * 2}),
+            {"index": i},
+            delay=delay,
+        )
+        for i in range(width)
+    ]
+    sink = LocalOperator(client, "sink", _add)
+
+    nodes = [operator_node("source", source)]
+    edges = []
+    for i, branch in enumerate(branches):
+        nodes.append(operator_node(f"branch{i}", branch, inputs=["in"]))
+        edges.append(data_edge("source", f"branch{i}"))
+        edges.append(data_edge(f"branch{i}", "sink", input_port=f"in{i}"))
+
+    inputs = [f"in{i}" for i in range(width)]
+    nodes.append(operator_node("sink", sink, inputs=inputs))
+
+    pipeline = make_pipeline(client, nodes, edges)
+    pipeline.keep("sink", "out")
+    return pipeline, source, branches, sink
@@ -12,6 +12,17 @@ class Settings(BaseSettings):
     OREMDA_DIR: Optional[str]
     OREMDA_CONTAINER_TYPE: ContainerType = ContainerType.Docker
     OREMDA_SINGULARITY_IMAGE_DIR: str = ""
+    # The size of the Plasma store, in bytes
+    OREMDA_PLASMA_MEMORY: int = 50_000_000
+    # The maximum number of bytes of the Plasma store used to cache results
+    OREMDA_RESULT_CACHE_SIZE: int = 20_000_000
+    # The maximum number of pipeline runs executing at the same time
+    OREMDA_MAX_CONCURRENT_RUNS: int = 4
+    # The seconds a pipeline run may take before it is cancelled, if limited
+    OREMDA_RUN_TIMEOUT: Optional[float] = None
+    # Whether the ports are kept between runs, so an update only runs the
+    # operators it changed, instead of released as soon as they are read
+    OREMDA_RETAIN_PORTS: bool = False
 
     class Config:
         case_sensitive = True
@@ -8,6 +8,10 @@ from pydantic import BaseModel, Field
 from oremda.typing import IdType
 from oremda.clients import Client as ContainerClientFactory
 from oremda.clients.base import ClientBase as ContainerClient
+from oremda.messengers import start_local_messenger
+from oremda.messengers.uds.utils import broker_socket_path
+from oremda.pipeline.cache import OperatorResultCache
+from oremda.pipeline.memory import MemoryBudget
 from oremda.plasma_client import PlasmaClient
 from oremda.registry import Registry
 from oremda.constants import DEFAULT_OREMDA_VAR_DIR
@@ -15,6 +19,7 @@ from oremda.utils.mpi import mpi_rank
 from oremda.utils.plasma import start_plasma_store
 from oremda.typing import ContainerType
 from oremda.engine.config import settings
+from oremda.engine.scheduler import RunQueue
 
 from oremda.models import (
     SessionModel,
@@ -36,6 +41,9 @@ class GlobalContext(BaseModel):
     plasma_client: PlasmaClient = Field(...)
     container_client: ContainerClient = Field(...)
     registry: Registry = Field(...)
+    result_cache: OperatorResultCache = Field(...)
+    memory_budget: MemoryBudget = Field(...)
+    run_queue: RunQueue = Field(...)
     sessions: Dict[IdType, SessionWebModel] = {}
     pipelines: Dict[IdType, PipelineModel] = {}
     websockets: Dict[IdType, WebsocketModel] = {}
@@ -56,12 +64,20 @@ def pipeline_context():
 
     PLASMA_SOCKET = f"{OREMDA_VAR_DIR}/{_plasma_sock}"
 
-    plasma_kwargs = {"memory": 50_000_000, "socket_path": PLASMA_SOCKET}
+    plasma_memory = settings.OREMDA_PLASMA_MEMORY
+    plasma_kwargs = {"memory": plasma_memory, "socket_path": PLASMA_SOCKET}
 
-    with start_plasma_store(**plasma_kwargs):
+    with start_plasma_store(**plasma_kwargs), start_local_messenger(
+        broker_socket_path(OREMDA_VAR_DIR)
+    ):
         plasma_client = PlasmaClient(PLASMA_SOCKET)
         container_client = ContainerClientFactory(ContainerType.Docker)
         registry = Registry(plasma_client, container_client)
+        result_cache = OperatorResultCache(
+            plasma_client, settings.OREMDA_RESULT_CACHE_SIZE
+        )
+        # Shared by the pipelines, as they share the store
+        memory_budget = MemoryBudget(plasma_client, plasma_memory)
 
         registry.run_kwargs = {
             "volumes": {
@@ -80,12 +96,20 @@ def pipeline_context():
 
             registry.run_kwargs["user"] = uid
 
-        yield GlobalContext(
+        context = GlobalContext(
             **{
                 "plasma_client": plasma_client,
                 "container_client": container_client,
                 "registry": registry,
+                "result_cache": result_cache,
+                "memory_budget": memory_budget,
+                "run_queue": RunQueue(settings.OREMDA_MAX_CONCURRENT_RUNS),
             }
         )
+        yield context
+
+        for model in context.pipelines.values():
+            model.pipeline.close()
 
+        result_cache.clear()
         registry.release()
@@ -1,16 +1,24 @@
 import asyncio
-from typing import Dict
+from typing import Dict, List, Set
 from fastapi_websocket_rpc import RpcMethodsBase, WebSocketRpcClient
 
-from oremda.typing import DisplayType, IdType, JSONType, PipelineJSON
+from oremda.typing import (
+    DisplayType,
+    IdType,
+    JSONType,
+    PipelineDiffJSON,
+    PipelineJSON,
+    RunPriority,
+)
 from oremda.engine.context import GlobalContext, SessionWebModel
 from oremda.engine.rpc.messages import (
     NotificationMessage,
     pipeline_created,
+    pipeline_updated,
 )
 from oremda.engine.rpc.observer import ServerPipelineObserver
 from oremda.engine.rpc.models import PipelineModel, SerializablePipelineModel
-from oremda.pipeline import deserialize_pipeline
+from oremda.pipeline import deserialize_pipeline, serialize_pipeline
 from oremda.display import NoopDisplayHandle
 from oremda.utils.id import unique_id
 from oremda.engine.config import settings
@@ -47,10 +55,18 @@ async def run_pipeline(session_id: IdType, pipeline_id: IdType, context: GlobalC
     model = context.pipelines[pipeline_id]
     pipeline = model.pipeline
 
-    # pipeline.run is a blocking function, run it in a separate thread to free the
-    # server to perform other tasks such as sending notifications
-    # TODO: convert pipeline.run to an async function
-    await asyncio.get_running_loop().run_in_executor(None, pipeline.run)
+    # Run on the event loop, the notifications are queued from the observer.
+    # Run incrementally, so that updates to the pipeline only run what changed,
+    # and what feeds it unless the ports are retained
+    await pipeline.run_async(
+        incremental=True,
+        timeout=settings.OREMDA_RUN_TIMEOUT,
+        retain=settings.OREMDA_RETAIN_PORTS,
+    )
+
+    # Send the last renders along with the notifications of the run
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, pipeline.flush_displays)
 
 
 async def notify_clients(session_id, queue: asyncio.Queue, client: RpcClient):
@@ -70,23 +86,115 @@ class PipelineRunnerMethods(RpcMethodsBase):
     def __init__(self, context: GlobalContext, client: RpcClient):
         self.context = context
         self.client = client
+        self.queues: Dict[IdType, asyncio.Queue] = {}
+        self.locks: Dict[IdType, asyncio.Lock] = {}
+        # The runs of every pipeline that have not started yet
+        self.pending: Dict[IdType, Set[asyncio.Task]] = {}
+
+    def _schedule_run(
+        self,
+        session_id: IdType,
+        pipeline_id: IdType,
+        priority: RunPriority = RunPriority.Interactive,
+    ):
+        notify_task = asyncio.create_task(
+            notify_clients(session_id, self.queues[pipeline_id], self.client)
+        )
+
+        pending = self.pending.setdefault(pipeline_id, set())
 
-    async def run(self, session_id: IdType, pipeline_definition: dict) -> Dict:
+        async def start_run():
+            pending.discard(pipeline_task)
+            await run_pipeline(session_id, pipeline_id, self.context)
+
+        async def run_locked():
+            # Runs and updates of the same pipeline must not overlap
+            async with self.locks[pipeline_id]:
+                # Wait for the turn of the run among the runs of every session
+                await self.context.run_queue.run(session_id, start_run, priority)
+
+        def cleanup(task) -> None:
+            pending.discard(task)
+            notify_task.cancel()
+
+        pipeline_task = asyncio.create_task(run_locked())
+        pending.add(pipeline_task)
+        pipeline_task.add_done_callback(cleanup)
+
+    async def _close_pipeline(self, pipeline_id: IdType):
+        """Close a pipeline that was replaced, once its run has stopped"""
+        for task in self.pending.pop(pipeline_id, set()):
+            task.cancel()
+
+        model = self.context.pipelines.get(pipeline_id)
+        if model is None:
+            return
+
+        model.pipeline.cancel()
+        async with self.locks.get(pipeline_id, asyncio.Lock()):
+            model.pipeline.close()
+
+        del self.context.pipelines[pipeline_id]
+        self.queues.pop(pipeline_id, None)
+        self.locks.pop(pipeline_id, None)
+
+    def _replaced_pipelines(
+        self, web_session: SessionWebModel, pipeline_json: PipelineJSON
+    ) -> List[IdType]:
+        """The pipelines of the session that a new pipeline replaces
+
+        A pipeline is replaced by one created with its id, or with the same
+        graph. The other pipelines of the session are left alone.
+        """
+        graph = pipeline_json.dict(by_alias=True, exclude={"id"})
+
+        replaced = []
+        for id in web_session.pipelines:
+            model = self.context.pipelines.get(id)
+            if pipeline_json.id is not None and str(id) == str(pipeline_json.id):
+                replaced.append(id)
+            elif model is not None:
+                if model.graph.dict(by_alias=True, exclude={"id"}) == graph:
+                    replaced.append(id)
+
+        return replaced
+
+    def _find_pipeline(self, session_id: IdType, pipeline_id: IdType) -> PipelineModel:
+        # The ids come back as strings from the clients
+        web_session = self.context.sessions.get(session_id)
+        if web_session is not None:
+            for id in web_session.pipelines:
+                if str(id) == str(pipeline_id):
+                    return self.context.pipelines[id]
+
+        raise Exception(f"The pipeline {pipeline_id} does not exist.")
+
+    async def run(
+        self,
+        session_id: IdType,
+        pipeline_definition: dict,
+        priority: RunPriority = RunPriority.Interactive,
+    ) -> Dict:
         pipeline_json = PipelineJSON(**pipeline_definition)
+        priority = RunPriority(priority)
+
+        web_session = self.context.sessions.setdefault(
+            session_id, SessionWebModel(session=SessionModel(id=session_id))
+        )
+        replaced_ids = self._replaced_pipelines(web_session, pipeline_json)
 
         pipeline_id = unique_id()
         pipeline_json.id = pipeline_id
 
         queue = asyncio.Queue()
-        notify_task = asyncio.create_task(
-            notify_clients(session_id, queue, self.client)
-        )
+        self.queues[pipeline_id] = queue
+        self.locks[pipeline_id] = asyncio.Lock()
 
-        def cleanup_notify_task(context) -> None:
-            notify_task.cancel()
+        loop = asyncio.get_running_loop()
 
         def notify(message: NotificationMessage):
-            queue.put_nowait(message)
+            # The displays render, and notify, from a worker thread
+            loop.call_soon_threadsafe(queue.put_nowait, message)
 
         def display_factory(id: IdType, display_type: DisplayType):
             if display_type == DisplayType.OneD:
@@ -104,14 +212,17 @@ class PipelineRunnerMethods(RpcMethodsBase):
         )
 
         pipeline.observer = ServerPipelineObserver(notify)
+        pipeline.cache = self.context.result_cache
+        pipeline.memory = self.context.memory_budget
 
         model = PipelineModel(id=pipeline_id, graph=pipeline_json, pipeline=pipeline)
 
-        web_session = self.context.sessions.setdefault(
-            session_id, SessionWebModel(session=SessionModel(id=session_id))
-        )
-
+        # Close the pipeline that the new one replaces, if any
         pipeline_ids = web_session.pipelines
+        for replaced_id in replaced_ids:
+            pipeline_ids.discard(replaced_id)
+            asyncio.create_task(self._close_pipeline(replaced_id))
+
         pipeline_ids.add(model.id)
 
         self.context.pipelines[model.id] = model
@@ -120,15 +231,51 @@ class PipelineRunnerMethods(RpcMethodsBase):
 
         asyncio.create_task(self.client.notify_clients(message.dict(), session_id))
 
-        pipeline_task = asyncio.create_task(
-            run_pipeline(session_id, model.id, self.context)
-        )
-        pipeline_task.add_done_callback(cleanup_notify_task)
+        self._schedule_run(session_id, model.id, priority)
 
         return SerializablePipelineModel(id=pipeline_id, graph=pipeline_json).dict(
             by_alias=True
         )
 
+    async def update(
+        self,
+        session_id: IdType,
+        pipeline_id: IdType,
+        diff: dict,
+        priority: RunPriority = RunPriority.Interactive,
+    ) -> Dict:
+        pipeline_diff = PipelineDiffJSON(**diff)
+        priority = RunPriority(priority)
+        model = self._find_pipeline(session_id, pipeline_id)
+
+        # Wait for any run in progress, the graph can't change under it
+        async with self.locks[model.id]:
+            model.pipeline.update(pipeline_diff)
+            model.graph = serialize_pipeline(model.pipeline)
+
+        message = pipeline_updated(model)
+
+        asyncio.create_task(self.client.notify_clients(message.dict(), session_id))
+
+        self._schedule_run(session_id, model.id, priority)
+
+        return SerializablePipelineModel(id=model.id, graph=model.graph).dict(
+            by_alias=True
+        )
+
+    async def cancel(self, session_id: IdType, pipeline_id: IdType) -> Dict:
+        model = self._find_pipeline(session_id, pipeline_id)
+
+        # Drop the runs waiting for their turn, and stop the current one
+        for task in self.pending.pop(model.id, set()):
+            task.cancel()
+
+        model.pipeline.cancel()
+
+        return SerializablePipelineModel(id=model.id, graph=model.graph).dict(
+            by_alias=True
+        )
+
     async def get_available_operators(self, session_id: IdType) -> Dict:
         operators = {}
 
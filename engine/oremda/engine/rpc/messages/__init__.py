@@ -41,6 +41,15 @@ def pipeline_created(pipeline: PipelineModel):
     )
 
 
+def pipeline_updated(pipeline: PipelineModel):
+    return NotificationMessage(
+        **{
+            "action": ActionType.PipelineUpdated,
+            "payload": SerializablePipelineModel(**pipeline.dict(by_alias=True)),
+        }
+    )
+
+
 def pipeline_started(payload: JSONType):
     return NotificationMessage(
         **{"action": ActionType.PipelineStarted, "payload": payload}
@@ -0,0 +1,129 @@
+import asyncio
+from collections import deque
+import itertools
+from typing import Awaitable, Callable, Deque, Dict, TypeVar
+
+from oremda.typing import IdType, RunPriority
+
+T = TypeVar("T")
+
+# The priority classes, served in this order
+PRIORITY_ORDER = [RunPriority.Interactive, RunPriority.Batch]
+
+
+class RunQueue:
+    """Share the engine between the pipeline runs of every session
+
+    At most ``max_running`` runs execute at the same time, the others wait in
+    the queue of their session and priority class. When a run completes, the
+    next one is taken from the highest priority class with waiting runs, and
+    in that class from the session with the fewest runs executing, the least
+    recently served one for ties. So a session submitting many runs does not
+    hold back the runs of the other sessions, and interactive runs go ahead
+    of the batch ones.
+
+    The containers and the Plasma store are shared by all the runs.
+    """
+
+    def __init__(self, max_running: int):
+        if max_running < 1:
+            raise Exception(f"max_running must be at least 1: {max_running}")
+
+        self.max_running = max_running
+        self.running: Dict[IdType, int] = {}
+        self._waiting: Dict[RunPriority, Dict[IdType, Deque[asyncio.Future]]] = {
+            priority: {} for priority in PRIORITY_ORDER
+        }
+        # When every session was last served
+        self._served: Dict[IdType, int] = {}
+        self._ticks = itertools.count()
+
+    @property
+    def num_running(self) -> int:
+        return sum(self.running.values())
+
+    @property
+    def num_waiting(self) -> int:
+        return sum(
+            len(queue)
+            for sessions in self._waiting.values()
+            for queue in sessions.values()
+        )
+
+    async def run(
+        self,
+        session_id: IdType,
+        fn: Callable[[], Awaitable[T]],
+        priority: RunPriority = RunPriority.Interactive,
+    ) -> T:
+        """Wait for the turn of a run, then await ``fn()``"""
+        await self._acquire(session_id, priority)
+        try:
+            return await fn()
+        finally:
+            self._release(session_id)
+
+    async def _acquire(self, session_id: IdType, priority: RunPriority):
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[priority].setdefault(session_id, deque()).append(future)
+        self._dispatch()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The turn was granted as the run was cancelled, pass it on
+                self._release(session_id)
+            else:
+                self._remove(session_id, priority, future)
+
+            raise
+
+    def _release(self, session_id: IdType):
+        self.running[session_id] -= 1
+        if self.running[session_id] == 0:
+            del self.running[session_id]
+
+        self._dispatch()
+
+    def _dispatch(self):
+        while self.num_running < self.max_running and self._grant_next():
+            pass
+
+    def _grant_next(self) -> bool:
+        for priority in PRIORITY_ORDER:
+            sessions = self._waiting[priority]
+            if not sessions:
+                continue
+
+            session_id = min(
+                sessions,
+                key=lambda id: (self.running.get(id, 0), self._served.get(id, -1)),
+            )
+            queue = sessions[session_id]
+            future = queue.popleft()
+            if not queue:
+                del sessions[session_id]
+
+            if future.cancelled():
+                # Its run was cancelled, and has not left the queue yet
+                return True
+
+            self.running[session_id] = self.running.get(session_id, 0) + 1
+            self._served[session_id] = next(self._ticks)
+            future.set_result(None)
+
+            return True
+
+        return False
+
+    def _remove(
+        self, session_id: IdType, priority: RunPriority, future: asyncio.Future
+    ):
+        queue = self._waiting[priority].get(session_id)
+        if queue is None or future not in queue:
+            return
+
+        queue.remove(future)
+        if not queue:
+            del self._waiting[priority][session_id]
@@ -0,0 +1,61 @@
+import asyncio
+from types import SimpleNamespace
+
+from oremda.engine.context import SessionWebModel
+from oremda.engine.rpc.client import PipelineRunnerMethods
+from oremda.models import SessionModel
+from oremda.typing import PipelineJSON
+
+
+class FakePipeline:
+    def __init__(self):
+        self.closed = False
+
+    def cancel(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def graph(image):
+    node = {"id": "a", "type": "operator", "image": image}
+    return PipelineJSON(nodes=[node])
+
+
+def make_methods(graphs):
+    web_session = SessionWebModel(session=SessionModel(id="s"))
+    context = SimpleNamespace(sessions={"s": web_session}, pipelines={})
+    for id, pipeline_graph in graphs.items():
+        pipeline_graph.id = id
+        context.pipelines[id] = SimpleNamespace(
+            id=id, graph=pipeline_graph, pipeline=FakePipeline()
+        )
+        web_session.pipelines.add(id)
+
+    return PipelineRunnerMethods(context, None), web_session
+
+
+def test_replaced_by_id():
+    methods, web_session = make_methods({"p": graph("x"), "q": graph("y")})
+
+    new = graph("z")
+    new.id = "p"
+    assert methods._replaced_pipelines(web_session, new) == ["p"]
+
+
+def test_replaced_by_graph():
+    methods, web_session = make_methods({"p": graph("x"), "q": graph("y")})
+
+    assert methods._replaced_pipelines(web_session, graph("y")) == ["q"]
+    assert methods._replaced_pipelines(web_session, graph("z")) == []
+
+
+def test_close_pipeline_leaves_others():
+    methods, _ = make_methods({"p": graph("x"), "q": graph("y")})
+    p, q = (methods.context.pipelines[x].pipeline for x in "pq")
+
+    asyncio.run(methods._close_pipeline("p"))
+
+    assert p.closed and not q.closed
+    assert list(methods.context.pipelines) == ["q"]
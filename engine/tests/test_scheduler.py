@@ -0,0 +1,197 @@
+import asyncio
+
+import pytest
+
+from oremda.engine.scheduler import RunQueue
+from oremda.typing import RunPriority
+
+
+class Runs:
+    """Submits runs that wait to be released, and records when they start"""
+
+    def __init__(self, queue: RunQueue):
+        self.queue = queue
+        self.started = []
+        self.gates = {}
+        self.tasks = {}
+
+    def submit(self, session_id, name, priority=RunPriority.Interactive):
+        gate = asyncio.Event()
+        self.gates[name] = gate
+
+        async def fn():
+            self.started.append(name)
+            await gate.wait()
+            return name
+
+        task = asyncio.ensure_future(self.queue.run(session_id, fn, priority))
+        self.tasks[name] = task
+        return task
+
+    async def finish(self, name):
+        self.gates[name].set()
+        await self.tasks[name]
+        await settle()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_invalid_max_running():
+    with pytest.raises(Exception, match="max_running"):
+        RunQueue(0)
+
+
+def test_max_running():
+    async def main():
+        queue = RunQueue(2)
+        runs = Runs(queue)
+        for i in range(5):
+            runs.submit("s", i)
+
+        await settle()
+        assert runs.started == [0, 1]
+        assert queue.num_running == 2 and queue.num_waiting == 3
+
+        await runs.finish(0)
+        assert runs.started == [0, 1, 2]
+
+        for i in range(1, 5):
+            await runs.finish(i)
+
+        assert runs.started == [0, 1, 2, 3, 4]
+        assert queue.num_running == queue.num_waiting == 0
+        assert queue.running == {}
+
+    asyncio.run(main())
+
+
+def test_fair_between_sessions():
+    async def main():
+        queue = RunQueue(1)
+        runs = Runs(queue)
+        for i in range(3):
+            runs.submit("a", f"a{i}")
+
+        await settle()
+        runs.submit("b", "b0")
+        runs.submit("c", "c0")
+        await settle()
+
+        for name in ["a0", "b0", "c0", "a1", "a2"]:
+            await runs.finish(name)
+
+        # The other sessions are not held back by the runs of the first one
+        assert runs.started == ["a0", "b0", "c0", "a1", "a2"]
+
+    asyncio.run(main())
+
+
+def test_fewest_running_first():
+    async def main():
+        queue = RunQueue(3)
+        runs = Runs(queue)
+        runs.submit("a", "a0")
+        runs.submit("a", "a1")
+        runs.submit("b", "b0")
+        await settle()
+
+        runs.submit("a", "a2")
+        runs.submit("b", "b1")
+        await runs.finish("b0")
+
+        # b has no run executing anymore, a still has one
+        assert runs.started == ["a0", "a1", "b0", "b1"]
+
+        for name in ["a0", "a1", "b1", "a2"]:
+            await runs.finish(name)
+
+    asyncio.run(main())
+
+
+def test_interactive_before_batch():
+    async def main():
+        queue = RunQueue(1)
+        runs = Runs(queue)
+        runs.submit("a", "first")
+        await settle()
+
+        runs.submit("a", "batch", RunPriority.Batch)
+        runs.submit("b", "batch2", RunPriority.Batch)
+        runs.submit("a", "interactive")
+        await settle()
+
+        for name in ["first", "interactive", "batch2", "batch"]:
+            await runs.finish(name)
+
+        # The batch runs are fair between the sessions as well
+        assert runs.started == ["first", "interactive", "batch2", "batch"]
+
+    asyncio.run(main())
+
+
+def test_cancel_waiting_run():
+    async def main():
+        queue = RunQueue(1)
+        runs = Runs(queue)
+        runs.submit("a", "a0")
+        runs.submit("a", "a1")
+        runs.submit("a", "a2")
+        await settle()
+
+        runs.tasks["a1"].cancel()
+        await settle()
+        assert queue.num_waiting == 1
+
+        await runs.finish("a0")
+        await runs.finish("a2")
+
+        assert runs.started == ["a0", "a2"]
+        assert runs.tasks["a1"].cancelled()
+
+    asyncio.run(main())
+
+
+def test_cancel_as_the_turn_is_granted():
+    async def main():
+        queue = RunQueue(1)
+        runs = Runs(queue)
+        runs.submit("a", "a0")
+        runs.submit("b", "b0")
+        runs.submit("c", "c0")
+        await settle()
+
+        # b0 is cancelled, and a0 completes before b0 leaves the queue
+        runs.gates["a0"].set()
+        runs.tasks["b0"].cancel()
+        assert await runs.tasks["a0"] == "a0"
+        await settle()
+
+        await runs.finish("c0")
+        assert runs.started == ["a0", "c0"]
+        assert runs.tasks["b0"].cancelled()
+        assert queue.num_running == queue.num_waiting == 0
+
+    asyncio.run(main())
+
+
+def test_failed_run_releases_its_turn():
+    async def main():
+        queue = RunQueue(1)
+
+        async def fail():
+            raise Exception("Failed")
+
+        with pytest.raises(Exception, match="Failed"):
+            await queue.run("a", fail)
+
+        assert queue.num_running == 0
+
+        async def succeed():
+            return 1
+
+        assert await queue.run("a", succeed) == 1
+
+    asyncio.run(main())
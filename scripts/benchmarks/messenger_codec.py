@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""messenger_codec.py
+
+Measure how many control messages per second the messengers encode and
+decode, with the msgpack codec and with the JSON encoding it replaced.
+
+Each round trip encodes a message, decodes it, and converts it to its
+message class, as the receiving side does. The time spent in the message
+queue itself is not included, it is the same for both encodings.
+
+A plasma store is started for the plasma arrays of the ports, nothing is
+written to it.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Callable
+
+from pydantic.json import pydantic_encoder
+
+from oremda.messengers.codec import MessageCodec
+from oremda.plasma_client import PlasmaArray, PlasmaClient
+from oremda.typing import (
+    Message,
+    OperateTaskMessage,
+    Port,
+    ResultTaskMessage,
+    TimingSpan,
+    as_message,
+)
+from oremda.utils.plasma import start_plasma_store
+
+PORT_PREFIX = "port://"
+
+num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+
+def json_codec(client: PlasmaClient):
+    """The encoding of the messages before the msgpack codec"""
+
+    def detach_data(original: dict) -> dict:
+        msg = {}
+        for key, val in original.items():
+            if isinstance(val, Port):
+                port = {}
+                if val.meta is not None:
+                    port["meta"] = val.meta
+                if isinstance(val.data, PlasmaArray):
+                    port["data"] = val.data.hex_id
+                msg[f"{PORT_PREFIX}{key}"] = port
+            elif isinstance(val, dict):
+                msg[key] = detach_data(val)
+            else:
+                msg[key] = val
+        return msg
+
+    def join_data(original: dict) -> dict:
+        msg = {}
+        for key, val in original.items():
+            if key.startswith(PORT_PREFIX):
+                port = Port(meta=val.get("meta"))
+                if val.get("data") is not None:
+                    port.data = PlasmaArray(client, val["data"])
+                msg[key[len(PORT_PREFIX) :]] = port
+            elif isinstance(val, dict):
+                msg[key] = join_data(val)
+            else:
+                msg[key] = val
+        return msg
+
+    def encode(msg: Message) -> str:
+        return json.dumps(detach_data(dict(msg)), default=pydantic_encoder)
+
+    def decode(serialized_msg: str) -> Message:
+        return Message(**join_data(json.loads(serialized_msg)))
+
+    return encode, decode
+
+
+def round_trips_per_second(
+    msg: Message, encode: Callable, decode: Callable, convert: Callable
+) -> float:
+    start = time.perf_counter()
+    for _ in range(num_messages):
+        convert(decode(encode(msg)))
+
+    return num_messages / (time.perf_counter() - start)
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    socket_path = os.path.join(tmp_dir, "plasma.sock")
+    with start_plasma_store(10_000_000, socket_path):
+        client = PlasmaClient(socket_path)
+        object_id = "ab" * 20
+
+        def port():
+            return Port(
+                meta={"shape": [512, 512], "units": "nm"},
+                data=PlasmaArray(client, object_id),
+            )
+
+        messages = {
+            "operate": (
+                OperateTaskMessage(
+                    inputs={"in": port(), "background": port()},
+                    params={"threshold": 0.5, "positions": list(range(64))},
+                    output_queue="/pipeline_node",
+                    task_id="0" * 32,
+                ),
+                OperateTaskMessage,
+            ),
+            "result": (
+                ResultTaskMessage(
+                    outputs={"out": port()},
+                    timings=[
+                        TimingSpan(name=name, start=0.0, end=1.0, worker="op@host")
+                        for name in ("plasma_get", "kernel", "plasma_put")
+                    ],
+                    task_id="0" * 32,
+                ),
+                ResultTaskMessage,
+            ),
+        }
+
+        codec = MessageCodec(client)
+        json_encode, json_decode = json_codec(client)
+
+        print(f"{num_messages} round trips of each message")
+        for name, (msg, cls) in messages.items():
+            before = round_trips_per_second(
+                msg, json_encode, json_decode, lambda x: cls(**x.dict())
+            )
+            after = round_trips_per_second(
+                msg, codec.encode, codec.decode, lambda x: as_message(x, cls)
+            )
+            print(
+                f"{name:>8}: json {before:10.0f}/s  msgpack {after:10.0f}/s  "
+                f"({after / before:.1f}x)  "
+                f"{len(json_encode(msg))} -> {len(codec.encode(msg))} bytes"
+            )
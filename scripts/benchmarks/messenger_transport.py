@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+"""messenger_transport.py
+
+Measure how many round trips per second the local messengers carry, over
+the POSIX message queues (MQP) and over the Unix domain socket broker (UDS).
+
+A ping pong sends a control message to an echo process, which sends it back
+on another queue. It is run over a single pair of queues, and over many
+pairs at the same time, one echo process each, as many operator containers
+on a node would. The pings are sent by threads of this process, which also
+runs the broker, like the engine does.
+
+The message queues run out before the broker does, their number is limited
+by the kernel: the pairs of queues that could not be created are reported.
+
+A plasma store is started for the plasma arrays of the ports, nothing is
+written to it.
+"""
+
+import os
+import sys
+import tempfile
+import multiprocessing
+import threading
+import time
+from typing import Callable
+
+from oremda.messengers import MQPMessenger, UDSMessenger, start_uds_broker
+from oremda.messengers.mqp.utils import open_queue
+from oremda.plasma_client import PlasmaArray, PlasmaClient
+from oremda.typing import (
+    OperateTaskMessage,
+    Port,
+    TerminateTaskMessage,
+)
+from oremda.utils.plasma import start_plasma_store
+
+num_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+num_pairs = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+
+def echo(messenger_factory: Callable, source: str, dest: str, terminate: bytes):
+    messenger = messenger_factory()
+    while True:
+        serialized_msg = messenger.recv_encoded(source)
+        messenger.send_encoded(serialized_msg, dest)
+        if serialized_msg == terminate:
+            messenger.close()
+            return
+
+
+def ping_pong(messenger_factory: Callable, create: Callable, pairs: int) -> tuple:
+    """The round trips per second over ``pairs`` pairs, and the pairs created"""
+    created = []
+    for i in range(pairs):
+        ping, pong = f"/bench_ping_{i}", f"/bench_pong_{i}"
+        try:
+            create(ping)
+            create(pong)
+        except OSError:
+            messenger_factory().unlink(ping)
+            break
+
+        created.append((ping, pong))
+
+    if not created:
+        return 0.0, 0
+
+    msg = messenger_factory().encode(
+        OperateTaskMessage(
+            inputs={"in": Port(meta={"shape": [512, 512]}, data=array)},
+            params={"threshold": 0.5},
+            output_queue="/bench_pong",
+            task_id="0" * 32,
+        )
+    )
+    terminate = messenger_factory().encode(TerminateTaskMessage())
+    messages_per_pair = max(num_messages // len(created), 1)
+
+    def client(ping: str, pong: str):
+        messenger = messenger_factory()
+        for _ in range(messages_per_pair):
+            messenger.send_encoded(msg, ping)
+            messenger.recv_encoded(pong)
+
+        messenger.send_encoded(terminate, ping)
+        messenger.recv_encoded(pong)
+        messenger.close()
+
+    # Forked, so that the echo processes inherit the messenger factories
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=echo, args=(messenger_factory, ping, pong, terminate))
+        for ping, pong in created
+    ]
+    for process in processes:
+        process.start()
+
+    threads = [
+        threading.Thread(target=client, args=(ping, pong)) for ping, pong in created
+    ]
+
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.perf_counter() - start
+
+    for process in processes:
+        process.join()
+
+    messenger = messenger_factory()
+    for ping, pong in created:
+        messenger.unlink(ping)
+        messenger.unlink(pong)
+
+    messenger.close()
+    return messages_per_pair * len(created) / elapsed, len(created)
+
+
+def create_message_queue(name: str):
+    with open_queue(name, create=True, reuse=True):
+        pass
+
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    socket_path = os.path.join(tmp_dir, "plasma.sock")
+    broker_socket_path = os.path.join(tmp_dir, "messages.sock")
+    with start_plasma_store(10_000_000, socket_path), start_uds_broker(
+        broker_socket_path
+    ):
+        plasma_client = PlasmaClient(socket_path)
+        array = PlasmaArray(plasma_client, "ab" * 20)
+
+        transports = {
+            "mqp": (lambda: MQPMessenger(plasma_client), create_message_queue),
+            "uds": (lambda: UDSMessenger(plasma_client), lambda name: None),
+        }
+
+        print(f"{num_messages} round trips per run")
+        for pairs in (1, num_pairs):
+            for name, (factory, create) in transports.items():
+                rate, created = ping_pong(factory, create, pairs)
+                print(
+                    f"{name:>4}, {created:4d}/{pairs} pairs of queues: "
+                    f"{rate:10.0f} round trips/s"
+                )
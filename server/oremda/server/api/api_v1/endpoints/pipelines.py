@@ -2,7 +2,7 @@ from typing import List
 from fastapi import Query, Body, HTTPException, APIRouter
 
 
-from oremda.typing import IdType, PipelineJSON
+from oremda.typing import IdType, PipelineRunJSON, PipelineUpdateJSON
 
 from oremda.engine.rpc.models import (
     SerializablePipelineModel,
@@ -31,14 +31,53 @@ async def get_pipelines(session_id: IdType = Query(..., alias="sessionId")):
 @router.post("", response_model=SerializablePipelineModel)
 async def create_pipeline(
     session_id: IdType = Query(..., alias="sessionId"),
-    graph: PipelineJSON = Body(...),
+    graph: PipelineRunJSON = Body(...),
 ):
 
     if server.pipeline_runner is None:  # type: ignore
         raise HTTPException(status_code=503, detail="Pipeline runner not connected!")
 
     response = await server.pipeline_runner.other.run(  # type: ignore
-        session_id=session_id, pipeline_definition=graph.dict(by_alias=True)
+        session_id=session_id,
+        pipeline_definition=graph.dict(by_alias=True, exclude={"priority"}),
+        priority=graph.priority.value,
+    )
+
+    return response.result
+
+
+@router.patch("/{pipeline_id}", response_model=SerializablePipelineModel)
+async def update_pipeline(
+    pipeline_id: IdType,
+    session_id: IdType = Query(..., alias="sessionId"),
+    diff: PipelineUpdateJSON = Body(...),
+):
+
+    if server.pipeline_runner is None:  # type: ignore
+        raise HTTPException(status_code=503, detail="Pipeline runner not connected!")
+
+    response = await server.pipeline_runner.other.update(  # type: ignore
+        session_id=session_id,
+        pipeline_id=pipeline_id,
+        diff=diff.dict(by_alias=True, exclude={"priority"}),
+        priority=diff.priority.value,
+    )
+
+    return response.result
+
+
+@router.post("/{pipeline_id}/cancel", response_model=SerializablePipelineModel)
+async def cancel_pipeline(
+    pipeline_id: IdType,
+    session_id: IdType = Query(..., alias="sessionId"),
+):
+
+    if server.pipeline_runner is None:  # type: ignore
+        raise HTTPException(status_code=503, detail="Pipeline runner not connected!")
+
+    response = await server.pipeline_runner.other.cancel(  # type: ignore
+        session_id=session_id,
+        pipeline_id=pipeline_id,
     )
 
     return response.result
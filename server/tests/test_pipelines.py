@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import pytest
+
+import oremda.server as server
+from oremda.server.api.api_v1.endpoints import pipelines
+
+
+class FakeRunner:
+    """Records the RPCs made to the engine"""
+
+    def __init__(self):
+        self.calls = []
+        self.other = self
+
+    async def run(self, **kwargs):
+        self.calls.append(("run", kwargs))
+        graph = kwargs["pipeline_definition"]
+        return SimpleNamespace(result={"id": "p", "graph": graph})
+
+    async def update(self, **kwargs):
+        self.calls.append(("update", kwargs))
+        return SimpleNamespace(result={"id": "p", "graph": {"id": "p"}})
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    runner = FakeRunner()
+    monkeypatch.setattr(server, "pipeline_runner", runner)
+    return runner
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(pipelines.router, prefix="/pipelines")
+    return TestClient(app)
+
+
+def test_create_pipeline_priority(runner, client):
+    graph = {"nodes": [], "edges": []}
+
+    r = client.post("/pipelines?sessionId=s", json=graph)
+    assert r.status_code == 200
+    r = client.post("/pipelines?sessionId=s", json={**graph, "priority": "batch"})
+    assert r.status_code == 200
+
+    (_, default), (_, batch) = runner.calls
+    assert default["priority"] == "interactive"
+    assert batch["priority"] == "batch"
+    assert "priority" not in batch["pipeline_definition"]
+
+
+def test_update_pipeline_priority(runner, client):
+    diff = {"params": {"a": {"k": 1}}, "priority": "batch"}
+
+    r = client.patch("/pipelines/p?sessionId=s", json=diff)
+    assert r.status_code == 200
+
+    ((_, call),) = runner.calls
+    assert call["priority"] == "batch"
+    assert call["diff"]["params"] == {"a": {"k": 1}}
+    assert "priority" not in call["diff"]
+
+
+def test_invalid_priority(runner, client):
+    r = client.post("/pipelines?sessionId=s", json={"priority": "urgent"})
+    assert r.status_code == 422
+
+    r = client.patch("/pipelines/p?sessionId=s", json={"priority": "urgent"})
+    assert r.status_code == 422
+
+    assert runner.calls == []